@@ -37,6 +37,7 @@ async def connect_db():
     await db.games.create_index("username")
     await db.games.create_index("platform")
     await db.games.create_index("date")
+    await db.games.create_index("content_hash")
     # Puzzle index
     await db.puzzles.create_index("id", unique=True)
     await db.puzzles.create_index("phase")
@@ -82,3 +83,31 @@ def get_puzzles_collection():
     if _connected:
         return db.puzzles
     return None
+
+
+def get_eval_cache_collection():
+    """Get position evaluation cache collection"""
+    if _connected:
+        return db.eval_cache
+    return None
+
+
+def get_game_analyses_collection():
+    """Get shared game analyses collection (keyed by game content hash)"""
+    if _connected:
+        return db.game_analyses
+    return None
+
+
+def get_analysis_jobs_collection():
+    """Get analysis job queue collection"""
+    if _connected:
+        return db.analysis_jobs
+    return None
+
+
+def get_openings_collection():
+    """Get openings collection"""
+    if _connected:
+        return db.openings
+    return None
@@ -0,0 +1,232 @@
+"""
+Grandmaster Guard - Engine Worker
+Daemon serving a local Stockfish pool to API processes over TCP.
+
+Run one per engine box and list them in the API's ENGINE_WORKERS:
+    ENGINE_WORKER_TOKEN=... python -m api.engine_server --host 0.0.0.0 --port 7600 --size 4
+
+Each search request leases a free engine (FIFO across all clients), runs
+under the engine watchdog (hung or crashed engines are replaced) and gives
+the engine back. See api/services/engine_workers.py for the protocol.
+
+The worker listens on 127.0.0.1 unless told otherwise, and only serves
+other hosts with a shared ENGINE_WORKER_TOKEN. Clients can't ask for more
+Threads/Hash than --threads/--hash, nor search longer than the
+ENGINE_WORKER_MAX_* limits.
+"""
+
+import argparse
+import asyncio
+import hmac
+import os
+import signal
+from typing import Optional, Dict, Any
+
+import chess
+import chess.engine
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from api.services.engine_pool import EnginePool, DEFAULT_POOL_SIZE, DEFAULT_THREADS, DEFAULT_HASH_MB
+from api.services.engine_watchdog import EngineUnavailableError, get_engine_watchdog
+from api.services.engine_workers import (
+    DEFAULT_WORKER_PORT, MAX_LINE, REMOTE_OPTIONS, WORKER_TOKEN,
+    decode_position, encode_info, read_message, send_message
+)
+
+MAX_MULTIPV = 5
+# Largest search a client may ask for (the watchdog deadline follows the time limit)
+MAX_TIME = float(os.getenv("ENGINE_WORKER_MAX_TIME", "30"))
+MAX_DEPTH = int(os.getenv("ENGINE_WORKER_MAX_DEPTH", "40"))
+MAX_NODES = int(os.getenv("ENGINE_WORKER_MAX_NODES", "50000000"))
+LIMIT_MAXIMUMS = {"time": MAX_TIME, "depth": MAX_DEPTH, "nodes": MAX_NODES, "mate": MAX_DEPTH}
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+def decode_limit(encoded: Dict[str, Any]) -> chess.engine.Limit:
+    """
+    A client's search limit, bounded by the LIMIT_MAXIMUMS
+
+    Raises:
+        ValueError: If it is missing, unknown or above a maximum
+    """
+    if not isinstance(encoded, dict) or not encoded:
+        raise ValueError("limit must set time, depth, nodes or mate")
+    limit = {}
+    for name, value in encoded.items():
+        if name not in LIMIT_MAXIMUMS:
+            raise ValueError(f"unknown limit {name!r}")
+        value = float(value) if name == "time" else int(value)
+        if not 0 < value <= LIMIT_MAXIMUMS[name]:
+            raise ValueError(f"limit {name} must be positive and at most {LIMIT_MAXIMUMS[name]}")
+        limit[name] = value
+    return chess.engine.Limit(**limit)
+
+
+class EngineServer:
+    """
+    Serves searches on an EnginePool to any number of connections.
+    """
+
+    def __init__(self, pool: EnginePool, token: str = WORKER_TOKEN):
+        self.pool = pool
+        self.token = token
+        self.defaults = {"Threads": pool.threads, "Hash": pool.hash_mb}
+        self.name: Optional[str] = None
+        self.connections = 0
+        self.searches = 0
+        self.errors = 0
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ok": True,
+            "name": self.name,
+            "size": self.pool.size,
+            "options": {name: value for name, value in self.defaults.items() if name in REMOTE_OPTIONS},
+            "pool": self.pool.stats(),
+            "connections": self.connections,
+            "searches": self.searches,
+            "errors": self.errors
+        }
+
+    def authorized(self, message: Dict[str, Any]) -> bool:
+        """True if the request carries the server's token (or none is required)"""
+        if not self.token:
+            return True
+        token = message.get("token")
+        return isinstance(token, str) and hmac.compare_digest(token.encode(), self.token.encode())
+
+    async def _configure(self, engine: chess.engine.UciProtocol, wanted: Dict[str, Any]):
+        """Give the engine the client's Threads/Hash (pool defaults otherwise)"""
+        options = {
+            name: value for name, value in wanted.items()
+            if name in engine.options and engine.config.get(name) != value
+        }
+        if options:
+            await engine.configure(options)
+
+    async def analyse(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one search request (raises EngineUnavailableError if the pool can't serve it)"""
+        try:
+            board = decode_position(message)
+            if not board.is_valid():
+                # Illegal positions (e.g. no king) can crash the engine
+                raise ValueError(f"illegal position {board.fen()}")
+            limit = decode_limit(message.get("limit"))
+            multipv = message.get("multipv")
+            if multipv is not None:
+                multipv = int(multipv)
+                if not 1 <= multipv <= MAX_MULTIPV:
+                    raise ValueError(f"multipv must be between 1 and {MAX_MULTIPV}")
+            wanted = dict(self.defaults)
+            for name, value in (message.get("options") or {}).items():
+                if name not in REMOTE_OPTIONS:
+                    raise ValueError(f"option {name!r} can't be set remotely")
+                # Never more than this server's own --threads/--hash
+                wanted[name] = max(1, min(int(value), self.defaults[name]))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            self.errors += 1
+            return {"ok": False, "error": f"bad request: {e}"}
+
+        async def prepare(engine):
+            await self._configure(engine, wanted)
+
+        engine = await self.pool.acquire()
+        try:
+            kwargs = {"multipv": multipv} if multipv is not None else {}
+            if message.get("new_game"):
+                kwargs["game"] = object()
+            info, engine = await get_engine_watchdog().analyse(
+                engine, board, limit, self.pool.replace, prepare=prepare, **kwargs
+            )
+        except EngineUnavailableError:
+            self.errors += 1
+            raise
+        except Exception as e:
+            self.errors += 1
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.pool.release(engine)
+
+        self.searches += 1
+        infos = info if isinstance(info, list) else [info]
+        return {"ok": True, "infos": [encode_info(i) for i in infos]}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """One client connection: requests are answered in order"""
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except ValueError:
+                    await send_message(writer, {"ok": False, "error": "bad request: invalid JSON"})
+                    break
+                if message is None:
+                    break
+                if not isinstance(message, dict) or not self.authorized(message):
+                    self.errors += 1
+                    await send_message(writer, {"ok": False, "error": "unauthorized"})
+                    break
+
+                op = message.get("op")
+                if op == "status":
+                    await send_message(writer, self.status())
+                elif op == "analyse":
+                    try:
+                        reply = await self.analyse(message)
+                    except EngineUnavailableError as e:
+                        # Close so the client fails over to another worker
+                        await send_message(writer, {"ok": False, "error": str(e)})
+                        break
+                    await send_message(writer, reply)
+                else:
+                    await send_message(writer, {"ok": False, "error": f"unknown op {op!r}"})
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass  # Client went away
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+async def main(host: str, port: int, engine_path: Optional[str], size: int, threads: int, hash_mb: int):
+    if host not in LOOPBACK_HOSTS and not WORKER_TOKEN:
+        raise SystemExit(f"[EngineServer] Refusing to serve {host} without ENGINE_WORKER_TOKEN "
+                         f"(anyone reaching the port could run searches)")
+    pool = EnginePool(engine_path, size=size, threads=threads, hash_mb=hash_mb)
+    await pool.start()
+    server = EngineServer(pool)
+    async with pool.lease() as engine:
+        server.name = engine.id.get("name")
+
+    tcp = await asyncio.start_server(server.handle, host, port, limit=MAX_LINE)
+    print(f"[EngineServer] Serving {pool.size} x {server.name} on {host}:{port}")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            pass  # Windows
+
+    try:
+        async with tcp:
+            await stopping.wait()
+    finally:
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve local Stockfish engines to API processes")
+    parser.add_argument("--host", default=os.getenv("ENGINE_WORKER_HOST", "127.0.0.1"),
+                        help="Listen address (other than loopback requires ENGINE_WORKER_TOKEN)")
+    parser.add_argument("--port", type=int, default=DEFAULT_WORKER_PORT)
+    parser.add_argument("--engine", default=None, help="UCI engine binary (default: STOCKFISH_PATH lookup)")
+    parser.add_argument("--size", type=int, default=DEFAULT_POOL_SIZE, help="Engine processes")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="UCI Threads per engine")
+    parser.add_argument("--hash", type=int, default=DEFAULT_HASH_MB, help="UCI Hash (MB) per engine")
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port, args.engine, args.size, args.threads, args.hash))
@@ -6,6 +6,7 @@ Main entry point for the Python API server
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -14,6 +15,18 @@ load_dotenv()
 
 from api.routers import games, captcha, analysis, puzzles, coach, content, openings, user, curriculum, progress
 from api.database import connect_db, close_db
+from api.services.engine_pool import start_engine_pool, stop_engine_pool, get_engine_pool
+from api.services.engine_watchdog import get_engine_watchdog
+from api.services.engine_workers import start_engine_workers, stop_engine_workers, get_engine_workers
+from api.services.eval_cache import get_eval_cache
+from api.services.live_analysis import get_live_sessions
+from api.services.opening_book import load_opening_book, get_opening_book
+from api.services.analysis_queue import AnalysisWorker, create_queue_indexes
+from api.services.analysis_events import create_events_collection
+
+# Concurrent analysis jobs processed inside the API process (0 = only standalone workers)
+ANALYSIS_API_WORKERS = int(os.getenv("ANALYSIS_API_WORKERS", "1"))
+analysis_worker = None
 
 
 @asynccontextmanager
@@ -34,12 +47,53 @@ async def lifespan(app: FastAPI):
              # We mainly query by user_id
              await db_instance.curriculum_progress.create_index("user_id", unique=True)
              
-             print("✅ Initialized MongoDB Indexes for User/Curriculum")
+             # Analysis queue: one active job per game, claim order
+             await create_queue_indexes()
+             # Capped collection for streamed analysis progress
+             await create_events_collection()
+             
+             print("✅ Initialized MongoDB Indexes for User/Curriculum/Analysis Queue")
     except Exception as e:
         print(f"⚠️ Index creation warning: {e}")
+    
+    # Theory positions from the openings collection (book moves skip the engine)
+    try:
+        await load_opening_book()
+    except Exception as e:
+        print(f"⚠️ Opening book not loaded, book moves fall back to move number: {e}")
+    
+    # Shared Stockfish engine pool (size/Threads/Hash from STOCKFISH_POOL_SIZE,
+    # STOCKFISH_THREADS, STOCKFISH_HASH_MB)
+    try:
+        await start_engine_pool()
+    except Exception as e:
+        print(f"⚠️ Engine pool not started, analysis will spawn engines per request: {e}")
+    
+    # Remote engine workers (ENGINE_WORKERS=host:port,...) take game and batch analysis
+    try:
+        await start_engine_workers()
+    except Exception as e:
+        print(f"⚠️ Engine workers not reachable, analysis stays on local engines: {e}")
+    
+    # In-process analysis queue worker (standalone workers: python -m api.worker)
+    global analysis_worker
+    worker_task = None
+    if ANALYSIS_API_WORKERS > 0:
+        from api.routers.analysis import handle_analysis_job, handle_analysis_failure
+        analysis_worker = AnalysisWorker(
+            handle_analysis_job,
+            concurrency=ANALYSIS_API_WORKERS,
+            on_failure=handle_analysis_failure
+        )
+        worker_task = asyncio.create_task(analysis_worker.run())
         
     yield
     # Shutdown
+    if worker_task is not None:
+        analysis_worker.stop()
+        await worker_task
+    await stop_engine_workers()
+    await stop_engine_pool()
     await close_db()
 
 
@@ -102,6 +156,8 @@ async def root():
 @app.get("/api/health")
 async def health_check():
     """Detailed health check"""
+    pool = get_engine_pool()
+    workers = get_engine_workers()
     return {
         "status": "healthy",
         "database": "connected",
@@ -109,7 +165,14 @@ async def health_check():
             "chesscom": "available",
             "lichess": "available",
             "analysis": "available"
-        }
+        },
+        "engine_pool": pool.stats() if pool is not None else None,
+        "engine_workers": workers.stats() if workers is not None else None,
+        "engine_watchdog": get_engine_watchdog().stats(),
+        "eval_cache": get_eval_cache().stats(),
+        "live_analysis": get_live_sessions().stats(),
+        "opening_book": get_opening_book().stats(),
+        "analysis_worker": analysis_worker.stats() if analysis_worker is not None else None
     }
 
 
@@ -90,6 +90,8 @@ class Game(GameBase):
     """Full game schema with analysis"""
     id: str = Field(alias="_id")
     analysis_status: str = "pending"  # pending, analyzing, completed, failed
+    content_hash: Optional[str] = None  # Hash of the moves, shared by copies of the same game
+    analysis_ref: Optional[str] = None  # Shared analysis (game_analyses _id)
     moves: List[MoveAnalysis] = []
     white_accuracy: Optional[float] = None
     black_accuracy: Optional[float] = None
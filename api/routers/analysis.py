@@ -3,13 +3,39 @@ Analysis API Router
 Endpoints for triggering and retrieving game analysis with AI coaching
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from bson import ObjectId
+import asyncio
+import json
+import os
+
+import chess
 
 from api.database import get_games_collection
-from api.services.stockfish_analyzer import StockfishAnalyzer, analyze_game_pgn
+from api.services.analysis_queue import enqueue_analysis, get_active_job, PRIORITIES
+from api.services.analysis_events import publish_event, tail_events
+from api.services.classification import game_statistics
+from api.services.engine_pool import get_engine_pool
+from api.services.game_analyses import (
+    ensure_content_hash,
+    find_reusable_analysis,
+    get_shared_analysis,
+    link_shared_analysis,
+    resolve_analysis,
+    store_shared_analysis
+)
+from api.services.live_analysis import (
+    LiveSession,
+    get_live_sessions,
+    live_session_cap,
+    IDLE_TIMEOUT,
+    LEASE_TIMEOUT,
+    MAX_LIFETIME
+)
+from api.services.stockfish_analyzer import StockfishAnalyzer, PositionEval, analyze_game_pgn, evaluate_batch
 from api.services.ai_coach import (
     get_opening_summary,
     get_move_commentary,
@@ -23,6 +49,10 @@ router = APIRouter(prefix="/api", tags=["analysis"])
 
 class AnalysisRequest(BaseModel):
     depth: int = 16
+    priority: str = "interactive"  # "interactive" or "bulk" (backfill)
+    adaptive: bool = False  # Fast sweep first (provisional results), then deepen critical moves
+    nodes: Optional[int] = None  # Node budget per position: reproducible results (replaces depth)
+    refine_plies: int = 0  # MultiPV second pass on this many critical plies (only moves, sacrifices)
     
 
 class AnalysisResponse(BaseModel):
@@ -41,6 +71,19 @@ class MoveAnalysisResult(BaseModel):
     best_move: Optional[str] = None
     classification: str
     pv: List[str] = []
+    depth: Optional[int] = None
+    nodes: Optional[int] = None
+    engine: Optional[str] = None
+    budget: Optional[int] = None
+    only_move: Optional[bool] = None
+    sacrifice: Optional[bool] = None
+    material_offered: Optional[int] = None
+    white: Optional[bool] = None
+    motifs: List[str] = []
+
+
+# Max plies per game for the MultiPV second pass
+MAX_REFINE_PLIES = int(os.getenv("ANALYSIS_MAX_REFINE_PLIES", "10"))
 
 
 # Classification labels in French
@@ -56,10 +99,25 @@ CLASSIFICATION_LABELS = {
 }
 
 
-async def run_analysis_task(game_id: str, depth: int = 16):
+async def run_analysis_task(
+    game_id: str,
+    depth: int = 16,
+    job_id: Optional[str] = None,
+    adaptive: bool = False,
+    nodes: Optional[int] = None,
+    refine_plies: int = 0
+):
     """
-    Background task to run Stockfish analysis on a game.
+    Run Stockfish analysis on a game (executed by the analysis queue worker).
     Updates the game document with analysis results and AI insights.
+    In adaptive mode, the shallow-sweep results are stored first with
+    status "provisional" and replaced once critical moves are deepened.
+    With a node budget, every position is searched deterministically.
+    With refine_plies, the most critical plies get a MultiPV second pass.
+    Results are stored once per game content (shared with every copy of the
+    game); if a copy was already analysed at least as deep, the game is
+    linked to that analysis without searching.
+    Errors are recorded on the game and re-raised so the queue can retry.
     """
     collection = get_games_collection()
     if collection is None:
@@ -78,75 +136,64 @@ async def run_analysis_task(game_id: str, depth: int = 16):
             print(f"[Analysis] Game {game_id} has no PGN")
             return
         
+        # Identical game already analysed (e.g. by the opponent): link and replay it
+        shared = await find_reusable_analysis(game, depth, nodes, adaptive, refine_plies)
+        if shared is not None:
+            await link_shared_analysis(game["_id"], shared)
+            await publish_event(game_id, job_id, "start", {"depth": depth, "nodes": nodes, "shared": True})
+            for move_result in shared.get("analysis_results", []):
+                await publish_event(game_id, job_id, "move", move_result)
+            await publish_event(game_id, job_id, "summary", {
+                "status": "complete",
+                "statistics": shared.get("statistics", {}),
+                "coach_messages": shared.get("coach_messages", []),
+                "ai_insights": shared.get("ai_insights", {})
+            })
+            print(f"[Analysis] Game {game_id} reuses the analysis of an identical game")
+            return
+        
         # Update status to analyzing
         await collection.update_one(
             {"_id": ObjectId(game_id)},
             {"$set": {"analysis_status": "analyzing"}}
         )
         
-        # Run analysis
+        # Run analysis, streaming each move to /api/analysis/{id}/stream listeners
         print(f"[Analysis] Starting analysis for game {game_id}")
-        results = await analyze_game_pgn(pgn, depth=depth)
+        await publish_event(game_id, job_id, "start", {"depth": depth, "nodes": nodes})
         
-        # Calculate statistics for AI insights
-        total_moves = len(results)
-        blunders = [r for r in results if r.get("classification") == "blunder"]
-        mistakes = [r for r in results if r.get("classification") == "mistake"]
-        inaccuracies = [r for r in results if r.get("classification") == "inaccuracy"]
+        async def on_move(move_result: Dict[str, Any]):
+            await publish_event(game_id, job_id, "move", move_result)
         
-        # Calculate precision per player
-        white_moves = [r for r in results if r["ply"] % 2 == 1]
-        black_moves = [r for r in results if r["ply"] % 2 == 0]
-        
-        def calc_precision(moves):
-            if not moves:
-                return 0
-            good_moves = [m for m in moves if m.get("classification") in 
-                         ["brilliant", "great", "best", "excellent", "good", "book"]]
-            return round((len(good_moves) / len(moves)) * 100)
+        async def on_provisional(provisional: List[Dict[str, Any]]):
+            await collection.update_one(
+                {"_id": ObjectId(game_id)},
+                {"$set": {"analysis_status": "provisional", "analysis_results": provisional}}
+            )
+            await publish_event(game_id, job_id, "provisional", {"results": provisional})
         
-        white_precision = calc_precision(white_moves)
-        black_precision = calc_precision(black_moves)
+        # Lichess server analysis (if imported) and earlier results at least
+        # `depth` deep (this game's, or the shared analysis of its content)
+        # cover those positions without searching them again
+        content_hash = await ensure_content_hash(game)
+        previous = await get_shared_analysis(content_hash) or game
+        previous_results = previous.get("analysis_results") or None
+        results = await analyze_game_pgn(
+            pgn, depth=depth, on_move=on_move, adaptive=adaptive, on_provisional=on_provisional,
+            known_evals=game.get("lichess_evals"), previous_results=previous_results, nodes=nodes,
+            refine_plies=refine_plies
+        )
         
-        # Top critical moments (sorted by CP loss)
-        critical_moments = []
-        for r in results:
-            if r.get("classification") in ["blunder", "mistake"]:
-                cp_before = r.get("eval_before", 0) or 0
-                cp_after = r.get("eval_after", 0) or 0
-                is_white = r["ply"] % 2 == 1
-                cp_loss = abs((cp_before - cp_after) if is_white else (cp_after - cp_before))
-                critical_moments.append({
-                    "move": (r["ply"] + 1) // 2,
-                    "played": r["move"],
-                    "cp_loss": cp_loss
-                })
-        critical_moments.sort(key=lambda x: x["cp_loss"], reverse=True)
+        # Calculate statistics for AI insights (whole game, vectorized)
+        stats = game_statistics(results)
         
-        # Calculate average blunder CP loss
-        avg_blunder_cp = 0
-        if blunders:
-            total_cp_loss = 0
-            for b in blunders:
-                cp_before = b.get("eval_before", 0) or 0
-                cp_after = b.get("eval_after", 0) or 0
-                is_white = b["ply"] % 2 == 1
-                cp_loss = abs((cp_before - cp_after) if is_white else (cp_after - cp_before))
-                total_cp_loss += cp_loss
-            avg_blunder_cp = total_cp_loss / len(blunders)
+        # Generate AI insights. On re-analysis, the opening summary and lesson
+        # (opening only) are kept, and key insights too if the statistics match.
+        previous_insights = (previous.get("ai_insights") or {}) if previous_results else {}
         
-        stats = {
-            "total_moves": total_moves,
-            "blunders": len(blunders),
-            "mistakes": len(mistakes),
-            "inaccuracies": len(inaccuracies),
-            "avg_blunder_cp": avg_blunder_cp,
-            "white_precision": white_precision,
-            "black_precision": black_precision,
-            "top_critical": critical_moments[:3]
-        }
+        async def reuse(value):
+            return value
         
-        # Generate AI insights
         try:
             from api.services.ollama_service import ollama_service
             import asyncio
@@ -154,9 +201,13 @@ async def run_analysis_task(game_id: str, depth: int = 16):
             opening_name = game.get("opening_name", "Unknown Opening")
             
             opening_summary, insights, lesson = await asyncio.gather(
-                ollama_service.get_opening_summary(opening_name),
-                ollama_service.get_key_insights(stats),
-                ollama_service.get_lesson(opening_name, ""),
+                reuse(previous_insights["opening_summary"]) if previous_insights.get("opening_summary")
+                else ollama_service.get_opening_summary(opening_name),
+                reuse(previous_insights["key_insights"])
+                if previous_insights.get("key_insights") and previous.get("statistics") == stats
+                else ollama_service.get_key_insights(stats),
+                reuse(previous_insights["lesson"]) if previous_insights.get("lesson")
+                else ollama_service.get_lesson(opening_name, ""),
                 return_exceptions=True
             )
             
@@ -212,27 +263,51 @@ async def run_analysis_task(game_id: str, depth: int = 16):
                     "move": san
                 })
         
-        # Update game with results
-        await collection.update_one(
-            {"_id": ObjectId(game_id)},
-            {
-                "$set": {
-                    "analysis_status": "complete",
-                    "analysis_results": results,
-                    "coach_messages": coach_messages,
-                    "moves": results,  # For backward compatibility
-                    "ai_insights": {
-                        "opening_summary": opening_summary,
-                        "key_insights": insights,
-                        "lesson": lesson
+        ai_insights = {
+            "opening_summary": opening_summary,
+            "key_insights": insights,
+            "lesson": lesson
+        }
+        
+        # Store once for every copy of this game and reference it, unless the
+        # shared analysis is better than this run (then keep it on this game only)
+        shared = None
+        if content_hash:
+            shared = await store_shared_analysis(
+                content_hash, results, stats, coach_messages, ai_insights,
+                depth, nodes=nodes, adaptive=adaptive, refine_plies=refine_plies
+            )
+        if shared is not None:
+            await link_shared_analysis(game["_id"], shared)
+        else:
+            # Update game with results
+            await collection.update_one(
+                {"_id": ObjectId(game_id)},
+                {
+                    "$set": {
+                        "analysis_status": "complete",
+                        "analysis_results": results,
+                        "analysis_depth": depth,
+                        "analysis_nodes": nodes,
+                        "coach_messages": coach_messages,
+                        "moves": results,  # For backward compatibility
+                        "ai_insights": ai_insights,
+                        "statistics": stats
                     },
-                    "statistics": stats
+                    "$unset": {"analysis_ref": ""}
                 }
-            }
-        )
+            )
+        
+        await publish_event(game_id, job_id, "summary", {
+            "status": "complete",
+            "statistics": stats,
+            "coach_messages": coach_messages,
+            "ai_insights": ai_insights
+        })
         
         print(f"[Analysis] Completed analysis for game {game_id}: {len(results)} moves")
-        print(f"[Analysis] Stats - White: {white_precision}%, Black: {black_precision}%, Blunders: {len(blunders)}")
+        print(f"[Analysis] Stats - White: {stats['white_precision']}% (accuracy {stats['white_accuracy']}), "
+              f"Black: {stats['black_precision']}% (accuracy {stats['black_accuracy']}), Blunders: {stats['blunders']}")
         
     except Exception as e:
         print(f"[Analysis] Error analyzing game {game_id}: {e}")
@@ -243,23 +318,62 @@ async def run_analysis_task(game_id: str, depth: int = 16):
                 {"_id": ObjectId(game_id)},
                 {"$set": {"analysis_status": "error", "analysis_error": str(e)}}
             )
+        raise
+
+
+async def handle_analysis_job(job: Dict[str, Any]):
+    """Queue handler: run the analysis for a claimed job"""
+    await run_analysis_task(
+        job["game_id"], job.get("depth", 16), job_id=job["_id"],
+        adaptive=job.get("adaptive", False), nodes=job.get("nodes"),
+        refine_plies=job.get("refine_plies", 0)
+    )
+
+
+async def handle_analysis_failure(job: Dict[str, Any], status: str, error: str):
+    """
+    Queue failure hook (`error` is this attempt's error).
+    status "queued": the job will be retried after backoff; show the game as queued.
+    status "failed": attempts exhausted; the game keeps its error status.
+    """
+    if status == "queued":
+        collection = get_games_collection()
+        if collection is not None:
+            await collection.update_one(
+                {"_id": ObjectId(job["game_id"])},
+                {"$set": {"analysis_status": "queued"}}
+            )
+    await publish_event(job["game_id"], job["_id"], "retry" if status == "queued" else "failed", {
+        "attempts": job.get("attempts"),
+        "error": error
+    })
 
 
 @router.post("/analyze/{game_id}", response_model=AnalysisResponse)
 async def trigger_analysis(
     game_id: str, 
-    background_tasks: BackgroundTasks,
     request: AnalysisRequest = AnalysisRequest()
 ):
     """
     Trigger server-side Stockfish analysis for a game.
-    Analysis runs in the background.
+    The game is added to the durable analysis queue and picked up by a worker,
+    unless an identical game was already analysed at least as deep: it then
+    completes immediately with that analysis.
     """
     collection = get_games_collection()
     
     if collection is None:
         raise HTTPException(status_code=503, detail="Database not available")
     
+    if request.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid priority: {request.priority}")
+    
+    if request.nodes is not None and request.nodes <= 0:
+        raise HTTPException(status_code=400, detail="nodes must be positive")
+    
+    if not 0 <= request.refine_plies <= MAX_REFINE_PLIES:
+        raise HTTPException(status_code=400, detail=f"refine_plies must be between 0 and {MAX_REFINE_PLIES}")
+    
     # Verify game exists
     try:
         game = await collection.find_one({"_id": ObjectId(game_id)})
@@ -269,15 +383,33 @@ async def trigger_analysis(
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
-    # Check if already analyzing
-    if game.get("analysis_status") == "analyzing":
+    shared = await find_reusable_analysis(
+        game, request.depth, request.nodes, request.adaptive, request.refine_plies
+    )
+    if shared is not None and await get_active_job(game_id) is None:
+        await link_shared_analysis(game["_id"], shared)
+        return AnalysisResponse(
+            status="complete",
+            message="Analysis reused from an identical game",
+            moves_analyzed=len(shared.get("analysis_results", []))
+        )
+    
+    # Enqueue atomically: a second trigger finds the active job instead of starting another
+    queued = await enqueue_analysis(
+        game_id, request.depth, PRIORITIES[request.priority],
+        adaptive=request.adaptive, nodes=request.nodes, refine_plies=request.refine_plies
+    )
+    
+    if not queued["queued"]:
         return AnalysisResponse(
             status="in_progress",
-            message="Analysis is already in progress"
+            message="Analysis is already queued or in progress"
         )
     
-    # Queue background analysis task
-    background_tasks.add_task(run_analysis_task, game_id, request.depth)
+    await collection.update_one(
+        {"_id": ObjectId(game_id)},
+        {"$set": {"analysis_status": "queued"}}
+    )
     
     return AnalysisResponse(
         status="started",
@@ -301,8 +433,16 @@ async def get_analysis_status(game_id: str):
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
+    game = await resolve_analysis(game)
+    job = await get_active_job(game_id)
+    
     return {
         "status": game.get("analysis_status", "pending"),
+        "job": {
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "priority": job["priority"]
+        } if job else None,
         "results": game.get("analysis_results", []),
         "coach_messages": game.get("coach_messages", []),
         "ai_insights": game.get("ai_insights", {}),
@@ -310,6 +450,261 @@ async def get_analysis_status(game_id: str):
     }
 
 
+def _sse(event_type: str, data: Any) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/analysis/{game_id}/stream")
+async def stream_analysis(game_id: str, request: Request):
+    """
+    Stream analysis progress as Server-Sent Events.
+    
+    Events:
+    - status: current game status when the stream opens
+    - start: a worker began analysing (sent again on retries)
+    - provisional: shallow-sweep results for every move (adaptive mode only)
+    - move: one analysis result per ply, in ply order
+    - retry / failed: an attempt failed (failed is final)
+    - summary: statistics, coach messages and AI insights (final)
+    
+    Completed games are replayed from the stored results in a single read.
+    """
+    collection = get_games_collection()
+    
+    if collection is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        game = await collection.find_one(
+            {"_id": ObjectId(game_id)},
+            {"analysis_status": 1, "analysis_results": 1, "analysis_ref": 1, "statistics": 1,
+             "coach_messages": 1, "ai_insights": 1}
+        )
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid game ID format")
+    
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    
+    game = await resolve_analysis(game)
+    job = await get_active_job(game_id)
+    
+    async def event_stream():
+        yield _sse("status", {"status": game.get("analysis_status", "pending")})
+        
+        if job is None:
+            # Nothing running: replay stored results (if any) and finish
+            if game.get("analysis_status") == "complete":
+                for move_result in game.get("analysis_results", []):
+                    yield _sse("move", move_result)
+                yield _sse("summary", {
+                    "status": "complete",
+                    "statistics": game.get("statistics", {}),
+                    "coach_messages": game.get("coach_messages", []),
+                    "ai_insights": game.get("ai_insights", {})
+                })
+            return
+        
+        async for event in tail_events(job["_id"]):
+            if await request.is_disconnected():
+                return
+            yield _sse(event["type"], event["data"])
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ============= Position Evaluation Endpoints =============
+
+# Max positions per batch request, and the size from which results are streamed
+BATCH_MAX_POSITIONS = int(os.getenv("EVALUATE_BATCH_MAX", "500"))
+BATCH_STREAM_THRESHOLD = int(os.getenv("EVALUATE_BATCH_STREAM", "50"))
+# Per-position search limits of a batch request (larger values are clamped)
+BATCH_MAX_DEPTH = int(os.getenv("EVALUATE_BATCH_MAX_DEPTH", "22"))
+BATCH_MAX_TIME_LIMIT = float(os.getenv("EVALUATE_BATCH_MAX_TIME", "2.0"))
+BATCH_MAX_NODES = int(os.getenv("EVALUATE_BATCH_MAX_NODES", "2000000"))
+
+
+class BatchEvaluateRequest(BaseModel):
+    fens: List[str]
+    depth: int = 16
+    time_limit: float = 0.5  # Seconds per position
+    nodes: Optional[int] = None  # Node budget per position: reproducible results (replaces depth/time)
+    stream: Optional[bool] = None  # Default: stream batches above BATCH_STREAM_THRESHOLD
+
+
+def _position_eval_to_dict(fen: str, result: PositionEval) -> Dict[str, Any]:
+    return {
+        "fen": fen,
+        "cp": result.cp,
+        "mate": result.mate,
+        "best_move": result.pv[0] if result.pv else None,
+        "pv": result.pv[:5],
+        "depth": result.depth,
+        "nodes": result.nodes,
+        "engine": result.engine,
+        "budget": result.budget
+    }
+
+
+@router.post("/evaluate/batch")
+async def evaluate_positions(request: BatchEvaluateRequest):
+    """
+    Evaluate a list of independent positions (scores from White's perspective).
+    
+    Duplicate positions are searched once, cached and tablebase positions are
+    not searched at all, and the rest are spread over the engine pool.
+    Results come back in input order: as {"results": [...]}, or for large
+    batches (or stream=true) as Server-Sent Events - one "result" event per
+    position ({"index", ...}) followed by "done".
+    """
+    if not request.fens:
+        raise HTTPException(status_code=400, detail="No positions given")
+    if len(request.fens) > BATCH_MAX_POSITIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_POSITIONS} positions per batch")
+    if request.nodes is not None and request.nodes <= 0:
+        raise HTTPException(status_code=400, detail="nodes must be positive")
+    if request.depth <= 0 or request.time_limit <= 0:
+        raise HTTPException(status_code=400, detail="depth and time_limit must be positive")
+    
+    boards = []
+    for index, fen in enumerate(request.fens):
+        try:
+            board = chess.Board(fen)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid FEN at index {index}: {fen}")
+        if not board.is_valid():
+            raise HTTPException(status_code=400, detail=f"Illegal position at index {index}: {fen}")
+        boards.append(board)
+    
+    # Clamp the search limits; evaluate_batch itself takes at most half the pool
+    options = {
+        "depth": min(request.depth, BATCH_MAX_DEPTH),
+        "time_limit": min(request.time_limit, BATCH_MAX_TIME_LIMIT),
+        "nodes": min(request.nodes, BATCH_MAX_NODES) if request.nodes is not None else None
+    }
+    stream = request.stream if request.stream is not None else len(boards) > BATCH_STREAM_THRESHOLD
+    
+    if not stream:
+        try:
+            results = await evaluate_batch(boards, **options)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Evaluation failed: {e}")
+        return {"results": [_position_eval_to_dict(fen, r) for fen, r in zip(request.fens, results)]}
+    
+    async def event_stream():
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def on_result(index: int, result: PositionEval):
+            await queue.put({"index": index, **_position_eval_to_dict(request.fens[index], result)})
+        
+        task = asyncio.create_task(evaluate_batch(boards, on_result=on_result, **options))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield _sse("result", item)
+            if task.exception() is not None:
+                yield _sse("failed", {"error": str(task.exception())})
+            else:
+                yield _sse("done", {"count": len(boards)})
+        finally:
+            # Client went away: stop searching
+            task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/analysis/live")
+async def live_analysis(websocket: WebSocket, user_id: Optional[str] = None):
+    """
+    Infinite analysis for the analysis board over a WebSocket.
+    
+    The session leases one pool engine until it closes. Client messages are
+    "position" (starts a search, cancelling the one in flight), "stop" and
+    "ping". The server sends "ready", then "info" updates (depth, nps and
+    MultiPV lines, scores from White's perspective) tagged with the search
+    id, "bestmove" when a depth-limited search ends, and "error". Sessions
+    close after IDLE_TIMEOUT seconds without a client message, and after
+    MAX_LIFETIME seconds in any case. All live sessions together lease at
+    most LIVE_POOL_SHARE of the pool, so game analysis and batches still
+    get engines.
+    """
+    sessions = get_live_sessions()
+    user = user_id or (websocket.client.host if websocket.client else "anonymous")
+    await websocket.accept()
+    
+    pool = get_engine_pool()
+    if pool is None:
+        await websocket.send_json({"type": "error", "message": "Engine pool not available"})
+        await websocket.close(code=1011)
+        return
+    
+    max_active = live_session_cap(pool)
+    if not sessions.open(user, max_active):
+        await websocket.send_json({
+            "type": "error",
+            "message": f"At most {sessions.max_per_user} live sessions per user and {max_active} in total, try again later"
+        })
+        await websocket.close(code=1008)
+        return
+    
+    session = None
+    try:
+        try:
+            engine = await pool.acquire(timeout=LEASE_TIMEOUT)
+        except (asyncio.TimeoutError, RuntimeError):
+            await websocket.send_json({"type": "error", "message": "All engines are busy, try again later"})
+            await websocket.close(code=1013)
+            return
+        
+        session = LiveSession(engine, pool, websocket.send_json)
+        await session.send({
+            "type": "ready", "engine": session.engine_name,
+            "idle_timeout": IDLE_TIMEOUT, "max_lifetime": MAX_LIFETIME
+        })
+        
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + MAX_LIFETIME
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    websocket.receive_json(), timeout=max(0.0, min(IDLE_TIMEOUT, expires_at - loop.time()))
+                )
+            except asyncio.TimeoutError:
+                # Pings only reset the idle timeout, never the lifetime
+                expired = loop.time() >= expires_at
+                if expired:
+                    sessions.expired += 1
+                else:
+                    sessions.idle_timeouts += 1
+                await session.close()
+                session = None
+                await websocket.send_json({"type": "closed", "reason": "lifetime" if expired else "idle"})
+                await websocket.close(code=1000)
+                return
+            except ValueError:
+                await session.send({"type": "error", "message": "Messages must be JSON"})
+                continue
+            await session.handle(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if session is not None:
+            await session.close()
+        sessions.close(user)
+
+
 # ============= AI Coach Endpoints =============
 
 class OpeningRequest(BaseModel):
@@ -16,6 +16,7 @@ from api.models.game import (
 from api.services.chesscom import fetch_chesscom_games
 from api.services.lichess import fetch_lichess_games
 from api.database import get_games_collection
+from api.services.game_analyses import resolve_analysis
 
 router = APIRouter()
 
@@ -109,6 +110,7 @@ async def get_game(game_id: str):
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
+    game = await resolve_analysis(game)
     game["_id"] = str(game["_id"])
     return game
 
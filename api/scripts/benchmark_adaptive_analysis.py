@@ -0,0 +1,85 @@
+"""
+Benchmark adaptive (two-phase) analysis against uniform-depth analysis.
+
+Analyzes the same game at a uniform depth and adaptively (shallow sweep,
+then the same depth on critical plies only), and reports total engine
+search time, search count and how many move classifications agree with
+the uniform baseline (for both the provisional and the final result).
+The eval cache is disabled so every run searches from scratch.
+
+Run with: python api/scripts/benchmark_adaptive_analysis.py [depth] [sweep_depth] [deepen_ratio]
+(uses STOCKFISH_PATH or the usual Stockfish lookup)
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.engine_pool import EnginePool
+from api.services.stockfish_analyzer import StockfishAnalyzer
+
+# Kasparov vs Topalov, Wijk aan Zee 1999 (87 plies)
+PGN = """1. e4 d6 2. d4 Nf6 3. Nc3 g6 4. Be3 Bg7 5. Qd2 c6 6. f3 b5 7. Nge2 Nbd7
+8. Bh6 Bxh6 9. Qxh6 Bb7 10. a3 e5 11. O-O-O Qe7 12. Kb1 a6 13. Nc1 O-O-O
+14. Nb3 exd4 15. Rxd4 c5 16. Rd1 Nb6 17. g3 Kb8 18. Na5 Ba8 19. Bh3 d5
+20. Qf4+ Ka7 21. Rhe1 d4 22. Nd5 Nbxd5 23. exd5 Qd6 24. Rxd4 cxd4 25. Re7+ Kb6
+26. Qxd4+ Kxa5 27. b4+ Ka4 28. Qc3 Qxd5 29. Ra7 Bb7 30. Rxb7 Qc4 31. Qxf6 Kxa3
+32. Qxa6+ Kxb4 33. c3+ Kxc3 34. Qa1+ Kd2 35. Qb2+ Kd1 36. Bf1 Rd2 37. Rd7 Rxd7
+38. Bxc4 bxc4 39. Qxh8 Rd3 40. Qa8 c3 41. Qa4+ Ke1 42. f4 f5 43. Kc1 Rd2
+44. Qa7 1-0"""
+
+# Generous per-position cap so depth, not time, ends each search
+TIME_CAP = 30.0
+
+
+def agreement(results, baseline) -> float:
+    """Share of plies classified the same as the baseline"""
+    same = sum(1 for a, b in zip(results, baseline) if a.classification == b.classification)
+    return same / len(baseline) if baseline else 1.0
+
+
+async def benchmark():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 18
+    sweep_depth = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    deepen_ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+
+    # One engine per run so neither benefits from the other's hash table
+    pool = EnginePool(size=2, threads=1)
+    await pool.start()
+
+    print(f"♟️ Adaptive analysis benchmark (depth {depth}, sweep {sweep_depth}, deepen <= {deepen_ratio:.0%})")
+    try:
+        async with pool.lease() as engine:
+            uniform = StockfishAnalyzer(depth=depth, engine=engine, use_cache=False)
+            baseline = await uniform.analyze_game(PGN, TIME_CAP)
+
+        async with pool.lease() as engine:
+            provisional = []
+
+            async def on_provisional(results):
+                provisional.extend(results)
+
+            adaptive = StockfishAnalyzer(depth=depth, engine=engine, use_cache=False)
+            results = await adaptive.analyze_game_adaptive(
+                PGN, TIME_CAP, sweep_depth=sweep_depth, deepen_ratio=deepen_ratio,
+                on_provisional=on_provisional
+            )
+    finally:
+        await pool.stop()
+
+    print(f"   Uniform:  {uniform.search_time:7.2f}s engine time, {uniform.searches} searches")
+    print(f"   Adaptive: {adaptive.search_time:7.2f}s engine time, {adaptive.searches} searches "
+          f"(speedup x{uniform.search_time / max(adaptive.search_time, 1e-9):.2f})")
+    print(f"   Classification agreement with uniform: provisional {agreement(provisional, baseline):.1%}, "
+          f"final {agreement(results, baseline):.1%}")
+
+    changed = [(b.ply, b.move, b.classification, r.classification)
+               for b, r in zip(baseline, results) if b.classification != r.classification]
+    for ply, move, expected, got in changed:
+        print(f"      ply {ply:3d} {move:8s} uniform={expected:11s} adaptive={got}")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
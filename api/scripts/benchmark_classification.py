@@ -0,0 +1,212 @@
+"""
+Benchmark and check the vectorized whole-game classification.
+
+Generates synthetic analysed games (random eval walks with blunders, mates,
+unknown evals and promotions) and compares api.services.classification with
+the per-move Python loops it replaced:
+- classifications must match the scalar cp-loss classifier exactly
+- statistics must match the old run_analysis_task block (precision, counts,
+  average blunder loss, top critical moments)
+- accuracy must match a direct port of Lichess's per-move and game accuracy
+Then times reclassifying every game with the loops, game by game, and all
+games in one vectorized pass (classify_stored_games).
+
+Run with: python api/scripts/benchmark_classification.py [games]
+"""
+
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.classification import classify_results, classify_stored_games, game_statistics
+
+
+def legacy_classify(cp_before, cp_after, is_white, san, move_number, is_book):
+    """The scalar classify_move_by_cp_loss as it was before vectorization"""
+    if is_book:
+        return "book"
+    if cp_before is None or cp_after is None:
+        return "normal"
+    cp_loss = cp_before - cp_after if is_white else cp_after - cp_before
+    if cp_loss == 0:
+        return "best"
+    if cp_loss <= 5 and "=" in san:
+        return "brilliant"
+    if cp_loss <= 10:
+        return "great"
+    elif cp_loss <= 25:
+        return "excellent"
+    elif cp_loss <= 50:
+        return "good"
+    elif cp_loss <= 100:
+        return "inaccuracy"
+    elif cp_loss <= 250:
+        return "mistake"
+    return "blunder"
+
+
+def legacy_statistics(results):
+    """The statistics block of run_analysis_task before vectorization"""
+    blunders = [r for r in results if r.get("classification") == "blunder"]
+    white_moves = [r for r in results if r["ply"] % 2 == 1]
+    black_moves = [r for r in results if r["ply"] % 2 == 0]
+
+    def calc_precision(moves):
+        if not moves:
+            return 0
+        good = [m for m in moves if m.get("classification") in
+                ["brilliant", "great", "best", "excellent", "good", "book"]]
+        return round((len(good) / len(moves)) * 100)
+
+    def loss(r):
+        before = r.get("eval_before", 0) or 0
+        after = r.get("eval_after", 0) or 0
+        return abs((before - after) if r["ply"] % 2 == 1 else (after - before))
+
+    critical = [
+        {"move": (r["ply"] + 1) // 2, "played": r["move"], "cp_loss": loss(r)}
+        for r in results if r.get("classification") in ["blunder", "mistake"]
+    ]
+    critical.sort(key=lambda x: x["cp_loss"], reverse=True)
+
+    return {
+        "total_moves": len(results),
+        "blunders": len(blunders),
+        "mistakes": len([r for r in results if r.get("classification") == "mistake"]),
+        "inaccuracies": len([r for r in results if r.get("classification") == "inaccuracy"]),
+        "avg_blunder_cp": sum(loss(b) for b in blunders) / len(blunders) if blunders else 0,
+        "white_precision": calc_precision(white_moves),
+        "black_precision": calc_precision(black_moves),
+        "top_critical": critical[:3]
+    }
+
+
+def lichess_accuracy(results):
+    """Direct port of Lichess AccuracyPercent.gameAccuracy (games without unknown evals)"""
+    def win(cp):
+        cp = max(-1000, min(1000, cp))
+        return 50 + 50 * (2 / (1 + math.exp(-0.00368208 * cp)) - 1)
+
+    def move_accuracy(before, after):
+        if after >= before:
+            return 100.0
+        raw = 103.1668100711649 * math.exp(-0.04354415386753951 * (before - after)) - 3.166924740191411
+        return max(0.0, min(100.0, raw + 1))
+
+    wins = [win(results[0]["eval_before"])] + [win(r["eval_after"]) for r in results]
+    window = max(2, min(8, len(results) // 10))
+    window = min(window, len(wins))
+    windows = [wins[:window]] * (window - 2) + [wins[i:i + window] for i in range(len(wins) - window + 1)]
+
+    def std(xs):
+        mean = sum(xs) / len(xs)
+        return math.sqrt(sum((x - mean) ** 2 for x in xs) / len(xs))
+
+    weights = [max(0.5, min(12, std(w))) for w in windows]
+    per_color = {True: [], False: []}
+    for i, weight in enumerate(weights[:len(results)]):
+        white = i % 2 == 0
+        before, after = wins[i], wins[i + 1]
+        if not white:
+            before, after = 100 - before, 100 - after
+        per_color[white].append((move_accuracy(before, after), weight))
+
+    out = {}
+    for white, values in per_color.items():
+        if not values:
+            out[white] = None
+            continue
+        weighted = sum(a * w for a, w in values) / sum(w for _, w in values)
+        harmonic = len(values) / sum(1 / max(a, 1) for a, _ in values)
+        out[white] = round((weighted + harmonic) / 2, 1)
+    return out[True], out[False]
+
+
+def synthetic_game(rng: random.Random):
+    plies = rng.randint(20, 140)
+    evals = [20]
+    for _ in range(plies):
+        step = rng.choice([0, 0, 5, -5, 15, -15, 40, -40, 120, -120, 400, -400])
+        evals.append(max(-10000, min(10000, evals[-1] + step)))
+    if rng.random() < 0.1:
+        evals[-1] = 10000 if plies % 2 == 1 else -10000
+    complete = rng.random() < 0.7  # The rest have a few unknown evals
+    results = []
+    for ply in range(1, plies + 1):
+        before, after = evals[ply - 1], evals[ply]
+        if not complete and rng.random() < 0.03:
+            after = None
+        san = rng.choice(["e4", "Nf3", "Qxd7+", "exd8=Q"]) if ply > 20 else "e4"
+        results.append({"ply": ply, "move": san, "eval_before": before, "eval_after": after})
+    for prev, r in zip(results, results[1:]):
+        r["eval_before"] = prev["eval_after"]
+    for r in results:
+        r["classification"] = legacy_classify(
+            r["eval_before"], r["eval_after"], r["ply"] % 2 == 1, r["move"], (r["ply"] + 1) // 2,
+            (r["ply"] + 1) // 2 <= 10
+        )
+    return results, complete
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(7)
+    games = [synthetic_game(rng) for _ in range(count)]
+    plies = sum(len(g) for g, _ in games)
+    print(f"♟️ {count} synthetic games, {plies} plies")
+
+    mismatches = 0
+    for results, complete in games:
+        classified = classify_results(results)
+        if [str(c) for c in classified.classifications] != [r["classification"] for r in results]:
+            mismatches += 1
+            continue
+        stats = game_statistics(results, classified)
+        legacy = legacy_statistics(results)
+        if any(stats[key] != value for key, value in legacy.items()):
+            mismatches += 1
+            continue
+        if complete:
+            white, black = lichess_accuracy(results)
+            if (white, black) != (stats["white_accuracy"], stats["black_accuracy"]):
+                print(f"   accuracy {stats['white_accuracy']}/{stats['black_accuracy']} vs Lichess {white}/{black}")
+                mismatches += 1
+
+    start = time.perf_counter()
+    for results, _ in games:
+        for r in results:
+            legacy_classify(r["eval_before"], r["eval_after"], r["ply"] % 2 == 1, r["move"],
+                            (r["ply"] + 1) // 2, (r["ply"] + 1) // 2 <= 10)
+        legacy_statistics(results)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for results, _ in games:
+        game_statistics(results, classify_results(results))
+    vector_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = classify_stored_games([results for results, _ in games])
+    for (results, _), classified in zip(games, batch):
+        game_statistics(results, classified)
+    batch_time = time.perf_counter() - start
+    for (results, _), classified in zip(games, batch):
+        if [str(c) for c in classified.classifications] != [r["classification"] for r in results]:
+            mismatches += 1
+
+    print(f"   Python loops (no accuracy):       {legacy_time:6.2f}s ({count / legacy_time:8.0f} games/s)")
+    print(f"   Per game vectorized (+accuracy):  {vector_time:6.2f}s ({count / vector_time:8.0f} games/s)")
+    print(f"   All games in one pass (+accuracy): {batch_time:5.2f}s ({count / batch_time:8.0f} games/s)")
+
+    if mismatches:
+        print(f"\n❌ {mismatches} game(s) differ")
+        sys.exit(1)
+    print("\n✅ Classifications, statistics and accuracy match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark the motif-tagging stage (api.services.tactics.MotifTagger).
+
+Checks a few hand-labelled plies, then times tagging whole games on the
+positions the analysis already replayed, with no errors, one ply in ten a
+blunder (each blunder also plays the opponent's reply) and, as a stress
+case, every ply a blunder. 95% of games should take under 5 ms (one
+slow game on a busy machine doesn't fail the check).
+
+Run with: python api/scripts/benchmark_motif_tagging.py [games]
+"""
+
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import chess
+import chess.pgn
+
+from api.services.tactics import MotifTagger
+
+BUDGET_MS = 5.0
+
+OPERA_GAME = (
+    "1. e4 e5 2. Nf3 d6 3. d4 Bg4 4. dxe5 Bxf3 5. Qxf3 dxe5 6. Bc4 Nf6 7. Qb3 Qe7 "
+    "8. Nc3 c6 9. Bg5 b5 10. Nxb5 cxb5 11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7 "
+    "14. Rd1 Qe6 15. Bxd7+ Nxd7 16. Qb8+ Nxb8 17. Rd8# 1-0"
+)
+
+# (description, PGN, ply, classification, best reply, sacrifice, motifs expected among
+# the tags, motifs that must not be tagged)
+LABELLED = [
+    ("Rd8# is a back-rank mate", OPERA_GAME, 33, "best", None, False, {"back_rank"},
+     {"skewer", "hanging_piece"}),
+    ("Qb8+ is a queen sacrifice", OPERA_GAME, 31, "brilliant", None, True, {"sacrifice"}, set()),
+    ("Bg5 pins the knight to the queen", OPERA_GAME, 17, "good", None, False, {"pin"}, set()),
+    ("Bxd7+ forks king and queen", OPERA_GAME, 29, "best", None, False, {"fork"}, set()),
+    ("Nf6?? allows the Nc7+ fork", "1. e4 c6 2. Nc3 d5 3. Nb5 Nf6", 6, "blunder", "b5c7", False,
+     {"fork"}, set()),
+    ("Qh4?? leaves the queen hanging", "1. e4 e5 2. Nf3 Qh4", 4, "blunder", "f3h4", False,
+     {"hanging_piece"}, set()),
+]
+
+
+def replay(pgn: str):
+    game = chess.pgn.read_game(io.StringIO(pgn))
+    board = game.board()
+    positions = [board.copy()]
+    for move in game.mainline_moves():
+        board.push(move)
+        positions.append(board.copy())
+    return positions
+
+
+def random_game(rng: random.Random, plies: int):
+    board = chess.Board()
+    positions = [board.copy()]
+    for _ in range(plies):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        forcing = [m for m in moves if board.is_capture(m) or board.gives_check(m)]
+        board.push(rng.choice(forcing if forcing and rng.random() < 0.3 else moves))
+        positions.append(board.copy())
+    return positions
+
+
+def any_reply(board: chess.Board):
+    move = next(iter(board.legal_moves), None)
+    return move.uci() if move else None
+
+
+def check() -> int:
+    failures = 0
+    for description, pgn, ply, classification, reply, sacrifice, expected, unexpected in LABELLED:
+        motifs = MotifTagger(replay(pgn)).tag(ply, classification, reply, sacrifice)
+        missing, wrong = expected - set(motifs), unexpected & set(motifs)
+        failures += bool(missing or wrong)
+        status = "MISSING" if missing else "WRONG" if wrong else "OK"
+        print(f"{status}: {description} -> {motifs}")
+    return failures
+
+
+def bench(games, blunder_rate: float, repeat: int = 5) -> list:
+    """
+    Best-of-`repeat` ms per game: a fresh tagger each time, with each move's
+    SEE (material_offered) first, as in an analysis
+    """
+    rng = random.Random(11)
+    times = [float("inf")] * len(games)
+    for i, positions in enumerate(games):
+        classifications = [
+            "blunder" if rng.random() < blunder_rate else "good" for _ in positions[1:]
+        ]
+        replies = [any_reply(b) for b in positions[1:]]
+        for _ in range(repeat):
+            started = time.perf_counter()
+            tagger = MotifTagger(positions)
+            offered = [tagger.material_offered(ply) for ply in range(1, len(positions))]
+            tagger.tag_all(classifications, replies, [o >= 200 for o in offered])
+            times[i] = min(times[i], (time.perf_counter() - started) * 1000)
+    return times
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    failures = check()
+    if failures:
+        print(f"\n❌ {failures} labelled ply/plies mis-tagged")
+        sys.exit(1)
+
+    rng = random.Random(7)
+    games = [random_game(rng, 80) for _ in range(count)] + [replay(OPERA_GAME)]
+    print(f"\nTagging {len(games)} games (~80 plies, ms per game, best of 5):")
+    slowest = 0.0
+    for label, blunder_rate in (("no errors", 0.0), ("10% errors", 0.1), ("all errors", 1.0)):
+        times = sorted(bench(games, blunder_rate))
+        mean = sum(times) / len(times)
+        p95 = times[int(len(times) * 0.95)]
+        print(f"   {label:<11} mean {mean:5.2f}   p95 {p95:5.2f}   max {times[-1]:5.2f}")
+        if blunder_rate < 1.0:
+            slowest = max(slowest, p95)
+
+    # Every ply a blunder or mistake is a stress case, not a game
+    if slowest >= BUDGET_MS:
+        print(f"\n❌ 95th percentile game took {slowest:.2f} ms (budget {BUDGET_MS} ms)")
+        sys.exit(1)
+    print(f"\n✅ Motif tagging stays under {BUDGET_MS} ms per game (95th percentile)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Benchmark the tactics detectors and puzzle motif tagging on labelled puzzles.
+
+Loads puzzles in the Lichess puzzle CSV format (PuzzleId, FEN, Moves,
+Themes...) and uses their themes as labels. The checked-in fixture
+(api/scripts/fixtures/lichess_puzzles_sample.csv) holds 20 small puzzles
+labelled by hand with Lichess theme names; pass the Lichess database
+export (lichess_db_puzzle.csv, or .gz) with --csv, plus --limit, for a
+bigger run.
+
+Reports:
+- throughput of each api.services.tactics detector (positions/s) on the
+  positions after every solver move, and of tag_puzzle (puzzles/s)
+- precision and recall per motif: tag_puzzle's motifs against the themes
+  (THEME_MOTIFS), and how often the computed phase matches a phase theme
+- memory: tracemalloc peak of one pass of each detector and of tagging
+
+--json writes the results for comparison between commits; --compare reads
+an earlier run and fails if precision or recall dropped on the same corpus
+or a detector got more than --tolerance slower.
+
+Run with: python api/scripts/benchmark_motifs.py [--csv PATH] [--limit N]
+          [--json PATH] [--compare PATH] [--tolerance 0.25]
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import chess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from api.services import tactics
+from api.services.puzzle_tagging import tag_puzzle
+
+FIXTURE = os.path.join(ROOT, "api", "scripts", "fixtures", "lichess_puzzles_sample.csv")
+
+# Lichess puzzle themes and the motif tag_puzzle should give them
+THEME_MOTIFS = {
+    "fork": "fork",
+    "pin": "pin",
+    "skewer": "skewer",
+    "discoveredAttack": "discovery",
+    "hangingPiece": "hanging_piece",
+    "backRankMate": "back_rank",
+    "sacrifice": "sacrifice",
+}
+PHASE_THEMES = ("opening", "middlegame", "endgame")
+
+# (detector, called with the board after a solver move and that move)
+DETECTORS = {
+    "fork": tactics.detect_fork,
+    "pin": lambda board, move: tactics.detect_pin(board),
+    "relative_pin": lambda board, move: tactics.detect_pin(board, relative=True),
+    "skewer": lambda board, move: tactics.detect_skewer(board),
+    "xray": lambda board, move: tactics.detect_xray(board),
+    "discovery": tactics.detect_discovery,
+    "hanging_piece": lambda board, move: tactics.detect_hanging_pieces(board),
+}
+
+# Each throughput figure is the best of this many runs of at least MIN_SECONDS
+TRIALS = 5
+MIN_SECONDS = 0.2
+
+
+def load_puzzles(path: str, limit: int):
+    """Puzzles ({"id", "fen", "moves", "themes"}) from a Lichess puzzle CSV"""
+    opener = gzip.open if path.endswith(".gz") else open
+    puzzles = []
+    with opener(path, "rt", newline="") as f:
+        for row in csv.DictReader(f):
+            puzzles.append({
+                "id": row["PuzzleId"], "fen": row["FEN"],
+                "moves": row["Moves"].split(), "themes": row["Themes"].split()
+            })
+            if limit and len(puzzles) >= limit:
+                break
+    return puzzles
+
+
+def solver_positions(puzzle):
+    """(board after the move, move) for every solver move, and the board the solver starts from"""
+    board = chess.Board(puzzle["fen"])
+    positions = []
+    start = None
+    for ply, uci in enumerate(puzzle["moves"], start=1):
+        move = chess.Move.from_uci(uci)
+        board.push(move)
+        if ply == 1:
+            start = board.copy(stack=False)
+        elif ply % 2 == 0:
+            positions.append((board.copy(stack=False), move))
+    return positions, start
+
+
+def rate(function, items) -> float:
+    """Best calls per second of `function` over `items` (each run repeats them for MIN_SECONDS)"""
+    best = 0.0
+    for _ in range(TRIALS):
+        calls = 0
+        started = time.perf_counter()
+        while True:
+            for item in items:
+                function(*item)
+            calls += len(items)
+            elapsed = time.perf_counter() - started
+            if elapsed >= MIN_SECONDS:
+                break
+        best = max(best, calls / elapsed)
+    return best
+
+
+def peak_kib(function, items) -> float:
+    """tracemalloc peak (KiB) of one pass of `function` over `items`"""
+    tracemalloc.start()
+    try:
+        for item in items:
+            function(*item)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def accuracy(puzzles, tagged):
+    """Per-motif counts, precision and recall, and phase agreement"""
+    counts = {motif: {"tp": 0, "fp": 0, "fn": 0} for motif in THEME_MOTIFS.values()}
+    phases = agreed = 0
+    for puzzle, result in zip(puzzles, tagged):
+        if result is None:
+            continue
+        expected = {THEME_MOTIFS[t] for t in puzzle["themes"] if t in THEME_MOTIFS}
+        found = set(result["motifs"]) & set(counts)
+        for motif, c in counts.items():
+            if motif in found:
+                c["tp" if motif in expected else "fp"] += 1
+            elif motif in expected:
+                c["fn"] += 1
+        labelled = [t for t in puzzle["themes"] if t in PHASE_THEMES]
+        if labelled:
+            phases += 1
+            agreed += result["phase"] == labelled[0]
+
+    for c in counts.values():
+        predicted, actual = c["tp"] + c["fp"], c["tp"] + c["fn"]
+        c["precision"] = round(c["tp"] / predicted, 4) if predicted else None
+        c["recall"] = round(c["tp"] / actual, 4) if actual else None
+    return counts, round(agreed / phases, 4) if phases else None
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, previous: dict, tolerance: float) -> list:
+    """Regressions of `results` against an earlier run"""
+    regressions = []
+    print(f"\nCompared with {previous.get('commit') or 'the earlier run'}:")
+    same_corpus = results["corpus"] == previous.get("corpus")
+    if same_corpus:
+        for motif, c in results["motifs"].items():
+            before = previous.get("motifs", {}).get(motif, {})
+            for metric in ("precision", "recall"):
+                old, new = before.get(metric), c[metric]
+                if old is not None and (new is None or new < old):
+                    regressions.append(f"{motif} {metric} {old} -> {new}")
+    else:
+        print("   Different corpus: precision and recall not compared")
+
+    for name, new in results["throughput"].items():
+        old = previous.get("throughput", {}).get(name)
+        if not old:
+            continue
+        change = new / old - 1
+        flag = change < -tolerance
+        print(f"   {name:<14} {old:10,.0f} -> {new:10,.0f}/s  {change:+6.1%}{'  (slower)' if flag else ''}")
+        if flag:
+            regressions.append(f"{name} throughput {change:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tactics detectors on labelled puzzles")
+    parser.add_argument("--csv", default=FIXTURE, help="Lichess puzzle CSV (.csv or .csv.gz)")
+    parser.add_argument("--limit", type=int, default=0, help="Use the first N puzzles (0 = all)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed throughput drop (fraction)")
+    args = parser.parse_args()
+
+    puzzles = []
+    positions = []
+    unreadable = 0
+    for puzzle in load_puzzles(args.csv, args.limit):
+        try:
+            solved, start = solver_positions(puzzle)
+        except ValueError:
+            unreadable += 1
+            continue
+        if start is None:
+            unreadable += 1
+            continue
+        puzzles.append(puzzle)
+        positions.extend(solved)
+    print(f"{len(puzzles)} puzzles ({unreadable} unreadable), {len(positions)} solver positions "
+          f"from {os.path.relpath(args.csv, ROOT)}\n")
+    if not puzzles:
+        print("❌ No puzzles to benchmark")
+        sys.exit(1)
+
+    tagged = [tag_puzzle(puzzle) for puzzle in puzzles]
+    motifs, phase_agreement = accuracy(puzzles, tagged)
+    print("Motifs (tag_puzzle against the puzzle themes):")
+    print(f"   {'motif':<14} {'tp':>4} {'fp':>4} {'fn':>4}  precision  recall")
+    for motif, c in motifs.items():
+        precision = "-" if c["precision"] is None else f"{c['precision']:.2f}"
+        recall = "-" if c["recall"] is None else f"{c['recall']:.2f}"
+        print(f"   {motif:<14} {c['tp']:>4} {c['fp']:>4} {c['fn']:>4}  {precision:>9}  {recall:>6}")
+    if phase_agreement is not None:
+        print(f"   phase matches the phase theme on {phase_agreement:.0%} of puzzles")
+
+    throughput = {}
+    memory = {}
+    print(f"\nThroughput (best of {TRIALS}) and memory (tracemalloc peak, one pass):")
+    for name, detector in DETECTORS.items():
+        throughput[name] = round(rate(detector, positions))
+        memory[name] = round(peak_kib(detector, positions), 1)
+        print(f"   {name:<14} {throughput[name]:10,} positions/s   {memory[name]:8.1f} KiB")
+    items = [(puzzle,) for puzzle in puzzles]
+    throughput["tag_puzzle"] = round(rate(tag_puzzle, items))
+    memory["tag_puzzle"] = round(peak_kib(tag_puzzle, items), 1)
+    print(f"   {'tag_puzzle':<14} {throughput['tag_puzzle']:10,} puzzles/s     {memory['tag_puzzle']:8.1f} KiB")
+
+    results = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "chess": chess.__version__,
+        "corpus": {"path": os.path.relpath(args.csv, ROOT), "puzzles": len(puzzles), "positions": len(positions)},
+        "motifs": motifs,
+        "phase_agreement": phase_agreement,
+        "throughput": throughput,
+        "memory_kib": memory,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s): " + "; ".join(regressions))
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
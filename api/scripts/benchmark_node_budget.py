@@ -0,0 +1,86 @@
+"""
+Benchmark deterministic node-budget analysis against time-limited analysis.
+
+Analyzes the same game with a per-position time limit and with a per-position
+node budget (one thread, fixed hash cleared before each search), reports
+throughput for both, and checks that two node-budget runs on different
+engines give bit-identical evals while two time-limited runs usually don't.
+The eval cache is disabled so every run searches every position.
+
+Run with: python api/scripts/benchmark_node_budget.py [nodes] [time_per_move]
+(uses STOCKFISH_PATH or the usual Stockfish lookup)
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.engine_pool import EnginePool
+from api.services.stockfish_analyzer import StockfishAnalyzer
+
+# Kasparov vs Topalov, Wijk aan Zee 1999 (87 plies)
+PGN = """1. e4 d6 2. d4 Nf6 3. Nc3 g6 4. Be3 Bg7 5. Qd2 c6 6. f3 b5 7. Nge2 Nbd7
+8. Bh6 Bxh6 9. Qxh6 Bb7 10. a3 e5 11. O-O-O Qe7 12. Kb1 a6 13. Nc1 O-O-O
+14. Nb3 exd4 15. Rxd4 c5 16. Rd1 Nb6 17. g3 Kb8 18. Na5 Ba8 19. Bh3 d5
+20. Qf4+ Ka7 21. Rhe1 d4 22. Nd5 Nbxd5 23. exd5 Qd6 24. Rxd4 cxd4 25. Re7+ Kb6
+26. Qxd4+ Kxa5 27. b4+ Ka4 28. Qc3 Qxd5 29. Ra7 Bb7 30. Rxb7 Qc4 31. Qxf6 Kxa3
+32. Qxa6+ Kxb4 33. c3+ Kxc3 34. Qa1+ Kd2 35. Qb2+ Kd1 36. Bf1 Rd2 37. Rd7 Rxd7
+38. Bxc4 bxc4 39. Qxh8 Rd3 40. Qa8 c3 41. Qa4+ Ke1 42. f4 f5 43. Kc1 Rd2
+44. Qa7 1-0"""
+
+
+async def run(engine, **options):
+    """Analyze PGN on `engine`, return (wall time in seconds, results)"""
+    analyzer = StockfishAnalyzer(depth=99, engine=engine, use_cache=False, use_tablebase=False,
+                                 nodes=options.get("nodes"))
+    start = time.perf_counter()
+    try:
+        results = await analyzer.analyze_game(PGN, options.get("time_per_move", 0.1))
+    finally:
+        await analyzer.restore_engine_options()
+    return time.perf_counter() - start, results
+
+
+def fingerprint(results):
+    return [(r.eval_after, r.mate_after, tuple(r.pv), r.depth) for r in results]
+
+
+async def benchmark():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    time_per_move = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+
+    # Two engines so reproducibility is checked across processes, not just runs
+    pool = EnginePool(size=2)
+    await pool.start()
+
+    print(f"♟️ Node-budget benchmark ({nodes} nodes vs {time_per_move}s per position, "
+          f"pool Threads={pool.threads})")
+    try:
+        async with pool.lease() as first, pool.lease() as second:
+            timed_a, timed_results_a = await run(first, time_per_move=time_per_move)
+            timed_b, timed_results_b = await run(second, time_per_move=time_per_move)
+            nodes_a, node_results_a = await run(first, nodes=nodes)
+            nodes_b, node_results_b = await run(second, nodes=nodes)
+            threads_after = first.config.get("Threads")
+    finally:
+        await pool.stop()
+
+    positions = len(timed_results_a) + 1
+    for label, elapsed in (("Time-limited", timed_a), ("Node budget ", nodes_a)):
+        print(f"   {label}: {elapsed:6.2f}s for {positions} positions ({positions / elapsed:5.1f} positions/s)")
+
+    timed_same = fingerprint(timed_results_a) == fingerprint(timed_results_b)
+    nodes_same = fingerprint(node_results_a) == fingerprint(node_results_b)
+    print(f"   Time-limited runs identical: {timed_same}")
+    print(f"   Node-budget runs identical:  {nodes_same}")
+    print(f"   Pool engine Threads restored: {threads_after == pool.threads}")
+
+    if not nodes_same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
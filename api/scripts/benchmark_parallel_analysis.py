@@ -0,0 +1,75 @@
+"""
+Benchmark intra-game parallel analysis.
+
+Analyzes the same game with 1..N engines leased from an EnginePool and
+reports wall time and speedup. The eval cache is disabled so every run
+searches every position.
+
+Run with: python api/scripts/benchmark_parallel_analysis.py [max_engines] [time_per_move]
+(uses STOCKFISH_PATH or the usual Stockfish lookup)
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.engine_pool import EnginePool
+from api.services.stockfish_analyzer import StockfishAnalyzer
+
+# Kasparov vs Topalov, Wijk aan Zee 1999 (87 plies)
+PGN = """1. e4 d6 2. d4 Nf6 3. Nc3 g6 4. Be3 Bg7 5. Qd2 c6 6. f3 b5 7. Nge2 Nbd7
+8. Bh6 Bxh6 9. Qxh6 Bb7 10. a3 e5 11. O-O-O Qe7 12. Kb1 a6 13. Nc1 O-O-O
+14. Nb3 exd4 15. Rxd4 c5 16. Rd1 Nb6 17. g3 Kb8 18. Na5 Ba8 19. Bh3 d5
+20. Qf4+ Ka7 21. Rhe1 d4 22. Nd5 Nbxd5 23. exd5 Qd6 24. Rxd4 cxd4 25. Re7+ Kb6
+26. Qxd4+ Kxa5 27. b4+ Ka4 28. Qc3 Qxd5 29. Ra7 Bb7 30. Rxb7 Qc4 31. Qxf6 Kxa3
+32. Qxa6+ Kxb4 33. c3+ Kxc3 34. Qa1+ Kd2 35. Qb2+ Kd1 36. Bf1 Rd2 37. Rd7 Rxd7
+38. Bxc4 bxc4 39. Qxh8 Rd3 40. Qa8 c3 41. Qa4+ Ke1 42. f4 f5 43. Kc1 Rd2
+44. Qa7 1-0"""
+
+
+async def run(engine_count: int, pool: EnginePool, time_per_move: float):
+    """Analyze PGN with `engine_count` engines, return (wall time in seconds, plies analyzed)"""
+    engines = [await pool.acquire() for _ in range(engine_count)]
+    try:
+        analyzer = StockfishAnalyzer(depth=40, engine=engines[0], use_cache=False)
+        progress = []
+
+        async def callback(ply, total):
+            progress.append(ply)
+
+        start = time.perf_counter()
+        results = await analyzer.analyze_game(PGN, time_per_move, callback, engines=engines[1:])
+        elapsed = time.perf_counter() - start
+
+        assert progress == list(range(1, len(results) + 1)), "callback out of ply order"
+        return elapsed, len(results)
+    finally:
+        for engine in engines:
+            pool.release(engine)
+
+
+async def benchmark():
+    max_engines = int(sys.argv[1]) if len(sys.argv) > 1 else min(4, os.cpu_count() or 1)
+    time_per_move = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+
+    pool = EnginePool(size=max_engines, threads=1)
+    await pool.start()
+
+    print(f"♟️ Parallel analysis benchmark ({time_per_move}s/position, Threads=1 per engine)")
+    baseline = None
+    try:
+        counts = sorted({1, 2, max_engines} | set(range(2, max_engines + 1, 2)))
+        for count in counts:
+            elapsed, plies = await run(count, pool, time_per_move)
+            baseline = baseline or elapsed
+            print(f"   {count} engine(s): {elapsed:6.2f}s for {plies} plies "
+                  f"({(plies + 1) / elapsed:5.1f} positions/s, speedup x{baseline / elapsed:.2f})")
+    finally:
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
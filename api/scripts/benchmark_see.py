@@ -0,0 +1,193 @@
+"""
+Benchmark and check static exchange evaluation (api.services.see).
+
+Builds a corpus of positions from seeded random games (captures and checks
+favoured) and compares ExchangeEvaluator with a slow reference that plays
+the exchange out on board copies (board.attackers after each capture, so
+x-rays show up by themselves):
+- the SEE of every capture and of a few quiet moves per position
+- the threat on every piece (what capturing it wins)
+- a few hand-checked exchanges
+Then times a hanging-piece sweep (SEE on every attacked piece of both
+colours, fresh evaluator per position) against a target of 3000
+positions per second.
+
+Run with: python api/scripts/benchmark_see.py [games]
+"""
+
+import os
+import random
+import sys
+import time
+
+import chess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.see import SEE_VALUES, ExchangeEvaluator
+from api.services.tactics import hanging_pieces
+
+TARGET_POSITIONS_PER_SECOND = 3000
+
+# Hand-checked exchanges: (description, FEN, move, expected SEE)
+LABELLED_MOVES = [
+    ("Rxe5 wins an undefended pawn", "1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 100),
+    ("Nxe5 loses the knight for a pawn (x-rays on both sides)",
+     "1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", -200),
+    ("Rxd5 with the queen behind wins the pawn", "3r2k1/8/8/3p4/8/8/3R4/3Q2K1 w - - 0 1", "d2d5", 100),
+    ("Qxd5 into a defended pawn loses the queen", "6k1/8/2p5/3p4/8/8/8/3Q2K1 w - - 0 1", "d1d5", -800),
+    ("Quiet Nd5 onto a pawn-guarded square hangs the knight",
+     "6k1/8/4p3/8/8/2N5/8/6K1 w - - 0 1", "c3d5", -300),
+    ("Promotion with capture on an undefended square", "1r4k1/P7/8/8/8/8/8/6K1 w - - 0 1", "a7b8q", 1300),
+]
+
+# (description, FEN, square, expected threat)
+LABELLED_THREATS = [
+    ("A pawn attacks a defended rook", "3r2k1/8/8/3r4/2P5/8/8/6K1 w - - 0 1", chess.D5, 400),
+    ("A defended knight attacked by a rook is safe", "6k1/8/4p3/3n4/8/8/8/3R2K1 w - - 0 1", chess.D5, 0),
+    ("Doubled rooks win a knight defended once", "6k1/8/3n4/8/8/8/3R4/3R2K1 w - - 0 1", chess.D6, 300),
+    ("The king can't recapture with a rook behind", "8/8/8/3n4/4k3/8/3R4/3R2K1 w - - 0 1", chess.D5, 300),
+]
+
+
+# Reference: play the exchange out on board copies
+
+def least_valuable_attacker(board: chess.Board, square: chess.Square):
+    """The side to move's least valuable piece attacking `square` (lowest square first)"""
+    for piece_type in chess.PIECE_TYPES:
+        attackers = board.attackers_mask(board.turn, square) & board.pieces_mask(piece_type, board.turn)
+        if attackers:
+            return chess.lsb(attackers)
+    return None
+
+
+def capture(board: chess.Board, from_square: chess.Square, to_square: chess.Square, promotion=None):
+    """Copy of `board` with the piece on from_square moved onto to_square, other side to move"""
+    board = board.copy(stack=False)
+    piece = board.remove_piece_at(from_square)
+    if promotion:
+        piece = chess.Piece(promotion, piece.color)
+    board.set_piece_at(to_square, piece)
+    board.turn = not board.turn
+    return board
+
+
+def reference_exchange(board: chess.Board, square: chess.Square) -> int:
+    """What the side to move wins (>= 0) by capturing on `square` and trading on"""
+    attacker = least_valuable_attacker(board, square)
+    if attacker is None:
+        return 0
+    captured = SEE_VALUES[board.piece_type_at(square)]
+    after = capture(board, attacker, square)
+    if board.piece_type_at(attacker) == chess.KING and after.attackers_mask(after.turn, square):
+        return 0
+    return max(0, captured - reference_exchange(after, square))
+
+
+def reference_move(board: chess.Board, move: chess.Move) -> int:
+    if board.is_castling(move):
+        return 0
+    gain = 0
+    if board.is_en_passant(move):
+        gain = SEE_VALUES[chess.PAWN]
+        board = board.copy(stack=False)
+        board.remove_piece_at(chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square)))
+    elif board.piece_type_at(move.to_square):
+        gain = SEE_VALUES[board.piece_type_at(move.to_square)]
+    if move.promotion:
+        gain += SEE_VALUES[move.promotion] - SEE_VALUES[chess.PAWN]
+    return gain - reference_exchange(capture(board, move.from_square, move.to_square, move.promotion), move.to_square)
+
+
+def reference_threat(board: chess.Board, square: chess.Square) -> int:
+    piece = board.piece_at(square)
+    if piece is None or piece.piece_type == chess.KING:
+        return 0
+    board = board.copy(stack=False)
+    board.turn = not piece.color
+    return reference_exchange(board, square)
+
+
+def corpus(games: int, seed: int = 7):
+    """Boards from seeded random games, captures and checks favoured"""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        board = chess.Board()
+        for _ in range(rng.randint(20, 120)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            forcing = [m for m in moves if board.is_capture(m) or board.gives_check(m)]
+            board.push(rng.choice(forcing if forcing and rng.random() < 0.3 else moves))
+            positions.append(board.copy(stack=False))
+    return positions
+
+
+def check(positions) -> int:
+    failures = 0
+    for description, fen, uci, expected in LABELLED_MOVES:
+        see = ExchangeEvaluator(chess.Board(fen)).move(chess.Move.from_uci(uci))
+        ok = see == expected
+        failures += not ok
+        print(f"{'OK' if ok else 'MISMATCH'}: {description}: {see} (expected {expected})")
+    for description, fen, square, expected in LABELLED_THREATS:
+        threat = ExchangeEvaluator(chess.Board(fen)).threat(square)
+        ok = threat == expected
+        failures += not ok
+        print(f"{'OK' if ok else 'MISMATCH'}: {description}: {threat} (expected {expected})")
+
+    rng = random.Random(3)
+    moves = threats = differ = 0
+    for board in positions:
+        exchange = ExchangeEvaluator(board)
+        legal = list(board.legal_moves)
+        quiet = [m for m in legal if not board.is_capture(m)]
+        for move in [m for m in legal if board.is_capture(m)] + rng.sample(quiet, min(3, len(quiet))):
+            moves += 1
+            if exchange.move(move) != reference_move(board, move):
+                differ += 1
+                if differ <= 3:
+                    print(f"   {move.uci()} differs: {board.fen()}")
+        for square in chess.scan_forward(board.occupied & ~board.kings):
+            threats += 1
+            if exchange.threat(square) != reference_threat(board, square):
+                differ += 1
+                if differ <= 3:
+                    print(f"   threat on {chess.square_name(square)} differs: {board.fen()}")
+    print(f"{'OK' if not differ else 'MISMATCH'}: {moves} moves and {threats} threats, "
+          f"{differ} differ from the reference")
+    return failures + differ
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    positions = corpus(games)
+    print(f"{len(positions)} positions from {games} seeded random games\n")
+
+    failures = check(positions)
+    if failures:
+        print(f"\n❌ {failures} mismatch(es)")
+        sys.exit(1)
+
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for board in positions:
+            exchange = ExchangeEvaluator(board)
+            hanging_pieces(board, chess.WHITE, exchange)
+            hanging_pieces(board, chess.BLACK, exchange)
+        best = min(best, time.perf_counter() - started)
+    rate = len(positions) / best
+    print(f"\nHanging-piece sweep (both colours, best of 3): {rate:,.0f} positions/s, "
+          f"{best / len(positions) * 1e6:.1f} µs per position")
+
+    if rate < TARGET_POSITIONS_PER_SECOND:
+        print(f"\n❌ Below the {TARGET_POSITIONS_PER_SECOND} positions/s target")
+        sys.exit(1)
+    print(f"\n✅ SEE matches the reference at {rate:,.0f} positions/s "
+          f"(target {TARGET_POSITIONS_PER_SECOND})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Benchmark and check the bitboard tactics detectors.
+
+Builds a corpus of positions from seeded random games (captures and checks
+favoured) and compares api.services.tactics with:
+- the fork detector it replaced, which must match exactly
+- hanging pieces by the reference SEE in benchmark_see.py (captures played
+  out on board copies), which must match exactly
+- square-by-square ray walks with the same motif definitions (pins,
+  relative pins, skewers, x-rays, discoveries), which must match exactly
+- a few hand-checked positions with known motifs
+Then times the legacy and bitboard detectors per position.
+
+Run with: python api/scripts/benchmark_tactics.py [games]
+"""
+
+import os
+import random
+import sys
+import time
+
+import chess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services import tactics
+from benchmark_see import reference_threat
+
+
+# The detectors as they were before the bitboard rewrite
+
+def legacy_detect_fork(board: chess.Board, move: chess.Move) -> bool:
+    """
+    Detect if the moved piece is attacking two or more valuable targets.
+    """
+    moved_piece = board.piece_at(move.to_square)
+    if not moved_piece:
+        return False
+    
+    piece_values = {
+        chess.PAWN: 1,
+        chess.KNIGHT: 3,
+        chess.BISHOP: 3,
+        chess.ROOK: 5,
+        chess.QUEEN: 9,
+        chess.KING: 100  # King is always a valid target
+    }
+    
+    attacker_value = piece_values.get(moved_piece.piece_type, 0)
+    
+    # Get all squares attacked by the moved piece
+    attacked_squares = board.attacks(move.to_square)
+    
+    # Count valuable targets
+    valuable_targets = 0
+    target_value_sum = 0
+    
+    for square in attacked_squares:
+        target = board.piece_at(square)
+        if target and target.color != moved_piece.color:
+            target_value = piece_values.get(target.piece_type, 0)
+            if target_value >= attacker_value or target.piece_type == chess.KING:
+                valuable_targets += 1
+                target_value_sum += target_value
+    
+    # Fork exists if attacking 2+ valuable targets
+    return valuable_targets >= 2
+
+
+def legacy_detect_pin(board: chess.Board) -> bool:
+    """
+    Detect if any piece is absolutely pinned (pinned to the king).
+    """
+    for color in [chess.WHITE, chess.BLACK]:
+        king_square = board.king(color)
+        if king_square is None:
+            continue
+        
+        # Check all enemy sliding pieces
+        enemy_color = not color
+        
+        # Check for pins from rooks and queens (ranks/files)
+        for attacker_type in [chess.ROOK, chess.QUEEN]:
+            for attacker_square in board.pieces(attacker_type, enemy_color):
+                # Check if there's a ray between attacker and king
+                ray = chess.SquareSet.ray(attacker_square, king_square)
+                if not ray:
+                    continue
+                
+                # Count pieces in between
+                blocking_pieces = []
+                for sq in ray:
+                    if sq in [attacker_square, king_square]:
+                        continue
+                    piece = board.piece_at(sq)
+                    if piece:
+                        blocking_pieces.append((sq, piece))
+                
+                # Pin exists if exactly one friendly piece is blocking
+                if len(blocking_pieces) == 1:
+                    sq, piece = blocking_pieces[0]
+                    if piece.color == color:
+                        return True
+        
+        # Check for pins from bishops and queens (diagonals)
+        for attacker_type in [chess.BISHOP, chess.QUEEN]:
+            for attacker_square in board.pieces(attacker_type, enemy_color):
+                ray = chess.SquareSet.ray(attacker_square, king_square)
+                if not ray:
+                    continue
+                
+                blocking_pieces = []
+                for sq in ray:
+                    if sq in [attacker_square, king_square]:
+                        continue
+                    piece = board.piece_at(sq)
+                    if piece:
+                        blocking_pieces.append((sq, piece))
+                
+                if len(blocking_pieces) == 1:
+                    sq, piece = blocking_pieces[0]
+                    if piece.color == color:
+                        return True
+    
+    return False
+
+
+def legacy_detect_hanging_pieces(board: chess.Board) -> bool:
+    """
+    Detect if any piece is hanging (undefended and attacked).
+    Uses simplified static exchange evaluation.
+    """
+    for color in [chess.WHITE, chess.BLACK]:
+        for piece_type in [chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT, chess.PAWN]:
+            for square in board.pieces(piece_type, color):
+                # Check if piece is attacked
+                if not board.is_attacked_by(not color, square):
+                    continue
+                
+                # Check if piece is defended
+                if board.is_attacked_by(color, square):
+                    # Could still be hanging if attacker is less valuable
+                    # Simplified: just check if it's defended at all
+                    continue
+                
+                # Undefended and attacked = hanging
+                return True
+    
+    return False
+
+
+def legacy_detect_discovery(board: chess.Board, move: chess.Move) -> bool:
+    """
+    Detect if moving a piece revealed an attack from a sliding piece.
+    """
+    # Get the piece that was on the from-square before the move
+    from_square = move.from_square
+    to_square = move.to_square
+    
+    # Check if any friendly sliding piece is now attacking through the vacated square
+    moved_piece = board.piece_at(to_square)
+    if not moved_piece:
+        return False
+    
+    attacker_color = moved_piece.color
+    
+    for attacker_type in [chess.ROOK, chess.BISHOP, chess.QUEEN]:
+        for attacker_square in board.pieces(attacker_type, attacker_color):
+            if attacker_square == to_square:
+                continue
+            
+            # Check if the from_square was blocking an attack
+            ray = chess.SquareSet.ray(attacker_square, from_square)
+            if not ray:
+                continue
+            
+            # Find what's at the end of the ray (beyond from_square)
+            for sq in ray:
+                if sq == attacker_square or sq == from_square:
+                    continue
+                
+                target = board.piece_at(sq)
+                if target and target.color != attacker_color:
+                    # Found a discovered attack
+                    return True
+                elif target:
+                    break  # Blocked by another piece
+    
+    return False
+
+
+# Square-by-square references: walk each slider's rays one square at a time.
+# Same motif definitions as api.services.tactics (the legacy pin/discovery
+# loops walked the whole line through both squares instead of the segment
+# between them, and did not check the slider moves along that line).
+
+DIRECTIONS = {
+    chess.BISHOP: [(1, 1), (1, -1), (-1, 1), (-1, -1)],
+    chess.ROOK: [(1, 0), (-1, 0), (0, 1), (0, -1)],
+}
+DIRECTIONS[chess.QUEEN] = DIRECTIONS[chess.BISHOP] + DIRECTIONS[chess.ROOK]
+
+
+def walk(square, direction):
+    file, rank = chess.square_file(square), chess.square_rank(square)
+    while True:
+        file, rank = file + direction[0], rank + direction[1]
+        if not (0 <= file < 8 and 0 <= rank < 8):
+            return
+        yield chess.square(file, rank)
+
+
+def walk_lines(board, color):
+    """(slider, front, behind) found by walking every ray"""
+    lines = []
+    for piece_type in (chess.BISHOP, chess.ROOK, chess.QUEEN):
+        for slider in board.pieces(piece_type, color):
+            for direction in DIRECTIONS[piece_type]:
+                hits = [sq for sq in walk(slider, direction) if board.piece_at(sq)][:2]
+                if len(hits) == 2:
+                    lines.append((slider, hits[0], hits[1]))
+    return lines
+
+
+def walk_pin(board, relative=False):
+    for color in chess.COLORS:
+        for _, front, behind in walk_lines(board, not color):
+            a, b = board.piece_at(front), board.piece_at(behind)
+            if a.color == color and b.color == color and a.piece_type != chess.KING:
+                if b.piece_type == chess.KING or (relative and VALUES[b.piece_type] > VALUES[a.piece_type]):
+                    return True
+    return False
+
+
+def walk_skewer(board):
+    for color in chess.COLORS:
+        for _, front, behind in walk_lines(board, not color):
+            a, b = board.piece_at(front), board.piece_at(behind)
+            if a.color == color and b.color == color and b.piece_type != chess.KING:
+                if VALUES[a.piece_type] > VALUES[b.piece_type]:
+                    return True
+    return False
+
+
+def walk_xray(board):
+    for color in chess.COLORS:
+        for _, front, behind in walk_lines(board, color):
+            if board.piece_at(front).color != color and board.piece_at(behind).color == color:
+                return True
+    return False
+
+
+def reference_hanging(board):
+    """Any non-king piece the opponent wins material by capturing (reference SEE)"""
+    return any(reference_threat(board, square) > 0 for square in chess.scan_forward(board.occupied & ~board.kings))
+
+
+def walk_discovery(board, move):
+    moved = board.piece_at(move.to_square)
+    if not moved:
+        return False
+    for piece_type in (chess.BISHOP, chess.ROOK, chess.QUEEN):
+        for slider in board.pieces(piece_type, moved.color):
+            if slider == move.to_square:
+                continue
+            for direction in DIRECTIONS[piece_type]:
+                squares = list(walk(slider, direction))
+                if move.from_square not in squares:
+                    continue
+                path = squares[:squares.index(move.from_square)]
+                if any(board.piece_at(sq) for sq in path):
+                    continue
+                beyond = [sq for sq in squares[len(path) + 1:] if board.piece_at(sq)]
+                if beyond and board.piece_at(beyond[0]).color != moved.color:
+                    return True
+    return False
+
+
+VALUES = {chess.PAWN: 1, chess.KNIGHT: 3, chess.BISHOP: 3, chess.ROOK: 5, chess.QUEEN: 9, chess.KING: 100}
+
+# Hand-checked positions: (description, FEN, last move or None, expected motifs)
+LABELLED = [
+    ("Bb5 pins Nc6 to the king", "r1bqkbnr/ppp2ppp/2np4/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 0 4",
+     "f1b5", {"pin"}),
+    ("Rook pins a knight to the queen (relative only)", "3q2k1/8/3n4/8/8/8/8/3R2K1 w - - 0 1",
+     None, {"relative_pin"}),
+    ("Bishop skewers king and rook", "r7/8/8/3k4/8/5B2/8/6K1 b - - 0 1",
+     None, {"skewer"}),
+    ("Rook defends the knight through the enemy rook", "6k1/8/8/3N4/8/8/3r4/3R2K1 w - - 0 1",
+     None, {"xray", "hanging_piece"}),
+    ("Ne7+ uncovers the bishop on the pinned queen", "6k1/5q2/8/3N4/8/1B6/8/6K1 w - - 0 1",
+     "d5e7", {"discovery", "pin", "hanging_piece"}),
+    ("Nc7+ forks king and rook", "r3k3/8/8/3N4/8/8/8/4K3 w - - 0 1",
+     "d5c7", {"fork", "hanging_piece"}),
+    ("Undefended knight attacked by a pawn", "6k1/8/8/4n3/3P4/8/8/6K1 b - - 0 1",
+     None, {"hanging_piece"}),
+    ("Piece off the king's line is not pinned", "4k3/8/8/8/8/8/2N5/R5K1 w - - 0 1",
+     None, set()),
+    ("Rook does not pin along a diagonal", "7k/8/8/8/3n4/8/1R6/K7 w - - 0 1",
+     None, set()),
+]
+
+def motifs_of(board, move):
+    """Motifs of a position (after `move` when given) from the bitboard detectors"""
+    found = set()
+    if move is not None and tactics.detect_fork(board, move):
+        found.add("fork")
+    if move is not None and tactics.detect_discovery(board, move):
+        found.add("discovery")
+    if tactics.detect_pin(board):
+        found.add("pin")
+    elif tactics.detect_pin(board, relative=True):
+        found.add("relative_pin")
+    if tactics.detect_skewer(board):
+        found.add("skewer")
+    if tactics.detect_xray(board):
+        found.add("xray")
+    if tactics.detect_hanging_pieces(board):
+        found.add("hanging_piece")
+    return found
+
+
+def corpus(games: int, seed: int = 7):
+    """(board after move, move) from seeded random games, captures and checks favoured"""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        board = chess.Board()
+        for _ in range(rng.randint(20, 120)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            forcing = [m for m in moves if board.is_capture(m) or board.gives_check(m)]
+            move = rng.choice(forcing if forcing and rng.random() < 0.3 else moves)
+            board.push(move)
+            positions.append((board.copy(stack=False), move))
+    return positions
+
+
+def check(positions):
+    failures = 0
+    for description, fen, uci, expected in LABELLED:
+        board = chess.Board(fen)
+        move = None
+        if uci is not None:
+            move = chess.Move.from_uci(uci)
+            board.push(move)
+        found = motifs_of(board, move)
+        if found != expected:
+            failures += 1
+            print(f"   {description}: expected {sorted(expected)}, got {sorted(found)}")
+    print(f"{'OK' if not failures else 'MISMATCH'}: {len(LABELLED)} labelled positions")
+
+    checks = {
+        "fork": (lambda b, m: tactics.detect_fork(b, m), legacy_detect_fork),
+        "hanging_piece": (lambda b, m: tactics.detect_hanging_pieces(b), lambda b, m: reference_hanging(b)),
+        "pin": (lambda b, m: tactics.detect_pin(b), lambda b, m: walk_pin(b)),
+        "relative_pin": (lambda b, m: tactics.detect_pin(b, relative=True), lambda b, m: walk_pin(b, relative=True)),
+        "skewer": (lambda b, m: tactics.detect_skewer(b), lambda b, m: walk_skewer(b)),
+        "xray": (lambda b, m: tactics.detect_xray(b), lambda b, m: walk_xray(b)),
+        "discovery": (tactics.detect_discovery, walk_discovery),
+    }
+    for name, (new, reference) in checks.items():
+        found = differ = 0
+        for board, move in positions:
+            result = new(board, move)
+            found += result
+            if result != reference(board, move):
+                differ += 1
+                if differ <= 3:
+                    print(f"   {name} differs: {board.fen()} after {move.uci()}")
+        failures += differ
+        label = {"fork": "legacy", "hanging_piece": "reference SEE"}.get(name, "square walk")
+        print(f"{'OK' if not differ else 'MISMATCH'}: {name:<14} {found:>6} found, "
+              f"{differ} differ from the {label}")
+
+    # How often the legacy detectors disagree (for information)
+    for name, new, legacy, why in (
+        ("hanging_piece", lambda b, m: tactics.detect_hanging_pieces(b), lambda b, m: legacy_detect_hanging_pieces(b),
+         "defended counted as safe"),
+        ("pin", lambda b, m: tactics.detect_pin(b), lambda b, m: legacy_detect_pin(b), "whole-line walk"),
+        ("discovery", tactics.detect_discovery, legacy_detect_discovery, "whole-line walk"),
+    ):
+        differ = sum(new(b, m) != legacy(b, m) for b, m in positions)
+        print(f"   legacy {name} disagrees on {differ} of {len(positions)} positions ({why})")
+    return failures
+
+
+def bench(label, function, positions, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for board, move in positions:
+            function(board, move)
+        best = min(best, time.perf_counter() - started)
+    return best / len(positions) * 1e6
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    positions = corpus(games)
+    print(f"{len(positions)} positions from {games} seeded random games\n")
+
+    failures = check(positions)
+    if failures:
+        print(f"\n❌ {failures} mismatch(es)")
+        sys.exit(1)
+
+    print("\nMicrobenchmark (µs per position, best of 3):")
+    pairs = [
+        ("fork", legacy_detect_fork, tactics.detect_fork),
+        ("pin", lambda b, m: legacy_detect_pin(b), lambda b, m: tactics.detect_pin(b)),
+        ("hanging_piece", lambda b, m: legacy_detect_hanging_pieces(b), lambda b, m: tactics.detect_hanging_pieces(b)),
+        ("discovery", legacy_detect_discovery, tactics.detect_discovery),
+    ]
+    for name, legacy, new in pairs:
+        old_us = bench(name, legacy, positions)
+        new_us = bench(name, new, positions)
+        print(f"   {name:<14} legacy {old_us:8.2f}   bitboard {new_us:8.2f}   x{old_us / new_us:5.1f}")
+    for name, new in (
+        ("relative_pin", lambda b, m: tactics.detect_pin(b, relative=True)),
+        ("skewer", lambda b, m: tactics.detect_skewer(b)),
+        ("xray", lambda b, m: tactics.detect_xray(b)),
+    ):
+        print(f"   {name:<14} {'':15} bitboard {bench(name, new, positions):8.2f}")
+
+    print("\n✅ Bitboard detectors match the references")
+
+
+if __name__ == "__main__":
+    main()
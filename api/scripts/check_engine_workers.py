@@ -0,0 +1,162 @@
+"""
+Check remote engine workers: two worker daemons on localhost.
+
+Starts two `python -m api.engine_server` processes running the stand-in
+engine (api/scripts/standin_engine.py, so no Stockfish is needed), then:
+- analyses a game through the EngineWorkerPool and compares every move with
+  the same analysis on a local EnginePool (also with a node budget)
+- checks that searches were spread over both workers
+- cancels a search after its request went out: the connection is dropped,
+  so the next search on the lease doesn't get the old reply
+- kills one worker and analyses again: searches fail over to the other one
+  with the same results, and the health check takes the dead worker out
+- restarts it and checks the health check brings it back
+
+Run with: python api/scripts/check_engine_workers.py
+"""
+
+import asyncio
+import os
+import socket
+import sys
+
+import chess
+import chess.engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from api.services.engine_pool import EnginePool, is_engine_alive
+from api.services.engine_workers import EngineWorkerPool, RemoteEngine
+from api.services.stockfish_analyzer import StockfishAnalyzer
+
+STANDIN_ENGINE = os.path.join(ROOT, "api", "scripts", "standin_engine.py")
+
+GAME = (
+    "1. e4 e5 2. Nf3 d6 3. d4 Bg4 4. dxe5 Bxf3 5. Qxf3 dxe5 6. Bc4 Nf6 7. Qb3 Qe7 "
+    "8. Nc3 c6 9. Bg5 b5 10. Nxb5 cxb5 11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7 "
+    "14. Rd1 Qe6 15. Bxd7+ Nxd7 16. Qb8+ Nxb8 17. Rd8# 1-0"
+)
+TWO_QUEENS_FEN = "3qk3/8/8/8/8/8/8/3QK2Q w - - 0 1"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_worker(port: int) -> asyncio.subprocess.Process:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "api.engine_server", "--host", "127.0.0.1", "--port", str(port),
+        "--engine", STANDIN_ENGINE, "--size", "2",
+        cwd=ROOT, stdout=asyncio.subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return process
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"engine worker on port {port} did not start")
+
+
+async def analyse(pool, **options):
+    """Analyse GAME on up to 4 engines leased from `pool`"""
+    engine = await pool.acquire()
+    extra = [e for e in (pool.try_acquire() for _ in range(3)) if e is not None]
+    analyzer = StockfishAnalyzer(engine=engine, pool=pool, use_cache=False, use_tablebase=False, **options)
+    try:
+        results = await analyzer.analyze_game(GAME, engines=extra)
+    finally:
+        await analyzer.restore_engine_options()
+        for leased in [engine] + extra:
+            pool.release(analyzer.current_engine(leased))
+    return [(r.ply, r.move, r.eval_before, r.eval_after, r.best_move, r.classification) for r in results]
+
+
+async def worker_searches(pool: EngineWorkerPool):
+    searches = []
+    for worker in pool.workers:
+        probe = await RemoteEngine.connect(worker)
+        searches.append(worker.remote_stats.get("leases", 0))
+        probe.close()
+    return searches
+
+
+async def cancelled_search(pool: EngineWorkerPool):
+    """Cancel a search once its request is sent, then search another position on a fresh lease"""
+    engine = await pool.acquire()
+    search = asyncio.create_task(engine.analyse(chess.Board(), chess.engine.Limit(depth=1)))
+    await asyncio.sleep(0)  # Request sent, waiting for the reply
+    search.cancel()
+    await asyncio.gather(search, return_exceptions=True)
+    dropped = not is_engine_alive(engine)
+    pool.release(engine)
+
+    board = chess.Board(TWO_QUEENS_FEN)
+    engine = await pool.acquire()
+    try:
+        info = await engine.analyse(board, chess.engine.Limit(depth=1))
+    finally:
+        pool.release(engine)
+    return dropped, bool(info.get("pv")) and info["pv"][0] in board.legal_moves
+
+
+async def check():
+    failures = []
+
+    def expect(ok: bool, label: str):
+        print(f"{'OK' if ok else 'FAIL'}: {label}")
+        if not ok:
+            failures.append(label)
+
+    local = EnginePool(STANDIN_ENGINE, size=2)
+    await local.start()
+    try:
+        expected = await analyse(local)
+        expected_nodes = await analyse(local, nodes=1000)
+    finally:
+        await local.stop()
+
+    ports = [free_port(), free_port()]
+    processes = [await start_worker(port) for port in ports]
+    pool = EngineWorkerPool([f"127.0.0.1:{port}" for port in ports], health_interval=3600)
+    try:
+        await pool.start()
+        expect(pool.size == 4 and all(w.healthy for w in pool.workers), f"4 connections to 2 workers ({pool.size})")
+
+        expect(await analyse(pool) == expected, "same analysis as local engines")
+        expect(await analyse(pool, nodes=1000) == expected_nodes, "same node-budget analysis as local engines")
+        leases = await worker_searches(pool)
+        expect(all(n > 0 for n in leases), f"searches spread over both workers (engine leases {leases})")
+        dropped, legal = await cancelled_search(pool)
+        expect(dropped and legal, f"cancelled search drops its connection (dropped {dropped}, next PV legal {legal})")
+
+        processes[0].kill()
+        await processes[0].wait()
+        expect(await analyse(pool) == expected, "same analysis after a worker died")
+        expect(pool.restarts > 0, f"searches failed over ({pool.restarts} moved)")
+        await pool.check_workers()
+        expect(not pool.workers[0].healthy and pool.size == 2, f"dead worker out of rotation (size {pool.size})")
+
+        processes[0] = await start_worker(ports[0])
+        await pool.check_workers()
+        expect(pool.workers[0].healthy and pool.size == 4, f"restarted worker back in rotation (size {pool.size})")
+        expect(await analyse(pool) == expected, "same analysis after recovery")
+    finally:
+        await pool.stop()
+        for process in processes:
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\n✅ Engine workers serve, balance and fail over")
+
+
+if __name__ == "__main__":
+    asyncio.run(check())
@@ -0,0 +1,121 @@
+"""
+Check the MultiPV second pass (only moves and sacrifices).
+
+Analyses two games with a stand-in engine whose lines are scripted for a
+few positions (material count everywhere else): a Greek gift (Bxh7+) that
+must come out as a brilliant sacrifice, and a recapture whose alternatives
+lose, which must come out as an only move (great). Each game is analysed
+without and with refine_plies; only the refined plies may change and the
+extra searches must match the plies refined.
+
+Run with: python api/scripts/check_multipv_refinement.py
+"""
+
+import asyncio
+import os
+import sys
+
+import chess
+import chess.engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.stockfish_analyzer import StockfishAnalyzer
+from standin_engine import StandInEngine, material
+
+GREEK_GIFT_FEN = "r1bq1rk1/pppn1ppp/4p3/3pP3/1b1P4/2NB1N2/PPP2PPP/R2QK2R w KQ - 0 1"
+
+# (pgn, ply to check, expected flags, expected classification)
+GAMES = [
+    (f'[SetUp "1"]\n[FEN "{GREEK_GIFT_FEN}"]\n\n1. Bxh7+ Kxh7 2. Ng5+ Kg8 3. Qh5 *',
+     1, (False, True), "brilliant"),
+    ("1. e4 d5 2. exd5 Qxd5 3. Nc3 *", 3, (True, False), "great"),
+]
+
+# Scripted lines per position (White's perspective cp, PV), best first
+SCRIPTED = {
+    # Greek gift: Bxh7+ keeps a small edge for a bishop, the quiet moves don't
+    GREEK_GIFT_FEN: [
+        (150, ["d3h7", "g8h7", "f3g5", "h7g8", "d1h5"]),
+        (40, ["e1g1", "c7c5"]),
+        (20, ["a2a3", "b4c3"]),
+    ],
+    "r1bq1rk1/pppn1ppB/4p3/3pP3/1b1P4/2N2N2/PPP2PPP/R2QK2R b KQ - 0 1": [
+        (150, ["g8h7", "f3g5", "h7g8", "d1h5"]),
+    ],
+    # 2. exd5 is forced: leaving the pawn loses the e-pawn and the centre
+    "rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2": [
+        (30, ["e4d5", "d8d5", "b1c3"]),
+        (-250, ["e4e5", "c7c5"]),
+        (-260, ["b1c3", "d5e4"]),
+    ],
+    "rnbqkbnr/ppp1pppp/8/3P4/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 2": [
+        (30, ["d8d5", "b1c3"]),
+    ],
+}
+
+
+class ScriptedEngine(StandInEngine):
+    """Deterministic engine: scripted lines where known, material count otherwise."""
+
+    def lines(self, board: chess.Board, multipv: int):
+        lines = SCRIPTED.get(board.fen())
+        if lines is None:
+            moves = sorted(board.legal_moves, key=lambda m: m.uci())
+            lines = [(material(board, chess.WHITE), [moves[0].uci()] if moves else [])]
+        # Scripted scores are White's; lines() are the side to move's
+        sign = 1 if board.turn == chess.WHITE else -1
+        return [
+            (chess.engine.Cp(sign * cp), [chess.Move.from_uci(uci) for uci in pv])
+            for cp, pv in lines[:multipv]
+        ]
+
+
+class OutOfBookAnalyzer(StockfishAnalyzer):
+    """Every move out of book (without a book the first moves would all be "book")"""
+
+    def _book_plies(self, positions):
+        return [False] * len(positions)
+
+
+async def run(pgn: str, refine_plies: int):
+    engine = ScriptedEngine()
+    analyzer = OutOfBookAnalyzer(engine=engine, use_cache=False, use_tablebase=False)
+    results = await analyzer.analyze_game(pgn, refine_plies=refine_plies)
+    return results, engine, analyzer
+
+
+async def check():
+    failures = 0
+    for pgn, ply, flags, classification in GAMES:
+        plain, plain_engine, _ = await run(pgn, refine_plies=0)
+        refined, engine, analyzer = await run(pgn, refine_plies=2)
+
+        r = refined[ply - 1]
+        others_unchanged = all(
+            (a.classification, a.eval_before, a.eval_after) == (b.classification, b.eval_before, b.eval_after)
+            for a, b in zip(plain, refined) if a.ply != ply
+        )
+        ok = (
+            (r.only_move, r.sacrifice) == flags
+            and r.classification == classification
+            and plain[ply - 1].only_move is None
+            and others_unchanged
+            and engine.calls - plain_engine.calls == engine.multipv_calls == analyzer.refine_searches
+            and 0 < engine.multipv_calls <= 2
+            and analyzer.refine_time > 0
+        )
+        if not ok:
+            failures += 1
+        print(f"{'OK' if ok else 'MISMATCH'}: ply {ply} {r.move} {plain[ply - 1].classification} -> "
+              f"{r.classification} (only_move={r.only_move}, sacrifice={r.sacrifice}), "
+              f"{engine.multipv_calls} MultiPV searches, +{analyzer.refine_time * 1000:.1f}ms")
+
+    if failures:
+        print(f"\n❌ {failures} game(s) differ")
+        sys.exit(1)
+    print("\n✅ MultiPV pass finds the only move and the sacrifice")
+
+
+if __name__ == "__main__":
+    asyncio.run(check())
@@ -0,0 +1,135 @@
+"""
+Check the analyzer's search shortcuts (single legal move, game over, mate lines).
+
+Analyses a few games with a deterministic stand-in engine (exact short mates,
+material count otherwise) twice: with shortcuts off and on. Every move's
+eval, mate distance and classification must be unchanged, and the number of
+engine searches must drop by the number of positions the shortcuts filled in.
+
+Run with: python api/scripts/check_search_shortcuts.py
+"""
+
+import asyncio
+import os
+import sys
+
+import chess
+import chess.engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.stockfish_analyzer import StockfishAnalyzer
+from standin_engine import StandInEngine, material
+
+GAMES = [
+    # Legal's mate: 6. Bxf7+ leaves a single legal reply
+    "1. e4 e5 2. Nf3 d6 3. Bc4 Bg4 4. Nc3 g6 5. Nxe5 Bxd1 6. Bxf7+ Ke7 7. Nd5# 1-0",
+    # Opera Game: 16. Qb8+ Nxb8 is forced, the game ends in mate
+    "1. e4 e5 2. Nf3 d6 3. d4 Bg4 4. dxe5 Bxf3 5. Qxf3 dxe5 6. Bc4 Nf6 7. Qb3 Qe7 "
+    "8. Nc3 c6 9. Bg5 b5 10. Nxb5 cxb5 11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7 "
+    "14. Rd1 Qe6 15. Bxd7+ Nxd7 16. Qb8+ Nxb8 17. Rd8# 1-0",
+    # Rook ending played along the engine's mate line
+    '[SetUp "1"]\n[FEN "6k1/8/8/8/8/8/R7/1R4K1 w - - 0 1"]\n\n1. Ra7 Kf8 2. Rb8# 1-0',
+    # Stalemate
+    '[SetUp "1"]\n[FEN "7k/8/5K2/6Q1/8/8/8/8 w - - 0 1"]\n\n1. Qg6 1/2-1/2',
+]
+
+def mate_line(board: chess.Board, moves: int):
+    """Shortest mate for the side to move within `moves` moves (PV, longest defence), else None"""
+    for k in range(1, moves + 1):
+        line = _mate(board, k)
+        if line:
+            return line
+    return None
+
+
+def _mate(board: chess.Board, k: int):
+    for move in sorted(board.legal_moves, key=lambda m: m.uci()):
+        board.push(move)
+        if board.is_checkmate():
+            board.pop()
+            return [move]
+        longest = None
+        if k > 1 and not board.is_game_over():
+            for reply in sorted(board.legal_moves, key=lambda m: m.uci()):
+                board.push(reply)
+                line = _mate(board, k - 1)
+                board.pop()
+                if line is None:
+                    longest = None
+                    break
+                if longest is None or len(line) + 1 > len(longest):
+                    longest = [reply] + line
+        board.pop()
+        if longest:
+            return [move] + longest
+    return None
+
+
+class MateFindingEngine(StandInEngine):
+    """Deterministic engine: mates within 2 moves found exactly, material count otherwise."""
+
+    def lines(self, board: chess.Board, multipv: int):
+        if board.is_game_over():
+            return super().lines(board, multipv)
+
+        line = mate_line(board, 2)
+        if line:
+            return [(chess.engine.Mate(len(line) // 2 + 1), line)]
+
+        # Few replies: look for being mated (every reply runs into a mate)
+        moves = sorted(board.legal_moves, key=lambda m: m.uci())
+        if len(moves) <= 4:
+            longest = None
+            for move in moves:
+                board.push(move)
+                line = mate_line(board, 2)
+                board.pop()
+                if line is None:
+                    longest = None
+                    break
+                if longest is None or len(line) + 1 > len(longest):
+                    longest = [move] + line
+            if longest:
+                return [(chess.engine.Mate(-(len(longest) // 2)), longest)]
+
+        return [(chess.engine.Cp(material(board)), moves[:1])]
+
+
+async def run(pgn: str, use_shortcuts: bool):
+    engine = MateFindingEngine()
+    analyzer = StockfishAnalyzer(
+        engine=engine, use_cache=False, use_tablebase=False, use_shortcuts=use_shortcuts
+    )
+    results = await analyzer.analyze_game(pgn)
+    moves = [
+        (r.ply, r.move, r.eval_before, r.eval_after, r.mate_before, r.mate_after, r.classification)
+        for r in results
+    ]
+    return moves, engine.calls, analyzer
+
+
+async def check():
+    failures = 0
+    for pgn in GAMES:
+        expected, full_calls, _ = await run(pgn, use_shortcuts=False)
+        actual, calls, analyzer = await run(pgn, use_shortcuts=True)
+        saved = sum(analyzer.shortcut_stats().values())
+
+        ok = actual == expected and calls + saved == full_calls and saved > 0
+        if not ok:
+            failures += 1
+            for e, a in zip(expected, actual):
+                if e != a:
+                    print(f"   ply {e[0]}: expected {e} got {a}")
+        print(f"{'OK' if ok else 'MISMATCH'}: {len(expected)} plies, searches {full_calls} -> {calls} "
+              f"({analyzer.shortcut_stats()})")
+
+    if failures:
+        print(f"\n❌ {failures} game(s) differ")
+        sys.exit(1)
+    print("\n✅ Shortcuts give the same analysis with fewer searches")
+
+
+if __name__ == "__main__":
+    asyncio.run(check())
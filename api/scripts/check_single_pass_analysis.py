@@ -0,0 +1,122 @@
+"""
+Regression check for the single-pass evaluation pipeline in analyze_game_moves.
+
+Replays a few games through the legacy two-pass loop (pre-move and post-move
+search for every ply) and through analyze_game_moves, using a deterministic
+stand-in engine, and verifies evaluations/classifications are unchanged while
+the number of engine searches drops from 2n to n + 1.
+
+Run with: python api/scripts/check_single_pass_analysis.py
+"""
+
+import asyncio
+import os
+import sys
+from io import StringIO
+
+import chess
+import chess.engine
+import chess.pgn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services import analysis
+from api.services.analysis import analyze_game_moves
+from api.services.classification import classify_game
+from api.services.eval_cache import get_eval_cache
+from standin_engine import StandInEngine
+
+GAMES = [
+    # Opera Game (ends in mate)
+    "1. e4 e5 2. Nf3 d6 3. d4 Bg4 4. dxe5 Bxf3 5. Qxf3 dxe5 6. Bc4 Nf6 7. Qb3 Qe7 "
+    "8. Nc3 c6 9. Bg5 b5 10. Nxb5 cxb5 11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7 "
+    "14. Rd1 Qe6 15. Bxd7+ Nxd7 16. Qb8+ Nxb8 17. Rd8# 1-0",
+    # Scholar's mate
+    "1. e4 e5 2. Bc4 Nc6 3. Qh5 Nf6 4. Qxf7# 1-0",
+    # Quiet Ruy Lopez
+    "1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. Ba4 Nf6 5. O-O Be7 6. Re1 b5 7. Bb3 d6 "
+    "8. c3 O-O 9. h3 Nb8 10. d4 Nbd7 11. Nbd2 Bb7 12. Bc2 Re8 *",
+]
+
+
+async def legacy_two_pass(pgn: str, engine: StandInEngine, depth: int = 18):
+    """The pre-single-pass loop: every position searched before and after each move."""
+    game = chess.pgn.read_game(StringIO(pgn))
+    board = game.board()
+    results = []
+    # White-perspective scores before/after each move, classified at the end
+    scores_before, scores_after, sans = [], [], []
+
+    for ply, move in enumerate(game.mainline_moves(), 1):
+        info = await engine.analyse(board, chess.engine.Limit(depth=depth))
+        score = info.get("score")
+        if score.is_mate():
+            mate = score.relative.mate()
+            evaluation = None
+        else:
+            evaluation = score.relative.score()
+            mate = None
+        sign = 1 if board.turn == chess.WHITE else -1
+        if score.is_mate():
+            scores_before.append(sign * (10000 if score.relative.mate() > 0 else -10000))
+        else:
+            scores_before.append(sign * (score.relative.score() or 0))
+        best_move = info.get("pv", [None])[0]
+        best_move_uci = best_move.uci() if best_move else None
+
+        san = board.san(move)
+        board.push(move)
+
+        post_info = await engine.analyse(board, chess.engine.Limit(depth=depth))
+        post_score = post_info.get("score")
+        if post_score.is_mate():
+            post_eval = 10000 if post_score.relative.mate() > 0 else -10000
+        else:
+            post_eval = post_score.relative.score() or 0
+        scores_after.append(-sign * post_eval)
+        sans.append(san)
+        results.append((ply, san, evaluation, mate, best_move_uci))
+
+    classified = classify_game(scores_before, scores_after, sans)
+    return [r + (str(c),) for r, c in zip(results, classified.classifications)]
+
+
+async def check():
+    failures = 0
+
+    for pgn in GAMES:
+        legacy_engine = StandInEngine()
+        expected = await legacy_two_pass(pgn, legacy_engine)
+
+        single_engine = StandInEngine()
+        # Start cold so the search count reflects the single pass, not cache hits
+        get_eval_cache().clear_memory()
+
+        async def _open_engine(stack):
+            return single_engine, None
+
+        analysis._open_engine = _open_engine
+        result = await analyze_game_moves(pgn)
+        actual = [
+            (m["ply"], m["san"], m["evaluation"], m["mate"], m["best_move"], m["classification"])
+            for m in result["moves"]
+        ]
+
+        plies = len(expected)
+        status = "OK" if actual == expected else "MISMATCH"
+        if actual != expected:
+            failures += 1
+            for e, a in zip(expected, actual):
+                if e != a:
+                    print(f"   ply {e[0]}: expected {e} got {a}")
+
+        print(f"{status}: {plies} plies, searches {legacy_engine.calls} -> {single_engine.calls}")
+
+    if failures:
+        print(f"\n❌ {failures} game(s) changed classification")
+        sys.exit(1)
+    print("\n✅ Single-pass analysis matches the two-pass baseline")
+
+
+if __name__ == "__main__":
+    asyncio.run(check())
@@ -0,0 +1,119 @@
+"""
+Reclassify stored game analyses with the current classification rules.
+
+Reads analysed games in batches, recomputes every move's classification,
+the statistics (precision, accuracy, critical moments) from the stored
+evals in one vectorized pass per batch (no engine needed), and writes back
+only games whose results changed. Book moves are kept as stored. Shared
+analyses (game_analyses) are reclassified too, and the statistics copied
+onto the games referencing them are refreshed. Results stored without
+each move's mover take it from the game's starting position (its PGN, or
+for a shared analysis, the PGN of a game referencing it).
+
+Run with: python api/scripts/reclassify_games.py [--dry-run]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateMany, UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.classification import classify_stored_games, game_statistics
+from api.services.stockfish_analyzer import white_moves_first
+
+BATCH_SIZE = 1000
+
+
+async def reclassify_collection(collection, query, label: str, dry_run: bool, games=None):
+    """
+    Reclassify the analysis_results of every matching document.
+    With `games`, the games referencing a changed shared analysis get its statistics.
+    """
+    total = await collection.count_documents(query)
+    print(f"Found {total} analysed {label}{' (dry run)' if dry_run else ''}")
+
+    scanned = updated = 0
+    cursor = collection.find(query, {"analysis_results": 1, "statistics": 1, "pgn": 1})
+    batch = []
+
+    async def starting_sides():
+        """Whether White moves first in each game of the batch"""
+        pgns = {doc["_id"]: doc.get("pgn") for doc in batch}
+        if games is not None:
+            async for game in games.find(
+                {"analysis_ref": {"$in": list(pgns)}}, {"analysis_ref": 1, "pgn": 1}
+            ):
+                pgns[game["analysis_ref"]] = pgns[game["analysis_ref"]] or game.get("pgn")
+        return [white_moves_first(pgns[doc["_id"]]) for doc in batch]
+
+    async def flush():
+        nonlocal scanned, updated
+        classified = classify_stored_games([doc["analysis_results"] for doc in batch], await starting_sides())
+        updates = []
+        references = []
+        for doc, game in zip(batch, classified):
+            results = doc["analysis_results"]
+            changed = False
+            for r, classification in zip(results, game.classifications):
+                if r.get("classification") != classification:
+                    r["classification"] = str(classification)
+                    changed = True
+            stats = game_statistics(results, game)
+            if changed or doc.get("statistics") != stats:
+                fields = {"analysis_results": results, "statistics": stats}
+                if games is None:
+                    fields["moves"] = results  # For backward compatibility
+                else:
+                    references.append(UpdateMany({"analysis_ref": doc["_id"]}, {"$set": {"statistics": stats}}))
+                updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if updates and not dry_run:
+            await collection.bulk_write(updates, ordered=False)
+            if references:
+                await games.bulk_write(references, ordered=False)
+        scanned += len(batch)
+        updated += len(updates)
+        batch.clear()
+        print(f"   {scanned}/{total} scanned, {updated} changed")
+
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    return scanned, updated
+
+
+async def reclassify(dry_run: bool):
+    uri = os.getenv("MONGODB_URI", "mongodb://mongodb:27017/grandmaster_guard")
+    print(f"Connecting to MongoDB at {uri}...")
+
+    client = AsyncIOMotorClient(uri)
+    try:
+        db = client.get_database("grandmaster_guard")
+        started = time.perf_counter()
+        # Games analysed before analyses were shared keep their results inline
+        scanned, updated = await reclassify_collection(
+            db.games, {"analysis_status": "complete", "analysis_results.0": {"$exists": True}},
+            "games", dry_run
+        )
+        shared_scanned, shared_updated = await reclassify_collection(
+            db.game_analyses, {"analysis_results.0": {"$exists": True}},
+            "shared analyses", dry_run, games=db.games
+        )
+
+        elapsed = time.perf_counter() - started
+        print(f"\n✅ Finished in {elapsed:.1f}s: {updated} of {scanned} games and "
+              f"{shared_updated} of {shared_scanned} shared analyses "
+              f"{'would change' if dry_run else 'updated'}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(reclassify("--dry-run" in sys.argv))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Minimal engine for checks that need an engine without Stockfish.
+
+Scores every legal move by the material balance after it (deterministic,
+mates found in one) and reports the best MultiPV lines at the requested
+depth. Two ways to use it:
+- as a UCI engine process, anywhere a Stockfish path is expected, e.g.:
+      python -m api.engine_server --engine api/scripts/standin_engine.py
+- in process, as StandInEngine (analyse only, counts searches), which
+  check scripts subclass to script or change the lines it returns:
+      from standin_engine import StandInEngine, material
+
+Run with: python api/scripts/standin_engine.py (then type UCI commands)
+"""
+
+import asyncio
+import os
+import sys
+from typing import List, Optional, Tuple
+
+import chess
+import chess.engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.see import SEE_VALUES
+
+MATE = 100000
+# Depth reported by the in-process engine when the limit has none
+DEFAULT_DEPTH = 18
+
+
+def material(board: chess.Board, color: Optional[chess.Color] = None) -> int:
+    """Material balance (cp) for `color`, the side to move by default (the kings cancel out)"""
+    if color is None:
+        color = board.turn
+    return sum(
+        SEE_VALUES[piece.piece_type] * (1 if piece.color == color else -1)
+        for piece in board.piece_map().values()
+    )
+
+
+def score_move(board: chess.Board, move: chess.Move) -> int:
+    board.push(move)
+    try:
+        if board.is_checkmate():
+            return MATE
+        if board.is_game_over():
+            return 0
+        return -material(board)
+    finally:
+        board.pop()
+
+
+def ranked_moves(board: chess.Board) -> List[Tuple[chess.Move, int]]:
+    """(move, score for the side to move) best first, ties in UCI order"""
+    moves = sorted(board.legal_moves, key=lambda m: m.uci())
+    scored = [(move, score_move(board, move)) for move in moves]
+    return sorted(scored, key=lambda entry: -entry[1])
+
+
+def search(board: chess.Board, multipv: int, depth: int):
+    ranked = ranked_moves(board)
+    for i, (move, score) in enumerate(ranked[:multipv], 1):
+        text = "mate 1" if score == MATE else f"cp {score}"
+        print(f"info depth {depth} seldepth {depth} multipv {i} score {text} nodes {len(ranked)} pv {move.uci()}")
+    print(f"bestmove {ranked[0][0].uci() if ranked else '0000'}")
+
+
+class StandInEngine:
+    """
+    In-process stand-in for a python-chess engine: enough of the protocol
+    for the analyzers (analyse, id, returncode), searches counted in
+    `calls` (and MultiPV ones in `multipv_calls`). Subclasses override
+    lines() to change what it finds.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.multipv_calls = 0
+        self.id = {"name": "StandIn 1"}
+        # Never resolves: the engine is always alive
+        self.returncode = asyncio.get_running_loop().create_future()
+
+    async def analyse(self, board: chess.Board, limit: chess.engine.Limit, multipv=None, **kwargs):
+        self.calls += 1
+        infos = [
+            {"score": chess.engine.PovScore(score, board.turn), "pv": pv, "depth": limit.depth or DEFAULT_DEPTH}
+            for score, pv in self.lines(board, multipv or 1)
+        ]
+        if multipv is None:
+            return infos[0]
+        self.multipv_calls += 1
+        return infos[:multipv]
+
+    def lines(self, board: chess.Board, multipv: int) -> List[Tuple[chess.engine.Score, List[chess.Move]]]:
+        """(score for the side to move, PV) of the best `multipv` lines, best first"""
+        if board.is_checkmate():
+            return [(chess.engine.Mate(0), [])]
+        if board.is_game_over():
+            return [(chess.engine.Cp(0), [])]
+        return [
+            (chess.engine.Mate(1) if score == MATE else chess.engine.Cp(score), [move])
+            for move, score in ranked_moves(board)[:multipv]
+        ]
+
+
+def main():
+    board = chess.Board()
+    multipv = 1
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == "uci":
+            print("id name StandIn 1")
+            print("option name Threads type spin default 1 min 1 max 512")
+            print("option name Hash type spin default 16 min 1 max 33554432")
+            print("option name MultiPV type spin default 1 min 1 max 500")
+            print("uciok")
+        elif command == "isready":
+            print("readyok")
+        elif command == "setoption" and "MultiPV" in tokens:
+            multipv = int(tokens[-1])
+        elif command == "ucinewgame":
+            board = chess.Board()
+        elif command == "position":
+            moves_at = tokens.index("moves") if "moves" in tokens else len(tokens)
+            if tokens[1] == "startpos":
+                board = chess.Board()
+            else:
+                board = chess.Board(" ".join(tokens[2:moves_at]))
+            for uci in tokens[moves_at + 1:]:
+                board.push_uci(uci)
+        elif command == "go":
+            depth = int(tokens[tokens.index("depth") + 1]) if "depth" in tokens else 1
+            search(board, multipv, depth)
+        elif command == "quit":
+            break
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Tag puzzles with their computed phase, motifs and piece counts.
+
+Streams the puzzles collection (in id order) or a local Lichess puzzle CSV
+(lichess_db_puzzle.csv, optionally .gz), replays each solution line in a
+pool of worker processes (api.services.puzzle_tagging) and bulk-writes
+phase, motifs, piece_count, pawn_count, minor_major_count and
+tagger_version back onto the puzzles (matched by id).
+
+Batches are written in order and a checkpoint (the last id, or CSV row,
+written) is saved after each one, so an interrupted run picks up where it
+stopped. Twice as many batches as workers are kept in flight so every core
+stays busy while results are written.
+
+Run with: python api/scripts/tag_puzzles.py [--csv PATH] [--workers N]
+          [--batch N] [--limit N] [--checkpoint PATH] [--restart] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.services.puzzle_tagging import TAGGER_VERSION, tag_puzzles
+
+BATCH_SIZE = 500
+CHECKPOINT_PATH = "tag_puzzles.checkpoint.json"
+
+
+def read_checkpoint(path: str, source: str) -> dict:
+    """The saved checkpoint if it belongs to this source and tagger version"""
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if checkpoint.get("source") != source or checkpoint.get("tagger_version") != TAGGER_VERSION:
+        return {}
+    return checkpoint
+
+
+def write_checkpoint(path: str, checkpoint: dict):
+    """Replace the checkpoint atomically (a crash leaves the old one)"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+async def csv_batches(path: str, after: int, batch_size: int, limit: int):
+    """(puzzles, rows read) batches of a Lichess puzzle CSV, skipping the first `after` rows"""
+    opener = gzip.open if path.endswith(".gz") else open
+    stop = after + limit if limit else None
+    batch = []
+    row_number = after
+    with opener(path, "rt", newline="") as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=1):
+            if row_number <= after:
+                continue
+            batch.append({"id": row["PuzzleId"], "fen": row["FEN"], "moves": row["Moves"].split()})
+            if len(batch) >= batch_size:
+                yield batch, row_number
+                batch = []
+            if row_number == stop:
+                break
+    if batch:
+        yield batch, row_number
+
+
+async def collection_batches(collection, after, batch_size: int, limit: int):
+    """(puzzles, last id) batches of the puzzles collection in id order, after id `after`"""
+    query = {"id": {"$gt": after}} if after is not None else {}
+    cursor = collection.find(query, {"_id": 0, "id": 1, "fen": 1, "moves": 1}).sort("id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch, batch[-1]["id"]
+            batch = []
+    if batch:
+        yield batch, batch[-1]["id"]
+
+
+async def tag_all(args):
+    source = f"csv:{os.path.abspath(args.csv)}" if args.csv else "collection:puzzles"
+    checkpoint = {} if args.restart else read_checkpoint(args.checkpoint, source)
+    position = checkpoint.get("position")
+    tagged = checkpoint.get("tagged", 0)
+    failed = checkpoint.get("failed", 0)
+    if position is not None:
+        print(f"Resuming {source} after {position} ({tagged} tagged, {failed} unreadable)")
+
+    client = None
+    collection = None
+    if not (args.csv and args.dry_run):
+        uri = os.getenv("MONGODB_URI", "mongodb://mongodb:27017/grandmaster_guard")
+        print(f"Connecting to MongoDB at {uri}...")
+        client = AsyncIOMotorClient(uri)
+        collection = client.get_database("grandmaster_guard").puzzles
+
+    if args.csv:
+        batches = csv_batches(args.csv, position or 0, args.batch, args.limit)
+    else:
+        batches = collection_batches(collection, position, args.batch, args.limit)
+
+    phases = Counter()
+    motifs = Counter()
+    started = time.perf_counter()
+    last_report = started
+    done = 0
+
+    async def finish(entry):
+        nonlocal tagged, failed, done, last_report
+        future, last, count = entry
+        results = await future
+        updates = []
+        for result in results:
+            if result is None:
+                failed += 1
+                continue
+            fields = dict(result)
+            puzzle_id = fields.pop("id")
+            phases[fields["phase"]] += 1
+            motifs.update(fields["motifs"])
+            updates.append(UpdateOne({"id": puzzle_id}, {"$set": fields}))
+        if updates and not args.dry_run:
+            await collection.bulk_write(updates, ordered=False)
+        tagged += len(updates)
+        done += count
+        if not args.dry_run:
+            write_checkpoint(args.checkpoint, {
+                "source": source, "tagger_version": TAGGER_VERSION,
+                "position": last, "tagged": tagged, "failed": failed
+            })
+
+        now = time.perf_counter()
+        if now - last_report >= 10:
+            last_report = now
+            print(f"   📊 {done:,} puzzles this run | {done / (now - started):.0f}/s | "
+                  f"{tagged:,} tagged, {failed:,} unreadable | at {last}")
+
+    loop = asyncio.get_running_loop()
+    pending = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            print(f"Tagging with {args.workers} worker processes, {args.batch} puzzles per batch"
+                  f"{' (dry run)' if args.dry_run else ''}")
+            async for batch, last in batches:
+                pending.append((loop.run_in_executor(pool, tag_puzzles, batch), last, len(batch)))
+                # Keep the workers fed while the oldest batch is written
+                if len(pending) >= 2 * args.workers:
+                    await finish(pending.popleft())
+            while pending:
+                await finish(pending.popleft())
+    finally:
+        if client is not None:
+            client.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ Finished in {elapsed:.1f}s: {done:,} puzzles this run "
+          f"({done / elapsed if elapsed else 0:.0f}/s), {tagged:,} tagged in total, {failed:,} unreadable")
+    print(f"   Phases: {dict(phases)}")
+    print(f"   Motifs: {dict(motifs.most_common())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tag puzzles with computed phase, motifs and piece counts")
+    parser.add_argument("--csv", help="Lichess puzzle CSV (.csv or .csv.gz) instead of the puzzles collection")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="Puzzles per batch")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many puzzles (0 = all)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Checkpoint file")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    parser.add_argument("--dry-run", action="store_true", help="Tag without writing puzzles or the checkpoint")
+    asyncio.run(tag_all(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,48 +6,24 @@ Move classification and evaluation using python-chess with Stockfish
 import chess
 import chess.engine
 import chess.pgn
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from io import StringIO
-import math
 import asyncio
 import os
+from contextlib import AsyncExitStack
 
-
-def cp_to_win_probability(centipawns: int) -> float:
-    """
-    Convert centipawn evaluation to win probability.
-    Formula: W = 50 + 50 * (2 / (1 + exp(-0.004 * cp)) - 1)
-    """
-    return 50 + 50 * (2 / (1 + math.exp(-0.004 * centipawns)) - 1)
-
-
-def classify_move(prev_win_prob: float, curr_win_prob: float, is_white: bool) -> str:
-    """
-    Classify a move based on win probability change.
-    
-    Thresholds:
-    - Blunder: > 20% drop
-    - Mistake: > 10% drop  
-    - Inaccuracy: > 5% drop
-    """
-    # Calculate drop from perspective of player who moved
-    if is_white:
-        drop = prev_win_prob - curr_win_prob
-    else:
-        drop = curr_win_prob - prev_win_prob
-    
-    if drop > 20:
-        return "blunder"
-    elif drop > 10:
-        return "mistake"
-    elif drop > 5:
-        return "inaccuracy"
-    elif drop < -5:
-        return "great"
-    elif drop <= 2:
-        return "best"
-    else:
-        return "normal"
+from api.services.classification import (
+    BRILLIANT_MIN_SACRIFICE,
+    as_scores,
+    classify_game,
+    sacrifice_candidates
+)
+from api.services.commentary import generate_commentary
+from api.services.engine_pool import get_engine_pool, is_engine_alive
+from api.services.engine_watchdog import RestartHook, get_engine_watchdog, kill_engine
+from api.services.eval_cache import get_eval_cache
+from api.services.opening_book import get_opening_book
+from api.services.tactics import MotifTagger
 
 
 async def analyze_game_moves(pgn: str, depth: int = 18) -> Dict[str, Any]:
@@ -63,108 +39,218 @@ async def analyze_game_moves(pgn: str, depth: int = 18) -> Dict[str, Any]:
     board = game.board()
     moves = list(game.mainline_moves())
     
+    # Replay the mainline once, keeping every position (with move history
+    # so the engine still sees repetitions)
+    positions = [board.copy()]
+    sans = []
+    for move in moves:
+        sans.append(board.san(move))
+        board.push(move)
+        positions.append(board.copy())
+    
+    # Search each position exactly once: position i is the post-move
+    # position of ply i and the pre-move position of ply i + 1
+    async with AsyncExitStack() as stack:
+        # Lease a pooled engine (or spawn one) if available
+        engine, restart = await _open_engine(stack)
+        evals = await evaluate_positions(positions, engine, depth, restart)
+    
+    # Classify the whole game at once from White-perspective scores
+    white_scores = [
+        e["score"] if board.turn == chess.WHITE else -e["score"]
+        for e, board in zip(evals, positions)
+    ]
+    opening_book = get_opening_book()
+    book = [opening_book.contains(b) for b in positions[1:]] if opening_book.loaded else None
+    white_moved = [b.turn == chess.WHITE for b in positions[:-1]]
+    tagger = MotifTagger(positions)
+    # Material offered (SEE) only on engine evals, and only where it can make
+    # a move brilliant: a heuristic eval can't tell a sacrifice from a blunder
+    offered = None
+    if engine is not None:
+        candidates = sacrifice_candidates(as_scores(white_scores[:-1]), as_scores(white_scores[1:]), white_moved)
+        offered = [
+            tagger.material_offered(ply) if candidate else 0
+            for ply, candidate in enumerate(candidates, start=1)
+        ]
+    classified = classify_game(
+        white_scores[:-1], white_scores[1:], sans, white_moved=white_moved, book=book, offered=offered
+    )
+    
+    # Tag motifs on the replayed positions (a blunder or mistake gets those
+    # of the opponent's best reply, the best move after it)
+    classifications = [str(c) for c in classified.classifications]
+    motifs = tagger.tag_all(
+        classifications, replies=[e["best_move"] for e in evals[1:]],
+        sacrifices=[o >= BRILLIANT_MIN_SACRIFICE for o in offered] if offered is not None else None
+    )
+    
     analyzed_moves = []
-    white_errors = []
-    black_errors = []
-    prev_win_prob = 50.0
+    for ply, move in enumerate(moves, 1):
+        pre = evals[ply - 1]
+        san = sans[ply - 1]
+        classification = classifications[ply - 1]
+        
+        analyzed_moves.append({
+            "ply": ply,
+            "san": san,
+            "uci": move.uci(),
+            "fen_after": positions[ply].fen(),
+            "evaluation": pre["cp"],
+            "mate": pre["mate"],
+            "best_move": pre["best_move"],
+            "classification": classification,
+            "motifs": motifs[ply - 1],
+            "comment": generate_commentary(san, classification, motifs[ply - 1], pre["best_move"])
+        })
     
-    # Try to use Stockfish if available
-    stockfish_path = os.getenv("STOCKFISH_PATH", "/usr/bin/stockfish")
-    engine = None
+    # Lichess-style accuracy (100 when a player made no moves)
+    white_accuracy = classified.white_accuracy
+    black_accuracy = classified.black_accuracy
     
-    try:
-        # Attempt to load engine
-        transport, engine = await chess.engine.popen_uci(stockfish_path)
-    except Exception as e:
-        print(f"Stockfish not available, using heuristic evaluation: {e}")
-        engine = None
+    return {
+        "moves": analyzed_moves,
+        "white_accuracy": white_accuracy if white_accuracy is not None else 100,
+        "black_accuracy": black_accuracy if black_accuracy is not None else 100
+    }
+
+
+async def evaluate_positions(
+    positions: List[chess.Board],
+    engine: Optional[chess.engine.UciProtocol],
+    depth: int = 18,
+    restart: Optional[RestartHook] = None
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate every position once, from the side to move's perspective.
     
-    try:
-        for ply, move in enumerate(moves, 1):
-            is_white = (ply % 2 == 1)
+    Searches run under the EngineWatchdog deadline; a hung or dead engine
+    is replaced through `restart` and the position searched again.
+    
+    Args:
+        positions: Boards to evaluate (mainline order)
+        engine: Running engine, or None for heuristic evaluation
+        depth: Search depth per position
+        restart: Async hook(old_engine) -> new running engine (see
+                 _open_engine); without one a failed search is not retried
+        
+    Returns:
+        One dict per position with:
+        - cp: centipawns (None if a mate was found)
+        - mate: mate in X (None if no mate)
+        - score: centipawns with mates clamped to +/-10000
+        - best_move: engine's best move in UCI (None without engine)
+    """
+    evals = []
+    cache = get_eval_cache()
+    watchdog = get_engine_watchdog()
+    restart = restart or _no_restart
+    
+    for board in positions:
+        best_move_uci = None
+        
+        if engine:
+            # Cache entries are stored from White's perspective
+            sign = 1 if board.turn == chess.WHITE else -1
+            cached = await cache.get(board, depth, engine=engine.id.get("name"))
             
-            # Get evaluation
-            if engine:
-                info = await engine.analyse(board, chess.engine.Limit(depth=depth))
-                score = info.get("score")
-                
-                if score.is_mate():
-                    mate = score.relative.mate()
-                    evaluation = None
-                    win_prob = 100 if mate > 0 else 0
-                else:
-                    evaluation = score.relative.score()
-                    mate = None
-                    win_prob = cp_to_win_probability(evaluation)
-                
-                best_move = info.get("pv", [None])[0]
-                best_move_uci = best_move.uci() if best_move else None
+            if cached is not None:
+                mate = sign * cached.mate if cached.mate is not None else None
+                cp = sign * cached.cp if mate is None else None
+                best_move_uci = cached.pv[0] if cached.pv else None
             else:
-                # Heuristic evaluation without engine
-                evaluation = _heuristic_eval(board)
-                mate = None
-                win_prob = cp_to_win_probability(evaluation)
-                best_move_uci = None
-            
-            # Make the move
-            san = board.san(move)
-            uci = move.uci()
-            board.push(move)
-            fen_after = board.fen()
-            
-            # Post-move evaluation (for classification)
-            if engine:
-                post_info = await engine.analyse(board, chess.engine.Limit(depth=depth))
-                post_score = post_info.get("score")
+                info, engine = await watchdog.analyse(
+                    engine, board, chess.engine.Limit(depth=depth), restart
+                )
+                score = info.get("score")
+                pv = info.get("pv") or []
                 
-                if post_score.is_mate():
-                    post_eval = 10000 if post_score.relative.mate() > 0 else -10000
-                else:
-                    post_eval = post_score.relative.score() or 0
+                mate = score.relative.mate() if score.is_mate() else None
+                cp = score.relative.score() if mate is None else None
+                best_move_uci = pv[0].uci() if pv else None
                 
-                post_win_prob = cp_to_win_probability(-post_eval)  # Negate for opponent's perspective
-            else:
-                post_eval = _heuristic_eval(board)
-                post_win_prob = cp_to_win_probability(-post_eval)
-            
-            # Classify the move
-            classification = classify_move(prev_win_prob, post_win_prob, is_white)
+                await cache.put(
+                    board,
+                    info.get("depth", depth),
+                    score.white().score(mate_score=10000),
+                    score.white().mate() if score.is_mate() else None,
+                    [m.uci() for m in pv],
+                    engine=engine.id.get("name")
+                )
             
-            # Track errors for accuracy
-            error = max(0, prev_win_prob - post_win_prob) if is_white else max(0, post_win_prob - prev_win_prob)
-            if is_white:
-                white_errors.append(error)
+            if mate is not None:
+                clamped = 10000 if mate > 0 else -10000
             else:
-                black_errors.append(error)
-            
-            analyzed_moves.append({
-                "ply": ply,
-                "san": san,
-                "uci": uci,
-                "fen_after": fen_after,
-                "evaluation": evaluation,
-                "mate": mate,
-                "best_move": best_move_uci,
-                "classification": classification,
-                "motifs": [],  # Would be populated by tactics.py
-                "comment": _generate_comment(classification, san, best_move_uci)
-            })
-            
-            prev_win_prob = post_win_prob
+                clamped = cp or 0
+        else:
+            # Heuristic evaluation without engine (White's side -> side to move)
+            cp = _heuristic_eval(board) * (1 if board.turn == chess.WHITE else -1)
+            mate = None
+            clamped = cp
+        
+        evals.append({
+            "cp": cp,
+            "mate": mate,
+            "score": clamped,
+            "best_move": best_move_uci
+        })
     
-    finally:
-        if engine:
-            await engine.quit()
+    return evals
+
+
+async def _open_engine(
+    stack: AsyncExitStack
+) -> Tuple[Optional[chess.engine.UciProtocol], Optional[RestartHook]]:
+    """
+    Get an engine for the duration of the stack: lease one from the shared
+    pool if it is running, otherwise spawn a private process.
     
-    # Calculate accuracy (100 - average error)
-    white_accuracy = 100 - (sum(white_errors) / len(white_errors)) if white_errors else 100
-    black_accuracy = 100 - (sum(black_errors) / len(black_errors)) if black_errors else 100
+    Returns:
+        (engine, restart hook for the watchdog). The stack hands back (or
+        quits) whichever engine is current, so a replacement started by
+        the hook is not leaked. (None, None) if Stockfish is unavailable
+        (heuristic evaluation is used).
+    """
+    pool = get_engine_pool()
+    if pool is not None:
+        try:
+            engine = await pool.acquire()
+        except Exception as e:
+            print(f"Engine pool unavailable, using heuristic evaluation: {e}")
+            return None, None
+        current = [engine]
+        
+        async def restart_pooled(old: chess.engine.UciProtocol) -> chess.engine.UciProtocol:
+            current[0] = await pool.replace(old)
+            return current[0]
+        
+        stack.callback(lambda: pool.release(current[0]))
+        return engine, restart_pooled
     
-    return {
-        "moves": analyzed_moves,
-        "white_accuracy": round(max(0, min(100, white_accuracy)), 1),
-        "black_accuracy": round(max(0, min(100, black_accuracy)), 1)
-    }
+    stockfish_path = os.getenv("STOCKFISH_PATH", "/usr/bin/stockfish")
+    try:
+        transport, engine = await chess.engine.popen_uci(stockfish_path)
+    except Exception as e:
+        print(f"Stockfish not available, using heuristic evaluation: {e}")
+        return None, None
+    current = [engine]
+    
+    async def restart_private(old: chess.engine.UciProtocol) -> chess.engine.UciProtocol:
+        kill_engine(old)
+        _, current[0] = await chess.engine.popen_uci(stockfish_path)
+        return current[0]
+    
+    async def quit_current():
+        if is_engine_alive(current[0]):
+            await current[0].quit()
+    
+    stack.push_async_callback(quit_current)
+    return engine, restart_private
+
+
+async def _no_restart(old: chess.engine.UciProtocol) -> chess.engine.UciProtocol:
+    """Restart hook for callers that can't replace their engine"""
+    raise RuntimeError("Engine failed and cannot be restarted")
 
 
 def _heuristic_eval(board: chess.Board) -> int:
@@ -199,16 +285,3 @@ def _heuristic_eval(board: chess.Board) -> int:
     
     return score
 
-
-def _generate_comment(classification: str, move_san: str, best_move: Optional[str]) -> Optional[str]:
-    """Generate a simple comment for significant moves"""
-    if classification == "blunder":
-        comment = f"{move_san} was a blunder!"
-        if best_move:
-            comment += f" {best_move} was better."
-        return comment
-    elif classification == "mistake":
-        return f"{move_san} was a mistake. Consider alternatives."
-    elif classification == "great":
-        return f"Excellent move with {move_san}!"
-    return None
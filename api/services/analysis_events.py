@@ -0,0 +1,126 @@
+"""
+Analysis Progress Events
+Per-ply analysis events published by workers and tailed by streaming endpoints.
+
+Events go to a capped MongoDB collection so they reach API processes other
+than the worker that produced them (standalone workers included). Readers
+use a tailable await cursor, so the server pushes new events instead of
+clients re-reading the game document. Each job's events carry a per-job
+`seq` (counted on the job document), so a reader resumes after the last
+event it saw even once older events have rolled out of the collection.
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional, Dict, Any, AsyncIterator
+
+from pymongo import ASCENDING, CursorType, ReturnDocument
+from pymongo.errors import CollectionInvalid
+
+from api.database import get_analysis_jobs_collection, get_db
+
+
+EVENTS_COLLECTION = "analysis_events"
+EVENTS_SIZE_MB = int(os.getenv("ANALYSIS_EVENTS_SIZE_MB", "16"))
+
+# Event types that end a job's stream
+FINAL_EVENTS = {"summary", "failed"}
+
+
+async def create_events_collection():
+    """Create the capped events collection (idempotent)"""
+    db = get_db()
+    if db is None:
+        return
+    try:
+        await db.create_collection(
+            EVENTS_COLLECTION,
+            capped=True,
+            size=EVENTS_SIZE_MB * 1024 * 1024
+        )
+    except CollectionInvalid:
+        pass  # Already exists
+    await db[EVENTS_COLLECTION].create_index([("job_id", ASCENDING), ("seq", ASCENDING)])
+
+
+async def _next_seq(job_id: Optional[str]) -> Optional[int]:
+    """Next event number of a job (None without a job)"""
+    jobs = get_analysis_jobs_collection()
+    if job_id is None or jobs is None:
+        return None
+    job = await jobs.find_one_and_update(
+        {"_id": job_id},
+        {"$inc": {"event_seq": 1}},
+        projection={"event_seq": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return job["event_seq"] if job else None
+
+
+async def publish_event(
+    game_id: str,
+    job_id: Optional[str],
+    event_type: str,
+    data: Dict[str, Any]
+):
+    """
+    Publish an analysis event.
+
+    Args:
+        game_id: Game document id
+        job_id: Queue job id the event belongs to
+        event_type: start, move, summary, retry or failed
+        data: Event payload
+    """
+    db = get_db()
+    if db is None:
+        return
+    try:
+        await db[EVENTS_COLLECTION].insert_one({
+            "game_id": game_id,
+            "job_id": job_id,
+            "seq": await _next_seq(job_id),
+            "type": event_type,
+            "data": data,
+            "created_at": datetime.utcnow()
+        })
+    except Exception as e:
+        print(f"[Events] Publish error: {e}")
+
+
+async def tail_events(job_id: str, timeout: float = 600.0) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield a job's events in publish order, waiting for new ones, until a
+    final event (summary/failed) or the timeout.
+
+    Yields:
+        Event documents ({"type", "data", ...})
+    """
+    db = get_db()
+    if db is None:
+        return
+
+    collection = db[EVENTS_COLLECTION]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    last_seq = 0
+
+    while loop.time() < deadline:
+        # Resume after the last event seen by its per-job seq (ObjectIds from
+        # different worker hosts are not strictly ordered, and positions shift
+        # once old events roll out of the capped collection)
+        cursor = collection.find(
+            {"job_id": job_id, "seq": {"$gt": last_seq}},
+            cursor_type=CursorType.TAILABLE_AWAIT
+        )
+        while cursor.alive and loop.time() < deadline:
+            async for doc in cursor:
+                last_seq = doc["seq"]
+                yield doc
+                if doc["type"] in FINAL_EVENTS:
+                    return
+            # No new data within the await window: loop and keep waiting
+
+        # A tailable cursor dies if nothing matched yet; back off and retry
+        await asyncio.sleep(0.5)
@@ -0,0 +1,360 @@
+"""
+Analysis Job Queue
+Durable MongoDB-backed queue for game analysis jobs.
+
+Jobs survive restarts and are claimed atomically with find_one_and_update.
+A claimed job is hidden for a visibility timeout (its lease); if the worker
+dies without finishing, the lease expires and another worker picks it up.
+Failed jobs are retried with exponential backoff up to max_attempts.
+
+Only one active (queued or running) job may exist per game, enforced by a
+partial unique index, so concurrent triggers cannot both start an analysis.
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+from pymongo import ReturnDocument, ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from api.database import get_analysis_jobs_collection
+
+
+# Priorities (lower value is claimed first)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+PRIORITIES = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "bulk": PRIORITY_BULK,
+}
+
+# Queue configuration (overridable via environment)
+VISIBILITY_TIMEOUT = int(os.getenv("ANALYSIS_VISIBILITY_TIMEOUT", "300"))  # seconds
+MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE = int(os.getenv("ANALYSIS_BACKOFF_BASE", "10"))  # seconds, doubled per attempt
+POLL_INTERVAL = float(os.getenv("ANALYSIS_POLL_INTERVAL", "1.0"))  # seconds when idle
+
+
+async def create_queue_indexes():
+    """Create indexes used by the queue (idempotent)"""
+    collection = get_analysis_jobs_collection()
+    if collection is None:
+        return
+    # One active job per game
+    await collection.create_index(
+        "game_id",
+        name="active_game_unique",
+        unique=True,
+        partialFilterExpression={"active": True}
+    )
+    # Claim order
+    await collection.create_index(
+        [("active", ASCENDING), ("priority", ASCENDING), ("created_at", ASCENDING)]
+    )
+
+
+async def enqueue_analysis(
+    game_id: str,
+    depth: int = 16,
+    priority: int = PRIORITY_INTERACTIVE,
+    adaptive: bool = False,
+    nodes: Optional[int] = None,
+    refine_plies: int = 0
+) -> Dict[str, Any]:
+    """
+    Queue a game for analysis.
+
+    Args:
+        game_id: Game document id
+        depth: Analysis depth
+        priority: PRIORITY_INTERACTIVE or PRIORITY_BULK
+        adaptive: Shallow sweep first, full depth only on critical plies
+        nodes: Node budget per position (deterministic mode, replaces depth)
+        refine_plies: Critical plies re-searched with MultiPV (0 = none)
+
+    Returns:
+        Dict with "queued" (False if an active job already existed) and "job"
+
+    Raises:
+        RuntimeError: If the database is not connected
+    """
+    collection = get_analysis_jobs_collection()
+    if collection is None:
+        raise RuntimeError("Database not available")
+
+    now = datetime.utcnow()
+    job = {
+        "_id": str(uuid.uuid4()),
+        "game_id": game_id,
+        "depth": depth,
+        "adaptive": adaptive,
+        "nodes": nodes,
+        "refine_plies": refine_plies,
+        "priority": priority,
+        "status": "queued",
+        "active": True,
+        "attempts": 0,
+        "max_attempts": MAX_ATTEMPTS,
+        "visible_at": now,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+    try:
+        await collection.insert_one(job)
+        return {"queued": True, "job": job}
+    except DuplicateKeyError:
+        existing = await collection.find_one({"game_id": game_id, "active": True})
+        # An interactive request promotes a pending bulk job
+        if existing and existing["status"] == "queued" and priority < existing["priority"]:
+            await collection.update_one(
+                {"_id": existing["_id"], "status": "queued"},
+                {"$set": {"priority": priority, "updated_at": now}}
+            )
+            existing["priority"] = priority
+        return {"queued": False, "job": existing}
+
+
+async def claim_job(worker_id: str, visibility_timeout: int = VISIBILITY_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """
+    Atomically claim the highest-priority visible job.
+
+    A job is visible when it is queued (and its backoff has elapsed) or when
+    a running job's lease has expired.
+
+    Returns:
+        The claimed job (with a fresh lease_id), or None if nothing is ready
+    """
+    collection = get_analysis_jobs_collection()
+    if collection is None:
+        return None
+
+    now = datetime.utcnow()
+    return await collection.find_one_and_update(
+        {"active": True, "visible_at": {"$lte": now}},
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "lease_id": str(uuid.uuid4()),
+                "visible_at": now + timedelta(seconds=visibility_timeout),
+                "started_at": now,
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("priority", ASCENDING), ("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def extend_lease(job: Dict[str, Any], visibility_timeout: int = VISIBILITY_TIMEOUT) -> bool:
+    """Push a running job's lease forward. Returns False if the lease was lost."""
+    collection = get_analysis_jobs_collection()
+    if collection is None:
+        return False
+
+    now = datetime.utcnow()
+    result = await collection.update_one(
+        {"_id": job["_id"], "lease_id": job["lease_id"], "status": "running"},
+        {"$set": {"visible_at": now + timedelta(seconds=visibility_timeout), "updated_at": now}}
+    )
+    return result.modified_count == 1
+
+
+async def complete_job(job: Dict[str, Any]) -> bool:
+    """Mark a job done (only if this worker still holds the lease)"""
+    collection = get_analysis_jobs_collection()
+    if collection is None:
+        return False
+
+    now = datetime.utcnow()
+    result = await collection.update_one(
+        {"_id": job["_id"], "lease_id": job["lease_id"]},
+        {"$set": {"status": "done", "finished_at": now, "updated_at": now},
+         "$unset": {"active": ""}}
+    )
+    return result.modified_count == 1
+
+
+async def fail_job(job: Dict[str, Any], error: str) -> str:
+    """
+    Record a failed attempt: requeue with exponential backoff, or mark the
+    job failed once max_attempts is reached.
+
+    Returns:
+        New job status ("queued" or "failed")
+    """
+    collection = get_analysis_jobs_collection()
+    if collection is None:
+        return "failed"
+
+    now = datetime.utcnow()
+    if job.get("attempts", 1) < job.get("max_attempts", MAX_ATTEMPTS):
+        delay = BACKOFF_BASE * (2 ** (job.get("attempts", 1) - 1))
+        update = {
+            "$set": {
+                "status": "queued",
+                "visible_at": now + timedelta(seconds=delay),
+                "last_error": error,
+                "updated_at": now,
+            }
+        }
+        status = "queued"
+    else:
+        update = {
+            "$set": {"status": "failed", "last_error": error, "finished_at": now, "updated_at": now},
+            "$unset": {"active": ""},
+        }
+        status = "failed"
+
+    await collection.update_one({"_id": job["_id"], "lease_id": job["lease_id"]}, update)
+    return status
+
+
+async def get_active_job(game_id: str) -> Optional[Dict[str, Any]]:
+    """Get the queued/running job for a game, if any"""
+    collection = get_analysis_jobs_collection()
+    if collection is None:
+        return None
+    return await collection.find_one({"game_id": game_id, "active": True})
+
+
+class AnalysisWorker:
+    """
+    Claims jobs from the queue and runs them with bounded concurrency.
+
+    Can run inside the API process (see main.py lifespan) or standalone
+    via `python -m api.worker` so analysis capacity scales separately.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        concurrency: int = 1,
+        visibility_timeout: int = VISIBILITY_TIMEOUT,
+        on_failure: Optional[Callable[[Dict[str, Any], str, str], Awaitable[None]]] = None
+    ):
+        """
+        Initialize worker.
+
+        Args:
+            handler: Async function run for each claimed job; raising marks the attempt failed
+            concurrency: Max jobs processed at once
+            visibility_timeout: Lease length in seconds (renewed while the job runs)
+            on_failure: Optional async hook(job, status, error) called after a failed
+                        attempt, with status "queued" (will retry) or "failed" (final)
+                        and the error of this attempt
+        """
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.visibility_timeout = visibility_timeout
+        self.on_failure = on_failure
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._running: set = set()
+        self._stopping = asyncio.Event()
+        self.processed = 0
+        self.failed = 0
+
+    async def _heartbeat(self, job: Dict[str, Any], work: asyncio.Task, lost: asyncio.Event):
+        """
+        Renew the lease at a third of the visibility timeout. Once the lease
+        is lost another worker may claim the job, so `work` is cancelled.
+        """
+        interval = max(1, self.visibility_timeout // 3)
+        while True:
+            await asyncio.sleep(interval)
+            if not await extend_lease(job, self.visibility_timeout):
+                print(f"[Queue] Lost lease on job {job['_id']}, cancelling it")
+                lost.set()
+                work.cancel()
+                return
+
+    async def _process(self, job: Dict[str, Any]):
+        lost = asyncio.Event()
+        work = asyncio.create_task(self.handler(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job, work, lost))
+        try:
+            try:
+                await work
+            except asyncio.CancelledError:
+                if not lost.is_set():
+                    raise
+                # The job belongs to whichever worker holds the lease now
+                return
+            await complete_job(job)
+            self.processed += 1
+        except Exception as e:
+            if lost.is_set():
+                return
+            self.failed += 1
+            status = await fail_job(job, str(e))
+            print(f"[Queue] Job {job['_id']} (game {job['game_id']}) attempt {job['attempts']} failed: {e} -> {status}")
+            if self.on_failure is not None:
+                try:
+                    await self.on_failure(job, status, str(e))
+                except Exception:
+                    pass
+        finally:
+            heartbeat.cancel()
+            self._slots.release()
+
+    async def run(self):
+        """Claim and process jobs until stop() is called"""
+        print(f"[Queue] Worker {self.worker_id} started (concurrency={self.concurrency})")
+        while not self._stopping.is_set():
+            await self._slots.acquire()
+            try:
+                job = await claim_job(self.worker_id, self.visibility_timeout)
+            except Exception as e:
+                print(f"[Queue] Claim error: {e}")
+                job = None
+
+            if job is None:
+                self._slots.release()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Reclaimed after its lease expired once too often (worker kept dying)
+            if job["attempts"] > job.get("max_attempts", MAX_ATTEMPTS):
+                self._slots.release()
+                error = "Lease expired after max attempts"
+                await fail_job(job, error)
+                if self.on_failure is not None:
+                    try:
+                        await self.on_failure(job, "failed", error)
+                    except Exception:
+                        pass
+                continue
+
+            task = asyncio.create_task(self._process(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        # Let in-flight jobs finish; unfinished ones are reclaimed after their lease expires
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        print(f"[Queue] Worker {self.worker_id} stopped")
+
+    def stop(self):
+        """Ask the run loop to exit after in-flight jobs finish"""
+        self._stopping.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Worker counters for health reporting"""
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": len(self._running),
+            "processed": self.processed,
+            "failed": self.failed
+        }
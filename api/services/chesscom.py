@@ -13,6 +13,7 @@ from chessdotcom import ChessDotComClient, RateLimitHandler
 
 from api.models.game import Platform, TimeClass, FetchGamesResponse
 from api.database import get_games_collection
+from api.services.game_analyses import game_content_hash
 
 # Client configuration with rate limiting
 client = ChessDotComClient(
@@ -113,6 +114,7 @@ async def fetch_chesscom_games(username: str, months: int = 3) -> FetchGamesResp
                 # Parse and store game
                 parsed_game = _parse_game(game_data, username)
                 parsed_game["platform_id"] = platform_id
+                parsed_game["content_hash"] = game_content_hash(parsed_game["pgn"])
                 
                 if collection is not None:
                     try:
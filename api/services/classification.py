@@ -0,0 +1,484 @@
+"""
+Move Classification
+Whole-game move classification, accuracy and critical moments with NumPy.
+
+Every metric is computed on arrays covering all plies of a game at once:
+centipawn loss, win-percentage deltas, classifications (chess.com/lichess
+style cp-loss thresholds), Lichess-style accuracy (per move, and per player
+as the mean of the volatility-weighted and harmonic means) and critical
+moments. Both analysis paths (StockfishAnalyzer and analyze_game_moves) and
+the statistics stored on analysed games go through this module.
+"""
+
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+
+# Upper cp-loss bound (inclusive) of each class, checked in order
+CP_LOSS_CLASSES = (
+    (10, "great"),
+    (25, "excellent"),
+    (50, "good"),
+    (100, "inaccuracy"),
+    (250, "mistake"),
+)
+# Boundaries between error classes (good/inaccuracy, inaccuracy/mistake, mistake/blunder)
+CLASSIFICATION_BOUNDARIES = (50, 100, 250)
+
+# Promotions losing at most this much are "brilliant"
+BRILLIANT_MAX_CP_LOSS = 5
+
+# Moves losing at most BRILLIANT_MAX_CP_LOSS that leave at least this much
+# material (cp) en prise by static exchange evaluation are "brilliant"
+BRILLIANT_MIN_SACRIFICE = 200
+
+# A sacrifice (by SEE, or found by the MultiPV pass) only counts while the
+# mover wasn't already winning easily (win% before), nor is worse after it
+SACRIFICE_MAX_WIN_BEFORE = 90.0
+SACRIFICE_MIN_WIN_AFTER = 45.0
+
+# MultiPV second pass (StockfishAnalyzer refine_plies): sound sacrifices are
+# "brilliant" and only moves "great" if they lose at most this much
+REFINED_MAX_CP_LOSS = 10
+
+# Mates (10000 - N) and Syzygy wins (TABLEBASE_WIN_CP - DTZ) score at least
+# this: a move keeping a forced win (or loss) for the same side loses nothing,
+# even from a found mate into a tablebase win
+FORCED_WIN_CP = 9800
+
+# Without an opening book, moves up to this number count as book
+BOOK_MOVES = 10
+
+GOOD_CLASSES = ("brilliant", "great", "best", "excellent", "good", "book")
+CRITICAL_CLASSES = ("blunder", "mistake")
+
+# Lichess win% model: cp is capped before conversion
+WIN_CP_CAP = 1000
+WIN_CP_SLOPE = 0.00368208
+
+# Lichess move accuracy from the win% lost: A * exp(-B * loss) + C (+1 uncertainty bonus)
+ACCURACY_A = 103.1668100711649
+ACCURACY_B = 0.04354415386753951
+ACCURACY_C = -3.166924740191411
+
+
+# Classification codes (index into CLASS_NAMES)
+CLASS_NAMES = np.array(["book", "normal", "best", "brilliant", "great", "excellent",
+                        "good", "inaccuracy", "mistake", "blunder"])
+BOOK, NORMAL, BEST, BRILLIANT, FIRST_BAND = 0, 1, 2, 3, 4
+GREAT = FIRST_BAND
+BLUNDER, MISTAKE, INACCURACY = (int(np.flatnonzero(CLASS_NAMES == name)[0])
+                                for name in ("blunder", "mistake", "inaccuracy"))
+# Lookup tables indexed by code (cheaper than np.isin on small arrays)
+IS_GOOD = np.isin(CLASS_NAMES, GOOD_CLASSES)
+IS_CRITICAL = np.isin(CLASS_NAMES, CRITICAL_CLASSES)
+_BAND_BOUNDS = np.array([bound for bound, _ in CP_LOSS_CLASSES], dtype=float)
+
+
+def as_scores(values: Sequence[Optional[float]]) -> np.ndarray:
+    """Evals (None = unknown) as a float array with NaN for unknown"""
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def win_percent(cp: np.ndarray) -> np.ndarray:
+    """White's winning chances (0-100) for White-perspective centipawns"""
+    capped = np.clip(cp, -WIN_CP_CAP, WIN_CP_CAP)
+    return 50 + 50 * (2 / (1 + np.exp(-WIN_CP_SLOPE * capped)) - 1)
+
+
+def cp_losses(cp_before: np.ndarray, cp_after: np.ndarray, white_moved: Sequence[bool]) -> np.ndarray:
+    """Centipawns each move lost for its mover (0 while the same side keeps a forced win)"""
+    sign = np.where(np.asarray(white_moved, dtype=bool), 1.0, -1.0)
+    decided = (np.abs(cp_before) >= FORCED_WIN_CP) & (np.abs(cp_after) >= FORCED_WIN_CP) & \
+        (np.sign(cp_before) == np.sign(cp_after))
+    return np.where(decided, 0.0, (cp_before - cp_after) * sign)
+
+
+def sacrifice_candidates(cp_before: np.ndarray, cp_after: np.ndarray, white_moved: Sequence[bool]) -> np.ndarray:
+    """
+    Moves whose material offered (SEE) can make them "brilliant": at most
+    BRILLIANT_MAX_CP_LOSS lost, within the SACRIFICE_MAX_WIN_BEFORE /
+    SACRIFICE_MIN_WIN_AFTER window, evals known (White's perspective, NaN =
+    unknown). Callers only need SEE on these plies.
+    """
+    white_moved = np.asarray(white_moved, dtype=bool)
+    sign = np.where(white_moved, 1.0, -1.0)
+    win_before = win_percent(cp_before)
+    win_after = win_percent(cp_after)
+    mover_before = np.where(white_moved, win_before, 100 - win_before)
+    mover_after = np.where(white_moved, win_after, 100 - win_after)
+    return (
+        ((cp_before - cp_after) * sign <= BRILLIANT_MAX_CP_LOSS)
+        & (mover_before <= SACRIFICE_MAX_WIN_BEFORE)
+        & (mover_after >= SACRIFICE_MIN_WIN_AFTER)
+    )
+
+
+def is_sacrifice_candidate(cp_before: Optional[float], cp_after: Optional[float], white_moved: bool) -> bool:
+    """sacrifice_candidates for a single move (None = unknown eval)"""
+    if cp_before is None or cp_after is None:
+        return False
+    return bool(sacrifice_candidates(np.array([cp_before], dtype=float), np.array([cp_after], dtype=float),
+                                     [white_moved])[0])
+
+
+def classify_cp_losses(
+    cp_loss: np.ndarray,
+    promotion: np.ndarray,
+    book: np.ndarray,
+    only_move: Optional[np.ndarray] = None,
+    sacrifice: Optional[np.ndarray] = None,
+    offered: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Classification codes from the mover's cp loss (NaN = unknown eval).
+
+    Book moves are "book", unknown evals "normal", zero loss "best", cheap
+    promotions "brilliant", then the CP_LOSS_CLASSES bands, else "blunder".
+    Moves the MultiPV pass found to be sacrifices ("brilliant") or only
+    moves ("great") keep that class when they lose at most REFINED_MAX_CP_LOSS,
+    and so do cheap moves leaving BRILLIANT_MIN_SACRIFICE en prise (`offered`,
+    cp by SEE) within BRILLIANT_MAX_CP_LOSS. `offered` must already be 0
+    outside sacrifice_candidates (classify_games does this).
+    """
+    codes = FIRST_BAND + np.searchsorted(_BAND_BOUNDS, cp_loss)
+    codes[(cp_loss <= BRILLIANT_MAX_CP_LOSS) & promotion] = BRILLIANT
+    codes[cp_loss == 0] = BEST
+    refined = cp_loss <= REFINED_MAX_CP_LOSS
+    if only_move is not None:
+        codes[refined & only_move] = GREAT
+    if sacrifice is not None:
+        codes[refined & sacrifice] = BRILLIANT
+    if offered is not None:
+        codes[(cp_loss <= BRILLIANT_MAX_CP_LOSS) & (offered >= BRILLIANT_MIN_SACRIFICE)] = BRILLIANT
+    codes[np.isnan(cp_loss)] = NORMAL
+    codes[book] = BOOK
+    return codes
+
+
+def move_accuracy(win_before: np.ndarray, win_after: np.ndarray) -> np.ndarray:
+    """Lichess accuracy (0-100) of moves from the mover's win% before and after"""
+    loss = win_before - win_after
+    raw = ACCURACY_A * np.exp(-ACCURACY_B * np.maximum(loss, 0)) + ACCURACY_C + 1
+    return np.where(loss <= 0, 100.0, np.clip(raw, 0, 100))
+
+
+def _volatility_weights(wins: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Per-move weights for games laid end to end: standard deviation of White's
+    win% over a window around the move (Lichess: n/10 positions, 2-8,
+    clamped to 0.5-12), so moves in sharp phases count more.
+
+    Args:
+        wins: White's win% per position, each game's positions (moves + 1) in turn
+        lengths: Moves per game
+    """
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0)
+
+    # Fill unknown win% forward within each game (unknown first positions are 50)
+    starts = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]])
+    wins = wins.copy()
+    first = wins[starts]
+    wins[starts] = np.where(np.isnan(first), 50.0, first)
+    known = ~np.isnan(wins)
+    wins = wins[np.maximum.accumulate(np.where(known, np.arange(len(wins)), 0))]
+
+    # Window per game, and for each move the start of its window: the first
+    # (window - 2) moves share the game's first window, then it slides
+    windows = np.minimum(np.clip(lengths // 10, 2, 8), lengths + 1)
+    game = np.repeat(np.arange(len(lengths)), lengths)
+    move = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    window = windows[game]
+    start = starts[game] + np.maximum(0, move - window + 2)
+
+    weights = np.empty(total)
+    for size in np.unique(window):
+        stds = np.lib.stride_tricks.sliding_window_view(wins, size).std(axis=1)
+        mask = window == size
+        weights[mask] = stds[start[mask]]
+    return np.clip(weights, 0.5, 12)
+
+
+@dataclass
+class GameClassification:
+    """Per-ply metrics for a whole game (arrays indexed by ply - 1)"""
+    cp_loss: np.ndarray          # Mover's centipawn loss (NaN = unknown)
+    win_delta: np.ndarray        # Mover's win% change (negative = worse)
+    accuracy: np.ndarray         # Lichess move accuracy (NaN = unknown)
+    codes: np.ndarray            # Classification codes (see CLASS_NAMES)
+    white_moved: np.ndarray
+    white_accuracy: Optional[float]
+    black_accuracy: Optional[float]
+
+    @property
+    def classifications(self) -> np.ndarray:
+        """Classification strings"""
+        return CLASS_NAMES[self.codes]
+
+    def critical(self, limit: Optional[int] = None) -> np.ndarray:
+        """Indices of blunders and mistakes, largest cp loss first"""
+        indices = np.flatnonzero(IS_CRITICAL[self.codes])
+        order = np.argsort(-np.abs(self.cp_loss[indices]), kind="stable")
+        return indices[order][:limit]
+
+    def precision(self, white: bool) -> int:
+        """Share (%) of a player's moves classified good or better"""
+        mask = self.white_moved == white
+        if not mask.any():
+            return 0
+        return round(IS_GOOD[self.codes[mask]].sum() / mask.sum() * 100)
+
+
+def classify_games(
+    cp_before: np.ndarray,
+    cp_after: np.ndarray,
+    promotion: np.ndarray,
+    white_moved: np.ndarray,
+    book: np.ndarray,
+    lengths: Sequence[int],
+    only_move: Optional[np.ndarray] = None,
+    sacrifice: Optional[np.ndarray] = None,
+    offered: Optional[np.ndarray] = None
+) -> List[GameClassification]:
+    """
+    Classify many games at once. Per-move inputs of all games are laid end
+    to end (game 1's plies, then game 2's, ...) so every metric is a single
+    array operation however many games there are.
+
+    Args:
+        cp_before: White-perspective eval before each move (NaN = unknown)
+        cp_after: White-perspective eval after each move (NaN = unknown)
+        promotion: Whether each move is a promotion
+        white_moved: Whether White made each move
+        book: Book flag per move
+        lengths: Moves per game
+        only_move: Optional flag per move: the MultiPV pass found it the only good move
+        sacrifice: Optional flag per move: the MultiPV pass found it a sound sacrifice
+        offered: Optional material (cp) each move leaves en prise by SEE
+                 (only counted for sacrifice_candidates)
+
+    Returns:
+        One GameClassification per game (arrays are views into shared ones)
+    """
+    lengths = np.asarray(lengths, dtype=int)
+    cp_loss = cp_losses(cp_before, cp_after, white_moved)
+    if offered is not None:
+        offered = np.where(sacrifice_candidates(cp_before, cp_after, white_moved), offered, 0)
+    codes = classify_cp_losses(cp_loss, promotion, book, only_move, sacrifice, offered)
+
+    win_before = win_percent(cp_before)
+    win_after = win_percent(cp_after)
+    mover_before = np.where(white_moved, win_before, 100 - win_before)
+    mover_after = np.where(white_moved, win_after, 100 - win_after)
+    win_delta = mover_after - mover_before
+    accuracy = move_accuracy(mover_before, mover_after)
+    accuracy[np.isnan(win_delta)] = np.nan
+
+    # White's win% per position: each game's starting position, then one per move
+    offsets = np.cumsum(lengths) - lengths
+    game = np.repeat(np.arange(len(lengths)), lengths)
+    starts = offsets + np.arange(len(lengths))
+    wins = np.full(len(cp_loss) + len(lengths), np.nan)
+    wins[np.arange(len(cp_loss)) + game + 1] = win_after
+    played = lengths > 0
+    wins[starts[played]] = win_before[offsets[played]]
+    weights = _volatility_weights(wins, lengths)
+
+    # Per game and colour: volatility-weighted mean and harmonic mean of move accuracies
+    known = ~np.isnan(accuracy)
+    slot = (game * 2 + ~white_moved)[known]
+    values = accuracy[known]
+    bins = 2 * len(lengths)
+    count = np.bincount(slot, minlength=bins)
+    weight_sums = np.maximum(np.bincount(slot, weights[known], bins), 1e-12)
+    weighted = np.bincount(slot, values * weights[known], bins) / weight_sums
+    harmonic = count / np.maximum(np.bincount(slot, 1 / np.maximum(values, 1), bins), 1e-12)
+    player_accuracy = np.round((weighted + harmonic) / 2, 1)
+
+    games = []
+    for g, (start, end) in enumerate(zip(offsets, offsets + lengths)):
+        white_accuracy, black_accuracy = (
+            float(player_accuracy[2 * g + c]) if count[2 * g + c] else None for c in (0, 1)
+        )
+        games.append(GameClassification(
+            cp_loss=cp_loss[start:end],
+            win_delta=win_delta[start:end],
+            accuracy=accuracy[start:end],
+            codes=codes[start:end],
+            white_moved=white_moved[start:end],
+            white_accuracy=white_accuracy,
+            black_accuracy=black_accuracy
+        ))
+    return games
+
+
+def classify_game(
+    cp_before: Sequence[Optional[float]],
+    cp_after: Sequence[Optional[float]],
+    sans: Sequence[str],
+    white_moved: Optional[Sequence[bool]] = None,
+    book: Optional[Sequence[bool]] = None,
+    only_move: Optional[Sequence[bool]] = None,
+    sacrifice: Optional[Sequence[bool]] = None,
+    offered: Optional[Sequence[int]] = None
+) -> GameClassification:
+    """
+    Classify every move of a game at once.
+
+    Args:
+        cp_before: White-perspective eval before each move (None = unknown)
+        cp_after: White-perspective eval after each move (None = unknown)
+        sans: Moves in SAN (promotions can be "brilliant")
+        white_moved: Whether White made each move (default: alternating from White)
+        book: Book flag per move (OpeningBook). None when no book is loaded:
+              the first BOOK_MOVES moves count as book.
+        only_move: Optional only-move flag per move (MultiPV pass)
+        sacrifice: Optional sound-sacrifice flag per move (MultiPV pass)
+        offered: Optional material (cp) each move leaves en prise (SEE), needed
+                 only for sacrifice_candidates (engine evals only: heuristic
+                 evals can't tell a sacrifice from a blunder)
+
+    Returns:
+        GameClassification
+    """
+    plies = len(sans)
+    if white_moved is None:
+        white_moved = np.arange(plies) % 2 == 0
+    if book is None:
+        book = (np.arange(1, plies + 1) + 1) // 2 <= BOOK_MOVES
+    return classify_games(
+        as_scores(cp_before), as_scores(cp_after),
+        np.array(["=" in san for san in sans], dtype=bool),
+        np.asarray(white_moved, dtype=bool), np.asarray(book, dtype=bool), [plies],
+        only_move=np.asarray(only_move, dtype=bool) if only_move is not None else None,
+        sacrifice=np.asarray(sacrifice, dtype=bool) if sacrifice is not None else None,
+        offered=np.asarray(offered, dtype=float) if offered is not None else None
+    )[0]
+
+
+def classify_move_by_cp_loss(
+    cp_before: Optional[int],
+    cp_after: Optional[int],
+    is_white_to_move: bool,
+    move_san: str,
+    move_number: int,
+    is_book: Optional[bool] = None,
+    offered: Optional[int] = None
+) -> str:
+    """
+    Classify a single move based on centipawn loss (chess.com/lichess standard).
+    Same rules as classify_game, for callers classifying ply by ply.
+
+    Args:
+        cp_before: Centipawn evaluation before move
+        cp_after: Centipawn evaluation after move
+        is_white_to_move: True if white made the move
+        move_san: Move in SAN notation
+        move_number: Move number (1-indexed)
+        is_book: Whether the move reaches a known theory position (OpeningBook).
+                 None when no book is loaded: the first 10 moves count as book.
+        offered: Material (cp) the move leaves en prise by SEE, if known
+                 (counted only if is_sacrifice_candidate)
+
+    Returns:
+        Classification string
+    """
+    if is_book is None:
+        is_book = move_number <= BOOK_MOVES
+    if is_book:
+        return "book"
+    if cp_before is None or cp_after is None:
+        return "normal"
+
+    cp_loss = cp_losses(np.array([cp_before], dtype=float), np.array([cp_after], dtype=float), [is_white_to_move])
+    if offered is not None and not is_sacrifice_candidate(cp_before, cp_after, is_white_to_move):
+        offered = 0
+    code = classify_cp_losses(
+        cp_loss, np.array(["=" in move_san]), np.array([False]),
+        offered=np.array([offered], dtype=float) if offered is not None else None
+    )[0]
+    return str(CLASS_NAMES[code])
+
+
+def classify_results(results: List[Dict[str, Any]], white_first: bool = True) -> GameClassification:
+    """
+    Classify stored move analysis dictionaries (analysis_results).
+    Moves stored as "book" stay book; the rest are reclassified from their
+    evals, the only_move/sacrifice flags of the MultiPV pass and the
+    material each move offered (SEE). The mover is each move's stored
+    "white" flag, or for results stored without it, follows from
+    `white_first` (White makes the game's first move, see white_moves_first).
+    """
+    return classify_stored_games([results], [white_first])[0]
+
+
+def stored_movers(results: List[Dict[str, Any]], white_first: bool = True) -> List[bool]:
+    """Whether White made each stored move (its "white" flag, else from `white_first`)"""
+    return [
+        r["white"] if r.get("white") is not None else (r["ply"] % 2 == 1) == white_first
+        for r in results
+    ]
+
+
+def classify_stored_games(
+    games: List[List[Dict[str, Any]]],
+    white_first: Optional[Sequence[bool]] = None
+) -> List[GameClassification]:
+    """classify_results for many games in one vectorized pass (`white_first` per game)"""
+    moves = [r for results in games for r in results]
+    if white_first is None:
+        white_first = [True] * len(games)
+    white_moved = [white for results, first in zip(games, white_first) for white in stored_movers(results, first)]
+    return classify_games(
+        as_scores([r.get("eval_before") for r in moves]),
+        as_scores([r.get("eval_after") for r in moves]),
+        np.array(["=" in r.get("move", "") for r in moves], dtype=bool),
+        np.array(white_moved, dtype=bool),
+        np.array([r.get("classification") == "book" for r in moves], dtype=bool),
+        [len(results) for results in games],
+        only_move=np.array([bool(r.get("only_move")) for r in moves], dtype=bool),
+        sacrifice=np.array([bool(r.get("sacrifice")) for r in moves], dtype=bool),
+        offered=np.array([r.get("material_offered") or 0 for r in moves], dtype=float)
+    )
+
+
+def game_statistics(results: List[Dict[str, Any]], game: Optional[GameClassification] = None) -> Dict[str, Any]:
+    """
+    Statistics stored on an analysed game (and fed to the AI insights).
+
+    Args:
+        results: Move analysis dictionaries, in ply order
+        game: Their classification (computed from results if not given)
+    """
+    if game is None:
+        game = classify_results(results)
+
+    codes = game.codes
+    blunders = codes == BLUNDER
+    # Unknown evals count as 0 (as stored evals were read before)
+    abs_loss = np.abs(np.where(np.isnan(game.cp_loss), 0, game.cp_loss))
+
+    critical = game.critical(3)
+    return {
+        "total_moves": len(results),
+        "blunders": int(blunders.sum()),
+        "mistakes": int((codes == MISTAKE).sum()),
+        "inaccuracies": int((codes == INACCURACY).sum()),
+        "avg_blunder_cp": float(abs_loss[blunders].mean()) if blunders.any() else 0,
+        "white_precision": game.precision(True),
+        "black_precision": game.precision(False),
+        "white_accuracy": game.white_accuracy,
+        "black_accuracy": game.black_accuracy,
+        "top_critical": [
+            {
+                "move": (results[i]["ply"] + 1) // 2,
+                "played": results[i]["move"],
+                "cp_loss": int(abs_loss[i])
+            }
+            for i in critical
+        ]
+    }
@@ -0,0 +1,302 @@
+"""
+Stockfish Engine Pool
+App-lifetime pool of UCI engine processes shared by all analysis paths.
+
+Engines are started once in the FastAPI lifespan and leased per analysis
+instead of spawning (and loading NNUE) for every request. Waiters are
+served in FIFO order and crashed engines are replaced on the next lease.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any
+
+import chess.engine
+
+from api.services.tablebase import SYZYGY_PATH
+
+
+# Pool configuration (overridable via environment)
+DEFAULT_POOL_SIZE = int(os.getenv("STOCKFISH_POOL_SIZE", "2"))
+DEFAULT_THREADS = int(os.getenv("STOCKFISH_THREADS", "1"))
+DEFAULT_HASH_MB = int(os.getenv("STOCKFISH_HASH_MB", "64"))
+
+
+def is_engine_alive(engine: Optional[chess.engine.UciProtocol]) -> bool:
+    """Check whether an engine process is still running"""
+    if engine is None:
+        return False
+    return not engine.returncode.done()
+
+
+class EnginePool:
+    """
+    Fixed-size pool of Stockfish processes with fair (FIFO) leasing.
+    """
+
+    def __init__(
+        self,
+        stockfish_path: Optional[str] = None,
+        size: int = DEFAULT_POOL_SIZE,
+        threads: int = DEFAULT_THREADS,
+        hash_mb: int = DEFAULT_HASH_MB
+    ):
+        """
+        Initialize pool (engines are started by start()).
+
+        Args:
+            stockfish_path: Path to Stockfish binary. If None, uses the analyzer lookup.
+            size: Number of engine processes to keep alive
+            threads: UCI Threads option per engine
+            hash_mb: UCI Hash option (MB) per engine
+        """
+        if stockfish_path is None:
+            from api.services.stockfish_analyzer import find_stockfish_path
+            stockfish_path = find_stockfish_path()
+
+        self.stockfish_path = stockfish_path
+        self.size = max(1, size)
+        self.threads = max(1, threads)
+        self.hash_mb = max(1, hash_mb)
+
+        # asyncio.Queue wakes getters in arrival order, which gives us fair queuing.
+        # A slot holds either a live engine or None (engine to be (re)spawned lazily).
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._engines: List[chess.engine.UciProtocol] = []
+        self._started = False
+        self._waiting = 0
+        self.restarts = 0
+        self.leases = 0
+
+    async def _spawn(self) -> chess.engine.UciProtocol:
+        """Start and configure a single engine process"""
+        _, engine = await chess.engine.popen_uci(self.stockfish_path)
+        options = {}
+        if "Threads" in engine.options:
+            options["Threads"] = self.threads
+        if "Hash" in engine.options:
+            options["Hash"] = self.hash_mb
+        # Let searches use the same tables the analyzer probes
+        if SYZYGY_PATH and "SyzygyPath" in engine.options:
+            options["SyzygyPath"] = SYZYGY_PATH
+        if options:
+            await engine.configure(options)
+        self._engines.append(engine)
+        return engine
+
+    async def _discard(self, engine: Optional[chess.engine.UciProtocol]):
+        """Quit (if needed) and forget an engine"""
+        if engine is None:
+            return
+        if engine in self._engines:
+            self._engines.remove(engine)
+        if is_engine_alive(engine):
+            try:
+                await asyncio.wait_for(engine.quit(), timeout=2.0)
+            except Exception:
+                # Hung engines don't answer quit
+                try:
+                    engine.transport.kill()
+                except Exception:
+                    pass
+
+    async def start(self):
+        """Spawn all engines in the pool"""
+        if self._started:
+            return
+
+        print(f"[EnginePool] Starting {self.size} engine(s) at {self.stockfish_path} "
+              f"(Threads={self.threads}, Hash={self.hash_mb}MB)")
+
+        results = await asyncio.gather(
+            *[self._spawn() for _ in range(self.size)],
+            return_exceptions=True
+        )
+        failures = [r for r in results if isinstance(r, Exception)]
+        engines = [r for r in results if not isinstance(r, Exception)]
+
+        if not engines:
+            raise RuntimeError(f"Could not start any Stockfish engine: {failures[0]}")
+        if failures:
+            print(f"[EnginePool] {len(failures)} engine(s) failed to start, will retry on lease: {failures[0]}")
+
+        for engine in engines:
+            self._idle.put_nowait(engine)
+        for _ in failures:
+            self._idle.put_nowait(None)
+
+        self._started = True
+
+    async def stop(self):
+        """Quit all engines"""
+        for engine in list(self._engines):
+            await self._discard(engine)
+        self._engines = []
+        self._idle = asyncio.Queue()
+        self._started = False
+        print("[EnginePool] Stopped")
+
+    async def acquire(self, timeout: Optional[float] = None) -> chess.engine.UciProtocol:
+        """
+        Wait for an idle engine (FIFO), replacing it if it has died.
+
+        Args:
+            timeout: Optional seconds to wait for an idle engine. Unlike
+                     wrapping acquire() in asyncio.wait_for, an engine handed
+                     over just as the wait times out is never lost.
+
+        Raises:
+            asyncio.TimeoutError: If no engine became idle within `timeout`
+            RuntimeError: If a dead engine could not be restarted
+        """
+        if not self._started:
+            raise RuntimeError("Engine pool is not started")
+
+        self._waiting += 1
+        try:
+            engine = await self._idle.get() if timeout is None else await self._get_idle(timeout)
+        finally:
+            self._waiting -= 1
+
+        if is_engine_alive(engine):
+            self.leases += 1
+            return engine
+
+        await self._discard(engine)
+        try:
+            engine = await self._spawn()
+        except Exception as e:
+            # Give the slot back so capacity is not lost permanently
+            self._idle.put_nowait(None)
+            raise RuntimeError(f"Could not restart Stockfish engine: {e}")
+
+        self.restarts += 1
+        self.leases += 1
+        print(f"[EnginePool] Replaced dead engine (restarts={self.restarts})")
+        return engine
+
+    async def _get_idle(self, timeout: float) -> Optional[chess.engine.UciProtocol]:
+        """Take an idle slot within `timeout` (a cancelled Queue.get leaves its slot queued)"""
+        getter = asyncio.ensure_future(self._idle.get())
+        try:
+            await asyncio.wait({getter}, timeout=timeout)
+        except asyncio.CancelledError:
+            if getter.done() and not getter.cancelled():
+                self._idle.put_nowait(getter.result())
+            else:
+                getter.cancel()
+            raise
+        if not getter.done():
+            getter.cancel()
+            raise asyncio.TimeoutError
+        return getter.result()
+
+    async def replace(self, engine: Optional[chess.engine.UciProtocol]) -> chess.engine.UciProtocol:
+        """
+        Swap a leased engine that died or hung for a fresh process.
+        The caller keeps the lease and releases the returned engine instead.
+
+        Raises:
+            RuntimeError: If the new engine could not be started
+        """
+        await self._discard(engine)
+        try:
+            engine = await self._spawn()
+        except Exception as e:
+            raise RuntimeError(f"Could not restart Stockfish engine: {e}")
+
+        self.restarts += 1
+        print(f"[EnginePool] Replaced failed engine (restarts={self.restarts})")
+        return engine
+
+    def try_acquire(self) -> Optional[chess.engine.UciProtocol]:
+        """
+        Lease an idle live engine without waiting.
+        Returns None if nothing is idle or other callers are already queued
+        (so opportunistic extra leases never jump the FIFO queue).
+        """
+        if not self._started or self._waiting > 0:
+            return None
+        try:
+            engine = self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+        if not is_engine_alive(engine):
+            # Leave dead slots for a blocking acquire() to restart
+            self._idle.put_nowait(None)
+            return None
+
+        self.leases += 1
+        return engine
+
+    def release(self, engine: Optional[chess.engine.UciProtocol]):
+        """Return an engine to the pool. Dead engines are replaced on the next acquire."""
+        if not is_engine_alive(engine):
+            print("[EnginePool] Returned engine is dead, slot will be restarted")
+            engine = None
+        self._idle.put_nowait(engine)
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Lease an engine for the duration of a block.
+
+        Usage:
+            async with pool.lease() as engine:
+                info = await engine.analyse(board, limit)
+        """
+        engine = await self.acquire()
+        try:
+            yield engine
+        except chess.engine.EngineTerminatedError:
+            await self._discard(engine)
+            engine = None
+            raise
+        finally:
+            self.release(engine)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters for health reporting"""
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "alive": sum(1 for e in self._engines if is_engine_alive(e)),
+            "leases": self.leases,
+            "restarts": self.restarts
+        }
+
+
+# Global pool instance (created in the app lifespan)
+_engine_pool: Optional[EnginePool] = None
+
+
+async def start_engine_pool(
+    stockfish_path: Optional[str] = None,
+    size: int = DEFAULT_POOL_SIZE,
+    threads: int = DEFAULT_THREADS,
+    hash_mb: int = DEFAULT_HASH_MB
+) -> EnginePool:
+    """Create and start the global engine pool"""
+    global _engine_pool
+    if _engine_pool is not None:
+        return _engine_pool
+
+    pool = EnginePool(stockfish_path, size=size, threads=threads, hash_mb=hash_mb)
+    await pool.start()
+    _engine_pool = pool
+    return pool
+
+
+async def stop_engine_pool():
+    """Stop the global engine pool"""
+    global _engine_pool
+    if _engine_pool is not None:
+        await _engine_pool.stop()
+        _engine_pool = None
+
+
+def get_engine_pool() -> Optional[EnginePool]:
+    """Get the global engine pool (None if not started)"""
+    return _engine_pool
@@ -0,0 +1,191 @@
+"""
+Engine Watchdog
+Per-search deadlines, dead/stuck engine detection and restart-and-retry.
+
+Every analyzer search goes through EngineWatchdog.analyse. A search that
+outlives its deadline counts as stuck: the process is killed, replaced via
+the caller's restart hook and the same position is searched again. Engines
+found dead before or during a search are replaced the same way. After
+max_retries the search fails with EngineUnavailableError instead of
+silently returning an empty eval.
+"""
+
+import asyncio
+import os
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+
+import chess
+import chess.engine
+
+from api.services.engine_pool import is_engine_alive
+
+
+# Seconds allowed beyond a search's own time limit before it counts as stuck
+DEADLINE_GRACE = float(os.getenv("ENGINE_DEADLINE_GRACE", "5"))
+# Deadline for searches without a time limit (depth or node budget only)
+DEFAULT_DEADLINE = float(os.getenv("ENGINE_SEARCH_DEADLINE", "60"))
+# Restart-and-retry attempts per search
+MAX_SEARCH_RETRIES = int(os.getenv("ENGINE_SEARCH_RETRIES", "2"))
+
+
+class EngineUnavailableError(RuntimeError):
+    """A search kept failing after engine restarts"""
+
+
+RestartHook = Callable[[chess.engine.UciProtocol], Awaitable[chess.engine.UciProtocol]]
+PrepareHook = Callable[[chess.engine.UciProtocol], Awaitable[None]]
+
+
+def kill_engine(engine: Optional[chess.engine.UciProtocol]):
+    """Kill an engine process without waiting for it (for hung engines)"""
+    if engine is None or engine.transport is None:
+        return
+    try:
+        engine.transport.kill()
+    except Exception:
+        pass  # Already gone
+
+
+class EngineWatchdog:
+    """
+    Supervises engine searches and keeps restart/stuck-search counters.
+    """
+
+    def __init__(
+        self,
+        grace: float = DEADLINE_GRACE,
+        default_deadline: float = DEFAULT_DEADLINE,
+        max_retries: int = MAX_SEARCH_RETRIES
+    ):
+        """
+        Initialize watchdog.
+
+        Args:
+            grace: Seconds added to a search's time limit to get its deadline
+            default_deadline: Deadline for searches without a time limit
+            max_retries: Restarts (and retries) allowed per search
+        """
+        self.grace = grace
+        self.default_deadline = default_deadline
+        self.max_retries = max(0, max_retries)
+        self.searches = 0
+        self.stuck_searches = 0
+        self.dead_engines = 0
+        self.restarts = 0
+        self.retries = 0
+        self.failures = 0
+
+    def deadline(self, limit: chess.engine.Limit) -> float:
+        """Hard deadline in seconds for a search with `limit`"""
+        if limit.time is not None:
+            return limit.time + self.grace
+        return self.default_deadline
+
+    async def analyse(
+        self,
+        engine: chess.engine.UciProtocol,
+        board: chess.Board,
+        limit: chess.engine.Limit,
+        restart: RestartHook,
+        prepare: Optional[PrepareHook] = None,
+        **kwargs
+    ) -> Tuple[chess.engine.InfoDict, chess.engine.UciProtocol]:
+        """
+        Run engine.analyse under a deadline, restarting and retrying on failure.
+
+        Args:
+            engine: Engine to search with
+            board: Position to search
+            limit: Search limit
+            restart: Async hook(old_engine) -> new running engine
+            prepare: Optional async hook(engine) run before each attempt
+                     (e.g. configuring options), under the same deadline
+            **kwargs: Passed to engine.analyse
+
+        Returns:
+            (info, engine) - engine is the replacement if a restart happened
+
+        Raises:
+            EngineUnavailableError: If every attempt failed
+        """
+        deadline = self.deadline(limit)
+        last_error: Optional[BaseException] = None
+        failed = False
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                self.retries += 1
+
+            if failed or not is_engine_alive(engine):
+                if not failed:
+                    # Died between searches
+                    self.dead_engines += 1
+                try:
+                    engine = await restart(engine)
+                except Exception as e:
+                    last_error = e
+                    print(f"[Watchdog] Engine restart failed: {e}")
+                    continue
+                self.restarts += 1
+                failed = False
+
+            self.searches += 1
+            search = asyncio.ensure_future(self._search(engine, board, limit, prepare, kwargs))
+            try:
+                done, _ = await asyncio.wait({search}, timeout=deadline)
+            except asyncio.CancelledError:
+                search.cancel()
+                raise
+
+            if search in done:
+                try:
+                    return search.result(), engine
+                except chess.engine.EngineTerminatedError as e:
+                    self.dead_engines += 1
+                    last_error = e
+                    print(f"[Watchdog] Engine died during search: {e}")
+            else:
+                # Kill while the search is still pending: python-chess then
+                # fails it with EngineTerminatedError, which we drain here
+                self.stuck_searches += 1
+                last_error = asyncio.TimeoutError(f"no result after {deadline:.1f}s")
+                print(f"[Watchdog] Search exceeded {deadline:.1f}s deadline, killing engine")
+                kill_engine(engine)
+                try:
+                    await asyncio.wait_for(search, timeout=5.0)
+                except BaseException:
+                    pass
+            failed = True
+
+        self.failures += 1
+        raise EngineUnavailableError(
+            f"Search failed after {self.max_retries + 1} attempt(s): {last_error!r}"
+        )
+
+    async def _search(self, engine, board, limit, prepare, kwargs) -> chess.engine.InfoDict:
+        if prepare is not None:
+            await prepare(engine)
+        return await engine.analyse(board, limit, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Watchdog counters for health reporting"""
+        return {
+            "searches": self.searches,
+            "stuck_searches": self.stuck_searches,
+            "dead_engines": self.dead_engines,
+            "restarts": self.restarts,
+            "retries": self.retries,
+            "failures": self.failures
+        }
+
+
+# Singleton instance
+_engine_watchdog: Optional[EngineWatchdog] = None
+
+
+def get_engine_watchdog() -> EngineWatchdog:
+    """Get or create the engine watchdog singleton"""
+    global _engine_watchdog
+    if _engine_watchdog is None:
+        _engine_watchdog = EngineWatchdog()
+    return _engine_watchdog
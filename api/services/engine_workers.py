@@ -0,0 +1,606 @@
+"""
+Remote Engine Workers
+Client for engine worker daemons (python -m api.engine_server) over TCP.
+
+Each worker serves its own EnginePool. The API keeps a few persistent
+connections per worker; a connection behaves like a UCI engine
+(RemoteEngine: analyse, configure, id, returncode), so the analyzer, the
+watchdog and leased_analyzer use it exactly like a local engine.
+EngineWorkerPool has the EnginePool interface: leases go to the least
+loaded healthy worker, a periodic health check takes unreachable workers
+out of rotation (and brings them back), and a connection that drops mid
+search is replaced on another worker when the watchdog restarts it.
+
+Protocol: one JSON object per line. Requests carry an "op":
+- {"op": "status"} -> engine name, engine count, default options, pool stats
+- {"op": "analyse", "fen", "moves", "chess960", "limit", "multipv",
+  "new_game", "options"} -> {"ok": true, "infos": [...]}
+Failures answer {"ok": false, "error": ...}; a worker that cannot serve
+searches any more closes the connection after its reply. With
+ENGINE_WORKER_TOKEN set, every request carries it as "token" and the worker
+refuses (and disconnects) requests without it.
+"""
+
+import asyncio
+import json
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any, Tuple
+
+import chess
+import chess.engine
+
+from api.services.engine_pool import get_engine_pool, is_engine_alive
+
+
+# Worker addresses, e.g. "10.0.0.5:7600,10.0.0.6:7600" (empty = local engines only)
+ENGINE_WORKERS = os.getenv("ENGINE_WORKERS", "")
+DEFAULT_WORKER_PORT = int(os.getenv("ENGINE_WORKER_PORT", "7600"))
+CONNECT_TIMEOUT = float(os.getenv("ENGINE_WORKER_CONNECT_TIMEOUT", "5"))
+HEALTH_INTERVAL = float(os.getenv("ENGINE_WORKER_HEALTH_INTERVAL", "10"))
+# Shared secret between the API and its workers (required for non-loopback workers)
+WORKER_TOKEN = os.getenv("ENGINE_WORKER_TOKEN", "")
+# Options a client may set per search (anything else, e.g. file paths, is refused)
+REMOTE_OPTIONS = ("Threads", "Hash")
+# Longest protocol line (a MultiPV reply with long PVs stays far below this)
+MAX_LINE = 1024 * 1024
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """"host:port" (or "host", default port) -> (host, port)"""
+    host, _, port = address.strip().rpartition(":")
+    if not host:
+        return port, DEFAULT_WORKER_PORT
+    return host, int(port)
+
+
+async def send_message(writer: asyncio.StreamWriter, message: Dict[str, Any]):
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """Next message, or None when the peer has closed the connection"""
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def with_token(message: Dict[str, Any]) -> Dict[str, Any]:
+    """A request carrying WORKER_TOKEN (if one is set)"""
+    return {**message, "token": WORKER_TOKEN} if WORKER_TOKEN else message
+
+
+def encode_position(board: chess.Board) -> Dict[str, Any]:
+    """Root FEN plus moves, so the worker sees the game history (repetitions)"""
+    root = board.root()
+    return {
+        "fen": root.fen(),
+        "moves": [move.uci() for move in board.move_stack],
+        "chess960": board.chess960
+    }
+
+
+def decode_position(message: Dict[str, Any]) -> chess.Board:
+    board = chess.Board(message["fen"], chess960=message.get("chess960", False))
+    for uci in message.get("moves", []):
+        board.push_uci(uci)
+    return board
+
+
+def encode_limit(limit: chess.engine.Limit) -> Dict[str, Any]:
+    return {
+        name: getattr(limit, name) for name in ("time", "depth", "nodes", "mate")
+        if getattr(limit, name) is not None
+    }
+
+
+def encode_info(info: chess.engine.InfoDict) -> Dict[str, Any]:
+    """InfoDict -> JSON (score relative to the side to move, PV in UCI)"""
+    encoded = {
+        key: info[key] for key in ("depth", "seldepth", "nodes", "nps", "time", "tbhits", "hashfull", "multipv")
+        if key in info
+    }
+    score = info.get("score")
+    if score is not None:
+        relative = score.relative
+        if relative.is_mate():
+            encoded["mate"] = relative.mate()
+        else:
+            encoded["cp"] = relative.score()
+    if "pv" in info:
+        encoded["pv"] = [move.uci() for move in info["pv"]]
+    return encoded
+
+
+def decode_info(encoded: Dict[str, Any], board: chess.Board) -> chess.engine.InfoDict:
+    info = {key: value for key, value in encoded.items() if key not in ("cp", "mate", "pv")}
+    if "mate" in encoded:
+        info["score"] = chess.engine.PovScore(chess.engine.Mate(encoded["mate"]), board.turn)
+    elif "cp" in encoded:
+        info["score"] = chess.engine.PovScore(chess.engine.Cp(encoded["cp"]), board.turn)
+    if "pv" in encoded:
+        info["pv"] = [chess.Move.from_uci(uci) for uci in encoded["pv"]]
+    return info
+
+
+class _Disconnect:
+    """Stands in for the process transport: kill_engine() drops the connection"""
+
+    def __init__(self, engine: "RemoteEngine"):
+        self._engine = engine
+
+    def kill(self):
+        self._engine.close()
+
+
+class RemoteEngine:
+    """
+    One connection to an engine worker, used like a chess.engine.UciProtocol.
+    Searches on a connection run one at a time; each is served by whichever
+    of the worker's engines is free, with this connection's options.
+    """
+
+    def __init__(self, worker: "EngineWorker", reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 status: Dict[str, Any]):
+        self.worker = worker
+        self._reader = reader
+        self._writer = writer
+        self._lock = asyncio.Lock()
+        self.id = {"name": status.get("name")}
+        self.options = {name: None for name in status.get("options", {})}
+        # Current option values; sent with every search
+        self.config: Dict[str, Any] = dict(status.get("options", {}))
+        self.returncode: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.transport = _Disconnect(self)
+
+    @classmethod
+    async def connect(cls, worker: "EngineWorker") -> "RemoteEngine":
+        """
+        Open a connection to a worker and read its status.
+
+        Raises:
+            ConnectionError: If the worker is unreachable or does not answer
+        """
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(worker.host, worker.port, limit=MAX_LINE), timeout=CONNECT_TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise ConnectionError(f"cannot connect to engine worker {worker.address}: {e!r}")
+        try:
+            await send_message(writer, with_token({"op": "status"}))
+            status = await asyncio.wait_for(read_message(reader), timeout=CONNECT_TIMEOUT)
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            writer.close()
+            raise ConnectionError(f"engine worker {worker.address} did not answer: {e!r}")
+        if not status or not status.get("ok"):
+            writer.close()
+            raise ConnectionError(f"engine worker {worker.address} refused: {status}")
+        worker.update(status)
+        return cls(worker, reader, writer, status)
+
+    async def analyse(
+        self,
+        board: chess.Board,
+        limit: chess.engine.Limit,
+        *,
+        multipv: Optional[int] = None,
+        game: object = None
+    ):
+        """
+        Search on the worker (same result shape as UciProtocol.analyse).
+        A `game` asks for a new game (ucinewgame, fresh hash) as in python-chess.
+
+        Raises:
+            chess.engine.EngineTerminatedError: If the connection is lost
+            chess.engine.EngineError: If the worker reports a failed search
+        """
+        request = {
+            "op": "analyse",
+            **encode_position(board),
+            "limit": encode_limit(limit),
+            "multipv": multipv,
+            "new_game": game is not None,
+            "options": self.config
+        }
+        reply = await self._request(request)
+        if not reply.get("ok"):
+            raise chess.engine.EngineError(f"engine worker {self.worker.address}: {reply.get('error')}")
+        infos = [decode_info(info, board) for info in reply.get("infos", [])]
+        if multipv is None:
+            return infos[0] if infos else {}
+        return infos
+
+    async def configure(self, options: Dict[str, Any]):
+        """Set options for the following searches (Threads and Hash only)"""
+        for name, value in options.items():
+            if name not in self.options:
+                raise chess.engine.EngineError(f"engine worker does not accept option {name!r}")
+            self.config[name] = value
+
+    async def ping(self):
+        reply = await self._request({"op": "status"})
+        if not reply.get("ok"):
+            raise chess.engine.EngineError(f"engine worker {self.worker.address}: {reply.get('error')}")
+
+    async def quit(self):
+        self.close()
+
+    async def _request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._lock:
+            if self.returncode.done():
+                raise chess.engine.EngineTerminatedError(f"connection to {self.worker.address} is closed")
+            try:
+                await send_message(self._writer, with_token(message))
+                reply = await read_message(self._reader)
+            except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+                self.close()
+                raise chess.engine.EngineTerminatedError(f"connection to {self.worker.address} lost: {e!r}")
+            except BaseException:
+                # Cancelled mid-request: the reply would be read by the next
+                # request on this connection, so drop it (the pool replaces it)
+                self.close()
+                raise
+            if reply is None:
+                self.close()
+                raise chess.engine.EngineTerminatedError(f"engine worker {self.worker.address} closed the connection")
+            return reply
+
+    def close(self):
+        """Drop the connection (pending and later searches fail as terminated)"""
+        if not self.returncode.done():
+            self.returncode.set_result(0)
+        self._writer.transport.abort()
+
+
+class EngineWorker:
+    """
+    Client-side state of one worker daemon.
+    """
+
+    def __init__(self, address: str):
+        self.host, self.port = parse_address(address)
+        self.healthy = False
+        self.name: Optional[str] = None
+        self.engines = 0          # Engines the worker runs
+        self.connections: List[RemoteEngine] = []
+        self.in_use = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.remote_stats: Dict[str, Any] = {}
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    @property
+    def load(self) -> float:
+        """Share of this worker's engines leased by us"""
+        return self.in_use / max(1, self.engines)
+
+    def update(self, status: Dict[str, Any]):
+        self.name = status.get("name")
+        self.engines = int(status.get("size", 0))
+        self.remote_stats = status.get("pool", {})
+
+    def mark_down(self, error: BaseException):
+        if self.healthy:
+            print(f"[EngineWorkers] {self.address} is down: {error}")
+        self.healthy = False
+        self.failures += 1
+        self.last_error = str(error)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "healthy": self.healthy,
+            "engine": self.name,
+            "engines": self.engines,
+            "connections": sum(1 for c in self.connections if is_engine_alive(c)),
+            "in_use": self.in_use,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "remote": self.remote_stats
+        }
+
+
+class EngineWorkerPool:
+    """
+    Engines on remote worker daemons, with the EnginePool leasing interface.
+    """
+
+    def __init__(
+        self,
+        addresses: List[str],
+        connections_per_worker: Optional[int] = None,
+        health_interval: float = HEALTH_INTERVAL
+    ):
+        """
+        Initialize pool (connections are opened by start()).
+
+        Args:
+            addresses: Worker addresses ("host:port")
+            connections_per_worker: Connections (parallel searches) kept per
+                                    worker. None = one per engine it runs.
+            health_interval: Seconds between health checks
+        """
+        self.workers = [EngineWorker(address) for address in addresses if address.strip()]
+        self.connections_per_worker = connections_per_worker
+        self.health_interval = health_interval
+        self._idle: List[RemoteEngine] = []
+        # Waiting acquire() calls, served in arrival order
+        self._waiters: deque = deque()
+        self._health_task: Optional[asyncio.Task] = None
+        self._started = False
+        self.leases = 0
+        self.restarts = 0
+
+    @property
+    def size(self) -> int:
+        """Parallel searches currently available (connections to healthy workers)"""
+        return sum(
+            sum(1 for c in worker.connections if is_engine_alive(c))
+            for worker in self.workers if worker.healthy
+        )
+
+    def _target(self, worker: EngineWorker) -> int:
+        return self.connections_per_worker or max(1, worker.engines)
+
+    async def _check(self, worker: EngineWorker):
+        """Health check: reach the worker, then top its connections up"""
+        worker.connections = [c for c in worker.connections if is_engine_alive(c)]
+        try:
+            probe = await RemoteEngine.connect(worker)
+            probe.close()
+        except ConnectionError as e:
+            worker.mark_down(e)
+            for connection in worker.connections:
+                connection.close()
+            worker.connections = []
+            self._idle = [c for c in self._idle if c.worker is not worker]
+            return
+
+        if not worker.healthy:
+            print(f"[EngineWorkers] {worker.address} is up ({worker.engines} x {worker.name})")
+        worker.healthy = True
+        worker.last_error = None
+        while len(worker.connections) < self._target(worker):
+            try:
+                connection = await RemoteEngine.connect(worker)
+            except ConnectionError as e:
+                worker.mark_down(e)
+                return
+            worker.connections.append(connection)
+            self._put_idle(connection)
+
+    async def check_workers(self):
+        """Health-check every worker once"""
+        await asyncio.gather(*(self._check(worker) for worker in self.workers))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_workers()
+            except Exception as e:
+                print(f"[EngineWorkers] Health check failed: {e}")
+
+    async def start(self):
+        """Connect to the workers and start health checks"""
+        if self._started:
+            return
+        if not self.workers:
+            raise RuntimeError("No engine workers configured")
+
+        print(f"[EngineWorkers] Connecting to {', '.join(w.address for w in self.workers)}")
+        await self.check_workers()
+        if not any(worker.healthy for worker in self.workers):
+            raise RuntimeError(f"No engine worker reachable: {self.workers[0].last_error}")
+
+        self._health_task = asyncio.create_task(self._health_loop())
+        self._started = True
+
+    async def stop(self):
+        """Stop health checks and close all connections"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for worker in self.workers:
+            for connection in worker.connections:
+                connection.close()
+            worker.connections = []
+            worker.in_use = 0
+            worker.healthy = False
+        self._idle = []
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_exception(RuntimeError("Engine worker pool stopped"))
+        self._waiters.clear()
+        self._started = False
+        print("[EngineWorkers] Stopped")
+
+    def _take_idle(self) -> Optional[RemoteEngine]:
+        """Idle live connection on the least loaded healthy worker"""
+        self._idle = [c for c in self._idle if is_engine_alive(c) and c.worker.healthy]
+        if not self._idle:
+            return None
+        connection = min(self._idle, key=lambda c: c.worker.load)
+        self._idle.remove(connection)
+        connection.worker.in_use += 1
+        self.leases += 1
+        return connection
+
+    def _put_idle(self, connection: RemoteEngine):
+        """Hand a connection to the first waiter, or park it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                connection.worker.in_use += 1
+                self.leases += 1
+                waiter.set_result(connection)
+                return
+        self._idle.append(connection)
+
+    async def acquire(self) -> RemoteEngine:
+        """
+        Wait for an idle connection (FIFO), on the least loaded worker.
+
+        Raises:
+            RuntimeError: If the pool is not started or no worker is reachable
+        """
+        if not self._started:
+            raise RuntimeError("Engine worker pool is not started")
+        if not self._waiters:
+            connection = self._take_idle()
+            if connection is not None:
+                return connection
+        if self.size == 0:
+            await self.check_workers()
+            connection = self._take_idle()
+            if connection is not None:
+                return connection
+            raise RuntimeError("No engine worker reachable")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(waiter.result())
+            raise
+
+    def try_acquire(self) -> Optional[RemoteEngine]:
+        """
+        Lease an idle connection without waiting (None if nothing is idle or
+        other callers are already queued).
+        """
+        if not self._started or self._waiters:
+            return None
+        return self._take_idle()
+
+    def release(self, engine: Optional[RemoteEngine]):
+        """
+        Return a connection. Dropped ones are reopened by the health check;
+        extras opened by failover are closed once the worker has its share.
+        """
+        if engine is None:
+            return
+        worker = engine.worker
+        worker.in_use = max(0, worker.in_use - 1)
+        live = sum(1 for c in worker.connections if is_engine_alive(c))
+        if not is_engine_alive(engine) or not worker.healthy or live > self._target(worker):
+            engine.close()
+            if engine in worker.connections:
+                worker.connections.remove(engine)
+            return
+        self._put_idle(engine)
+
+    async def replace(self, engine: Optional[RemoteEngine]) -> RemoteEngine:
+        """
+        Swap a leased connection that dropped or hung for a new one, on the
+        least loaded healthy worker (failover). The caller keeps the lease
+        and releases the returned connection instead.
+
+        Raises:
+            RuntimeError: If no worker accepts a connection
+        """
+        options = dict(engine.config) if engine is not None else {}
+        failed = engine.worker if engine is not None else None
+        if engine is not None:
+            engine.close()
+            failed.in_use = max(0, failed.in_use - 1)
+            if engine in failed.connections:
+                failed.connections.remove(engine)
+
+        # Other healthy workers first, then the one that failed, then the rest
+        candidates = sorted(
+            self.workers,
+            key=lambda w: (not w.healthy, w is failed, w.load)
+        )
+        for worker in candidates:
+            try:
+                new = await RemoteEngine.connect(worker)
+            except ConnectionError as e:
+                worker.mark_down(e)
+                continue
+            worker.healthy = True
+            await new.configure({k: v for k, v in options.items() if k in new.options})
+            worker.connections.append(new)
+            worker.in_use += 1
+            self.restarts += 1
+            print(f"[EngineWorkers] Search moved to {worker.address} (restarts={self.restarts})")
+            return new
+        raise RuntimeError("Could not reach any engine worker")
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Lease a connection for the duration of a block.
+
+        Usage:
+            async with pool.lease() as engine:
+                info = await engine.analyse(board, limit)
+        """
+        engine = await self.acquire()
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters for health reporting"""
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "leases": self.leases,
+            "restarts": self.restarts,
+            "workers": [worker.stats() for worker in self.workers]
+        }
+
+
+# Global worker pool (created in the app lifespan when ENGINE_WORKERS is set)
+_engine_workers: Optional[EngineWorkerPool] = None
+
+
+async def start_engine_workers(addresses: Optional[List[str]] = None) -> Optional[EngineWorkerPool]:
+    """Create and start the global worker pool (None if no workers are configured)"""
+    global _engine_workers
+    if _engine_workers is not None:
+        return _engine_workers
+    if addresses is None:
+        addresses = [a for a in ENGINE_WORKERS.split(",") if a.strip()]
+    if not addresses:
+        return None
+
+    pool = EngineWorkerPool(addresses)
+    await pool.start()
+    _engine_workers = pool
+    return pool
+
+
+async def stop_engine_workers():
+    """Stop the global worker pool"""
+    global _engine_workers
+    if _engine_workers is not None:
+        await _engine_workers.stop()
+        _engine_workers = None
+
+
+def get_engine_workers() -> Optional[EngineWorkerPool]:
+    """Get the global worker pool (None if not started)"""
+    return _engine_workers
+
+
+def get_analysis_pool():
+    """
+    Pool for game and batch analysis: the remote workers while any is
+    reachable, otherwise the local EnginePool (None if neither is running)
+    """
+    workers = get_engine_workers()
+    if workers is not None and workers.size > 0:
+        return workers
+    return get_engine_pool()
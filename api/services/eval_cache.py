@@ -0,0 +1,242 @@
+"""
+Position Evaluation Cache
+Two-tier (in-process LRU + MongoDB) cache of engine evaluations keyed by position.
+
+Positions are keyed by their Polyglot Zobrist hash, so transpositions reached
+through different move orders (and by different users' games) share an entry.
+A cached entry satisfies any lookup whose requested depth is at or below the
+stored depth; deeper results replace shallower ones. Node-budget results
+(deterministic mode) are stored under their own key per budget and only
+returned for that exact budget. Entries record the engine (name and
+version) that searched them: a lookup for another engine is a miss, and
+that engine's result replaces the entry whatever its depth.
+
+The hash ignores move history, but the engine searches boards with their
+move stack: a repeated position, or one close to the 50-move rule, can
+score as a draw only because of how that game got there. Such positions
+are neither looked up nor stored.
+"""
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any
+
+import chess
+import chess.polyglot
+from pymongo.errors import DuplicateKeyError
+
+from api.database import get_eval_cache_collection
+
+
+# Max entries kept in the in-process tier
+DEFAULT_MAX_ENTRIES = int(os.getenv("EVAL_CACHE_SIZE", "100000"))
+
+# PV moves stored per entry
+MAX_PV_LENGTH = 10
+
+# Halfmove clock from which the 50-move rule may colour the score
+MAX_HALFMOVE_CLOCK = 40
+
+
+@dataclass
+class CachedEval:
+    """A cached evaluation (scores from White's perspective)"""
+    depth: int
+    cp: Optional[int]
+    mate: Optional[int]
+    pv: List[str] = field(default_factory=list)
+    engine: Optional[str] = None  # Engine name and version that searched it
+
+
+def position_key(board: chess.Board, budget: Optional[int] = None) -> str:
+    """
+    Zobrist hash of the position as a fixed-width hex string (Mongo-safe),
+    suffixed with the node budget for deterministic-mode entries
+    """
+    key = f"{chess.polyglot.zobrist_hash(board):016x}"
+    if budget:
+        key += f":n{budget}"
+    return key
+
+
+def history_dependent(board: chess.Board) -> bool:
+    """True if the board's move history can change its score (repetition or 50-move rule)"""
+    return board.halfmove_clock >= MAX_HALFMOVE_CLOCK or board.is_repetition(2)
+
+
+class EvalCache:
+    """
+    Evaluation cache: LRU in memory, MongoDB `eval_cache` collection behind it.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Initialize cache.
+
+        Args:
+            max_entries: Max positions held in the in-process LRU
+        """
+        self.max_entries = max(1, max_entries)
+        self._lru: "OrderedDict[str, CachedEval]" = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+
+    def _remember(self, key: str, entry: CachedEval):
+        """Insert/refresh an entry in the LRU, evicting the oldest if full"""
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def get(
+        self,
+        board: chess.Board,
+        depth: int,
+        budget: Optional[int] = None,
+        engine: Optional[str] = None
+    ) -> Optional[CachedEval]:
+        """
+        Look up a position.
+
+        Args:
+            board: Position to look up
+            depth: Minimum depth the cached result must have
+            budget: Node budget of a deterministic-mode lookup (depth is then ignored)
+            engine: Engine name and version the result must come from (None = any)
+
+        Returns:
+            CachedEval if an entry at least `depth` deep exists, else None
+            (always None for history-dependent positions)
+        """
+        if history_dependent(board):
+            self.skipped += 1
+            return None
+
+        key = position_key(board, budget)
+        if budget:
+            depth = 0
+
+        entry = self._lru.get(key)
+        if entry is not None and entry.depth >= depth and engine in (None, entry.engine):
+            self._lru.move_to_end(key)
+            self.memory_hits += 1
+            return entry
+
+        collection = get_eval_cache_collection()
+        if collection is not None:
+            try:
+                query = {"_id": key, "depth": {"$gte": depth}}
+                if engine is not None:
+                    query["engine"] = engine
+                doc = await collection.find_one(query)
+            except Exception as e:
+                print(f"[EvalCache] Lookup error: {e}")
+                doc = None
+
+            if doc:
+                entry = CachedEval(
+                    depth=doc["depth"],
+                    cp=doc.get("cp"),
+                    mate=doc.get("mate"),
+                    pv=doc.get("pv", []),
+                    engine=doc.get("engine")
+                )
+                self._remember(key, entry)
+                self.db_hits += 1
+                return entry
+
+        self.misses += 1
+        return None
+
+    async def put(
+        self,
+        board: chess.Board,
+        depth: int,
+        cp: Optional[int],
+        mate: Optional[int],
+        pv: List[str],
+        budget: Optional[int] = None,
+        engine: Optional[str] = None
+    ):
+        """
+        Store an evaluation. Existing entries are only replaced by deeper
+        ones, or by any result of a different engine.
+
+        Args:
+            board: Evaluated position
+            depth: Depth the search actually reached
+            cp: Centipawn score (White's perspective)
+            mate: Mate in X (White's perspective)
+            pv: Principal variation in UCI
+            budget: Node budget the result was searched with (deterministic mode)
+            engine: Engine name and version that searched it
+        """
+        if depth is None or (cp is None and mate is None):
+            return
+        if history_dependent(board):
+            return
+
+        key = position_key(board, budget)
+        entry = CachedEval(depth=depth, cp=cp, mate=mate, pv=list(pv[:MAX_PV_LENGTH]), engine=engine)
+
+        existing = self._lru.get(key)
+        if existing is None or existing.depth < depth or existing.engine != engine:
+            self._remember(key, entry)
+
+        collection = get_eval_cache_collection()
+        if collection is None:
+            return
+
+        try:
+            # Upsert only when no entry of equal or greater depth from this
+            # engine exists; such an entry makes the insert collide on _id.
+            await collection.update_one(
+                {"_id": key, "$or": [{"depth": {"$lt": depth}}, {"engine": {"$ne": engine}}]},
+                {"$set": {
+                    "depth": entry.depth,
+                    "cp": entry.cp,
+                    "mate": entry.mate,
+                    "pv": entry.pv,
+                    "engine": entry.engine,
+                    "epd": board.epd()
+                }},
+                upsert=True
+            )
+            self.stores += 1
+        except DuplicateKeyError:
+            pass
+        except Exception as e:
+            print(f"[EvalCache] Store error: {e}")
+
+    def clear_memory(self):
+        """Drop the in-process tier"""
+        self._lru.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters"""
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "skipped": self.skipped,
+            "hit_rate": round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else 0.0
+        }
+
+
+# Singleton instance
+_eval_cache: Optional[EvalCache] = None
+
+
+def get_eval_cache() -> EvalCache:
+    """Get or create the evaluation cache singleton"""
+    global _eval_cache
+    if _eval_cache is None:
+        _eval_cache = EvalCache()
+    return _eval_cache
@@ -0,0 +1,228 @@
+"""
+Shared Game Analyses
+Engine analysis stored once per distinct game, shared by every copy of it.
+
+The same game is imported once per player (and possibly from both Lichess
+and Chess.com). Each copy gets a content hash at ingest: a SHA-256 of the
+starting position and the mainline moves in UCI, so headers, clocks and
+comments don't matter. Completed analyses live in the `game_analyses`
+collection under that hash and game documents reference them through
+`analysis_ref`; a copy whose twin was already analysed (at least as deep)
+completes without an engine search.
+"""
+
+import hashlib
+import io
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+import chess
+import chess.pgn
+from pymongo.errors import DuplicateKeyError
+
+from api.database import get_game_analyses_collection, get_games_collection
+
+
+# Game fields filled in from the shared analysis when a game is read
+SHARED_FIELDS = ("analysis_results", "coach_messages", "ai_insights")
+
+
+def game_content_hash(pgn: str) -> Optional[str]:
+    """
+    Canonical hash of a game's moves.
+
+    Returns:
+        Hex digest, or None if the PGN has no moves or does not parse cleanly
+    """
+    try:
+        game = chess.pgn.read_game(io.StringIO(pgn or ""))
+    except Exception:
+        return None
+    if game is None or game.errors:
+        return None
+
+    board = game.board()
+    start = board.fen() if board.fen() != chess.STARTING_FEN else "startpos"
+    moves = [move.uci() for move in game.mainline_moves()]
+    if not moves:
+        return None
+    return hashlib.sha256(f"{start} {' '.join(moves)}".encode()).hexdigest()
+
+
+async def ensure_content_hash(game: Dict[str, Any]) -> Optional[str]:
+    """Content hash of a game document, computed and saved if it predates hashing"""
+    content_hash = game.get("content_hash")
+    if content_hash:
+        return content_hash
+
+    content_hash = game_content_hash(game.get("pgn", ""))
+    collection = get_games_collection()
+    if content_hash and collection is not None:
+        await collection.update_one({"_id": game["_id"]}, {"$set": {"content_hash": content_hash}})
+        game["content_hash"] = content_hash
+    return content_hash
+
+
+def satisfies(
+    analysis: Dict[str, Any],
+    depth: int,
+    nodes: Optional[int] = None,
+    adaptive: bool = False,
+    refine_plies: int = 0
+) -> bool:
+    """
+    True if a stored analysis is at least as good as the one requested:
+    the same node budget in deterministic mode, otherwise a full-depth
+    (non-adaptive unless adaptive was asked for) analysis at least `depth`
+    deep, and a MultiPV pass on at least `refine_plies` plies.
+    """
+    if (analysis.get("refine_plies") or 0) < refine_plies:
+        return False
+    if nodes:
+        return analysis.get("nodes") == nodes
+    if analysis.get("nodes"):
+        return False
+    if analysis.get("adaptive") and not adaptive:
+        return False
+    return (analysis.get("depth") or 0) >= depth
+
+
+def replaceable_by(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Query matching stored analyses that `analysis` satisfies (satisfies()
+    with the stored configuration as the request), i.e. that it may replace
+    """
+    conditions = [{"$or": [{"refine_plies": {"$lte": analysis.get("refine_plies") or 0}}, {"refine_plies": None}]}]
+    if analysis.get("nodes"):
+        conditions.append({"nodes": analysis["nodes"]})
+    else:
+        conditions.append({"nodes": {"$in": [None, 0]}})
+        conditions.append({"$or": [{"depth": {"$lte": analysis.get("depth") or 0}}, {"depth": None}]})
+        if analysis.get("adaptive"):
+            conditions.append({"adaptive": True})
+    return {"$and": conditions}
+
+
+async def get_shared_analysis(content_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The stored analysis for a content hash, if any"""
+    collection = get_game_analyses_collection()
+    if not content_hash or collection is None:
+        return None
+    return await collection.find_one({"_id": content_hash})
+
+
+async def store_shared_analysis(
+    content_hash: str,
+    results: list,
+    statistics: Dict[str, Any],
+    coach_messages: list,
+    ai_insights: Dict[str, Any],
+    depth: int,
+    nodes: Optional[int] = None,
+    adaptive: bool = False,
+    refine_plies: int = 0
+) -> Optional[Dict[str, Any]]:
+    """
+    Store (or replace) the analysis shared by every copy of a game.
+    A stored analysis is only replaced by one that satisfies its
+    configuration (as deep, same node budget, as refined), so a lesser
+    rerun never downgrades it for the other copies; games already
+    referencing it then get the new summary fields.
+
+    Returns:
+        The stored analysis document, or None if a better one is kept (the
+        caller stores its results on the requesting game only)
+    """
+    analysis = {
+        "_id": content_hash,
+        "analysis_results": results,
+        "statistics": statistics,
+        "coach_messages": coach_messages,
+        "ai_insights": ai_insights,
+        "depth": depth,
+        "nodes": nodes,
+        "adaptive": adaptive,
+        "refine_plies": refine_plies,
+        "analyzed_at": datetime.utcnow()
+    }
+    collection = get_game_analyses_collection()
+    if collection is None:
+        return analysis
+
+    try:
+        # Replace only an analysis this one satisfies, in the write itself so
+        # concurrent runs can't let the lesser one win; a better stored
+        # analysis makes the upsert collide on _id
+        await collection.replace_one({"_id": content_hash, **replaceable_by(analysis)}, analysis, upsert=True)
+    except DuplicateKeyError:
+        return None
+    games = get_games_collection()
+    if games is not None:
+        await games.update_many(
+            {"analysis_ref": content_hash, "analysis_status": "complete"},
+            {"$set": link_fields(analysis)}
+        )
+    return analysis
+
+
+def link_fields(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fields set on a game document that references a shared analysis
+    (the per-move results themselves stay in game_analyses)
+    """
+    return {
+        "analysis_status": "complete",
+        "analysis_ref": analysis["_id"],
+        "analysis_depth": analysis.get("depth"),
+        "analysis_nodes": analysis.get("nodes"),
+        "statistics": analysis.get("statistics", {}),
+        "analyzed_at": analysis.get("analyzed_at")
+    }
+
+
+async def link_shared_analysis(game_id, analysis: Dict[str, Any]):
+    """Point a game at a shared analysis, dropping any inline copy of the results"""
+    collection = get_games_collection()
+    if collection is None:
+        return
+    await collection.update_one(
+        {"_id": game_id},
+        {
+            "$set": link_fields(analysis),
+            "$unset": {key: "" for key in SHARED_FIELDS + ("moves", "analysis_error")}
+        }
+    )
+
+
+async def find_reusable_analysis(
+    game: Dict[str, Any],
+    depth: int,
+    nodes: Optional[int] = None,
+    adaptive: bool = False,
+    refine_plies: int = 0
+) -> Optional[Dict[str, Any]]:
+    """The shared analysis of this game's content if it satisfies the request"""
+    analysis = await get_shared_analysis(await ensure_content_hash(game))
+    if analysis is not None and satisfies(analysis, depth, nodes, adaptive, refine_plies):
+        return analysis
+    return None
+
+
+async def resolve_analysis(game: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill a game document's analysis fields (results, coach messages,
+    insights) from the shared analysis it references, whatever its status:
+    a linked game being re-analysed (or whose rerun failed) keeps showing
+    the last completed analysis. Fields the game holds inline (provisional
+    results of a rerun, analyses from before sharing) are kept.
+    """
+    if not game.get("analysis_ref"):
+        return game
+    analysis = await get_shared_analysis(game["analysis_ref"])
+    if analysis is None:
+        return game
+    for key in SHARED_FIELDS:
+        if game.get(key) is None:
+            game[key] = analysis.get(key)
+    game["moves"] = game.get("analysis_results") or []  # For backward compatibility
+    return game
@@ -6,12 +6,17 @@ Fetches games using NDJSON streaming
 import httpx
 import asyncio
 from datetime import datetime, timedelta
-from typing import AsyncIterator, Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional
 import json
 import os
 
+import chess
+import chess.engine
+
 from api.models.game import Platform, TimeClass, FetchGamesResponse
 from api.database import get_games_collection
+from api.services.analysis_queue import enqueue_analysis, PRIORITY_BULK
+from api.services.game_analyses import game_content_hash, find_reusable_analysis, link_shared_analysis
 
 # API configuration
 BASE_URL = "https://lichess.org/api"
@@ -102,9 +107,24 @@ async def fetch_lichess_games(
                         # Parse and store
                         parsed_game = _parse_lichess_game(game_data)
                         parsed_game["platform_id"] = platform_id
+                        parsed_game["content_hash"] = game_content_hash(parsed_game["pgn"])
                         
                         if collection is not None:
-                            await collection.insert_one(parsed_game)
+                            result = await collection.insert_one(parsed_game)
+                            
+                            # Fully server-analysed: reuse the analysis of an identical
+                            # game if there is one, else classify from the Lichess evals
+                            # (no engine search needed), in the background
+                            if _evals_complete(parsed_game.get("lichess_evals")):
+                                shared = await find_reusable_analysis(parsed_game, 16)
+                                if shared is not None:
+                                    await link_shared_analysis(result.inserted_id, shared)
+                                else:
+                                    await enqueue_analysis(str(result.inserted_id), priority=PRIORITY_BULK)
+                                    await collection.update_one(
+                                        {"_id": result.inserted_id},
+                                        {"$set": {"analysis_status": "queued"}}
+                                    )
                         games_new += 1
                         
                     except json.JSONDecodeError:
@@ -185,5 +205,69 @@ def _parse_lichess_game(game_data: Dict[str, Any]) -> Dict[str, Any]:
         "url": f"https://lichess.org/{game_data.get('id')}",
         "analysis_status": "pending",
         "moves": [],
+        "lichess_evals": _parse_lichess_evals(game_data),
         "created_at": datetime.utcnow()
     }
+
+
+def _parse_lichess_evals(game_data: Dict[str, Any]) -> Optional[List[Optional[Dict[str, Any]]]]:
+    """
+    Extract Lichess server analysis as per-position evals.
+    
+    Returns:
+        List aligned with the game's positions (index 0 = starting position,
+        index N = after ply N) of {"cp", "mate"} from White's perspective,
+        in the same units as StockfishAnalyzer (mates as +/-(10000 - N) cp).
+        Entries are None where Lichess has no eval. None if the game was
+        not analysed.
+    """
+    analysis = game_data.get("analysis")
+    moves = game_data.get("moves", "").split()
+    if not analysis or not moves:
+        return None
+    
+    board = _initial_board(game_data)
+    if board is None:
+        return None
+    evals: List[Optional[Dict[str, Any]]] = [None]  # Lichess does not evaluate the start
+    for ply, san in enumerate(moves, start=1):
+        try:
+            board.push_san(san)
+        except ValueError:
+            return None
+        
+        entry = analysis[ply - 1] if ply - 1 < len(analysis) else {}
+        if "mate" in entry:
+            mate = entry["mate"]
+            evals.append({"cp": chess.engine.Mate(mate).score(mate_score=10000), "mate": mate})
+        elif "eval" in entry:
+            evals.append({"cp": entry["eval"], "mate": None})
+        elif board.is_checkmate():
+            # Final position is not evaluated; score it the way the engine would
+            score = chess.engine.PovScore(chess.engine.Mate(-0), board.turn).white()
+            evals.append({"cp": score.score(mate_score=10000), "mate": 0})
+        elif board.is_game_over(claim_draw=True):
+            evals.append({"cp": 0, "mate": None})
+        else:
+            evals.append(None)
+    
+    return evals
+
+
+def _initial_board(game_data: Dict[str, Any]) -> Optional[chess.Board]:
+    """
+    The game's starting position (initialFen for fromPosition and Chess960
+    games), or None for variants with other rules
+    """
+    variant = game_data.get("variant", "standard")
+    if variant not in ("standard", "fromPosition", "chess960"):
+        return None
+    try:
+        return chess.Board(game_data.get("initialFen", chess.STARTING_FEN), chess960=variant == "chess960")
+    except ValueError:
+        return None
+
+
+def _evals_complete(evals: Optional[List[Optional[Dict[str, Any]]]]) -> bool:
+    """True if every move of the game has a Lichess eval"""
+    return bool(evals) and len(evals) > 1 and all(e is not None for e in evals[1:])
@@ -0,0 +1,295 @@
+"""
+Live Analysis Sessions
+Server-side infinite analysis for the analysis board (WebSocket sessions).
+
+Each session holds one engine leased from the EnginePool for its lifetime
+and streams the engine's `info` updates (depth, MultiPV lines, nps) while
+it searches. A new position stops the search in flight before the next one
+starts, so stale lines are never sent. Sessions are capped per user and,
+all together, to LIVE_POOL_SHARE of the pool, and closed after an idle
+timeout or MAX_LIFETIME (which pings don't extend) so leases go back to
+the pool promptly.
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+import chess
+import chess.engine
+
+from api.services.engine_pool import EnginePool, is_engine_alive
+from api.services.engine_watchdog import kill_engine
+
+
+# Session limits (overridable via environment)
+IDLE_TIMEOUT = float(os.getenv("LIVE_ANALYSIS_IDLE_TIMEOUT", "60"))  # seconds without a client message
+MAX_SESSIONS_PER_USER = int(os.getenv("LIVE_ANALYSIS_MAX_SESSIONS", "2"))
+MAX_LIFETIME = float(os.getenv("LIVE_ANALYSIS_MAX_LIFETIME", "900"))  # seconds, however active
+# Share of the engine pool all live sessions together may lease (at least one engine)
+LIVE_POOL_SHARE = float(os.getenv("LIVE_ANALYSIS_POOL_SHARE", "0.5"))
+LEASE_TIMEOUT = float(os.getenv("LIVE_ANALYSIS_LEASE_TIMEOUT", "10"))  # seconds to wait for a free engine
+MAX_MULTIPV = 5
+# Min seconds between info messages (the engine reports far more often)
+UPDATE_INTERVAL = 0.1
+# Seconds a stopped search may take to return its bestmove before the engine is replaced
+STOP_TIMEOUT = 2.0
+
+
+class LiveSession:
+    """
+    One analysis-board session on a leased engine.
+    """
+
+    def __init__(
+        self,
+        engine: chess.engine.UciProtocol,
+        pool: EnginePool,
+        send: Callable[[Dict[str, Any]], Awaitable[None]]
+    ):
+        """
+        Initialize session.
+
+        Args:
+            engine: Engine leased from `pool` (returned by close())
+            pool: Pool the engine belongs to
+            send: Async callback delivering a JSON message to the client
+        """
+        self.engine = engine
+        self.pool = pool
+        self._send = send
+        self._analysis: Optional[chess.engine.AnalysisResult] = None
+        self._pump: Optional[asyncio.Task] = None
+        self.search_id = 0
+
+    @property
+    def engine_name(self) -> Optional[str]:
+        return self.engine.id.get("name")
+
+    async def send(self, message: Dict[str, Any]) -> bool:
+        """Send to the client, False if it has gone away"""
+        try:
+            await self._send(message)
+            return True
+        except Exception:
+            return False
+
+    async def handle(self, message: Dict[str, Any]):
+        """
+        Handle a client message:
+        - {"type": "position", "fen": ..., "moves": [uci...], "multipv": 1-5, "depth": optional}
+          (no fen = starting position; no depth = infinite)
+        - {"type": "stop"}
+        - {"type": "ping"} (keeps the session from idling out)
+        """
+        if not isinstance(message, dict):
+            await self.send({"type": "error", "message": "Messages must be JSON objects"})
+            return
+        kind = message.get("type")
+        if kind == "position":
+            fen = message.get("fen") or chess.STARTING_FEN
+            moves = message.get("moves") or []
+            if not isinstance(fen, str) or not isinstance(moves, list) or \
+                    not all(isinstance(uci, str) for uci in moves):
+                await self.send({"type": "error", "message": "Invalid position: expected a FEN string and a list of UCI moves"})
+                return
+            try:
+                board = chess.Board(fen)
+                for uci in moves:
+                    board.push_uci(uci)
+            except ValueError as e:
+                await self.send({"type": "error", "message": f"Invalid position: {e}"})
+                return
+            if not board.is_valid():
+                # Illegal positions (e.g. no king) can crash the engine
+                await self.send({"type": "error", "message": f"Illegal position: {board.fen()}"})
+                return
+            try:
+                multipv = max(1, min(MAX_MULTIPV, int(message.get("multipv") or 1)))
+                depth = int(message.get("depth") or 0) or None
+            except (ValueError, TypeError):
+                await self.send({"type": "error", "message": "multipv and depth must be integers"})
+                return
+            if depth is not None and depth < 0:
+                await self.send({"type": "error", "message": "depth must be positive"})
+                return
+            await self.analyse(board, multipv, depth)
+        elif kind == "stop":
+            await self.stop()
+        elif kind == "ping":
+            await self.send({"type": "pong"})
+        else:
+            await self.send({"type": "error", "message": f"Unknown message type: {kind}"})
+
+    async def analyse(self, board: chess.Board, multipv: int = 1, depth: Optional[int] = None):
+        """Stop the current search and start analysing `board`"""
+        await self.stop()
+        self.search_id += 1
+
+        if board.is_game_over():
+            await self.send({
+                "type": "bestmove", "id": self.search_id, "best_move": None,
+                "result": board.result(claim_draw=True)
+            })
+            return
+
+        limit = chess.engine.Limit(depth=depth) if depth else None
+        if not is_engine_alive(self.engine):
+            print("[LiveAnalysis] Engine died, replacing it")
+            self.engine = await self.pool.replace(self.engine)
+        try:
+            self._analysis = await self.engine.analysis(board, limit, multipv=multipv)
+        except chess.engine.EngineError as e:
+            await self.send({"type": "error", "id": self.search_id, "message": f"Engine error: {e}"})
+            return
+        self._pump = asyncio.create_task(self._stream(self._analysis, board, self.search_id))
+
+    async def stop(self):
+        """Stop the search in flight (if any) without sending its remaining output"""
+        analysis, pump = self._analysis, self._pump
+        self._analysis, self._pump = None, None
+        if pump is not None:
+            pump.cancel()
+        if analysis is None:
+            return
+
+        analysis.stop()
+        try:
+            await asyncio.wait_for(analysis.wait(), timeout=STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Engine ignored stop: swap it for a fresh one
+            print("[LiveAnalysis] Engine did not stop, replacing it")
+            kill_engine(self.engine)
+            self.engine = await self.pool.replace(self.engine)
+        except chess.engine.EngineError:
+            pass
+
+    async def _stream(self, analysis: chess.engine.AnalysisResult, board: chess.Board, search_id: int):
+        """Forward info updates (throttled) and the final bestmove of one search"""
+        lines: Dict[int, chess.engine.InfoDict] = {}
+        last = None
+        sent_at = 0.0
+        try:
+            async for info in analysis:
+                if "score" not in info or "pv" not in info:
+                    continue
+                lines[info.get("multipv", 1)] = info
+                last = info
+                if time.monotonic() - sent_at >= UPDATE_INTERVAL:
+                    sent_at = time.monotonic()
+                    if not await self.send(self._info_message(search_id, last, lines, board)):
+                        return
+        except chess.engine.EngineError as e:
+            await self.send({"type": "error", "id": search_id, "message": f"Engine error: {e}"})
+            return
+
+        # Search ended on its own (depth limit): final lines and best move
+        if last is not None:
+            await self.send(self._info_message(search_id, last, lines, board))
+        pv = analysis.info.get("pv")
+        await self.send({"type": "bestmove", "id": search_id, "best_move": pv[0].uci() if pv else None})
+
+    def _info_message(
+        self,
+        search_id: int,
+        info: chess.engine.InfoDict,
+        lines: Dict[int, chess.engine.InfoDict],
+        board: chess.Board
+    ) -> Dict[str, Any]:
+        """Info message with every MultiPV line (scores from White's perspective)"""
+        return {
+            "type": "info",
+            "id": search_id,
+            "fen": board.fen(),
+            "depth": info.get("depth"),
+            "seldepth": info.get("seldepth"),
+            "nodes": info.get("nodes"),
+            "nps": info.get("nps"),
+            "time": info.get("time"),
+            "lines": [_line(number, lines[number]) for number in sorted(lines)]
+        }
+
+    async def close(self):
+        """Stop searching and give the engine back to the pool"""
+        try:
+            await self.stop()
+        finally:
+            self.pool.release(self.engine)
+
+
+def _line(number: int, info: chess.engine.InfoDict) -> Dict[str, Any]:
+    score = info["score"].white()
+    return {
+        "multipv": number,
+        "depth": info.get("depth"),
+        "cp": score.score(mate_score=10000),
+        "mate": score.mate(),
+        "pv": [move.uci() for move in info.get("pv", [])]
+    }
+
+
+def live_session_cap(pool: EnginePool) -> int:
+    """Live sessions all users together may hold on `pool`"""
+    return max(1, int(pool.size * LIVE_POOL_SHARE))
+
+
+class LiveSessionRegistry:
+    """
+    Per-user session counts and session metrics.
+    """
+
+    def __init__(self, max_per_user: int = MAX_SESSIONS_PER_USER):
+        self.max_per_user = max(1, max_per_user)
+        self._sessions: Dict[str, int] = {}
+        self.opened = 0
+        self.rejected = 0
+        self.idle_timeouts = 0
+        self.expired = 0
+
+    @property
+    def active(self) -> int:
+        return sum(self._sessions.values())
+
+    def open(self, user: str, max_active: Optional[int] = None) -> bool:
+        """
+        Reserve a session slot for `user` (False if the user is at the cap,
+        or all live sessions together are at `max_active`)
+        """
+        if self._sessions.get(user, 0) >= self.max_per_user or \
+                (max_active is not None and self.active >= max_active):
+            self.rejected += 1
+            return False
+        self._sessions[user] = self._sessions.get(user, 0) + 1
+        self.opened += 1
+        return True
+
+    def close(self, user: str):
+        count = self._sessions.get(user, 0) - 1
+        if count > 0:
+            self._sessions[user] = count
+        else:
+            self._sessions.pop(user, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Session counters for health reporting"""
+        return {
+            "active": self.active,
+            "users": len(self._sessions),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "idle_timeouts": self.idle_timeouts,
+            "expired": self.expired
+        }
+
+
+# Singleton instance
+_live_sessions: Optional[LiveSessionRegistry] = None
+
+
+def get_live_sessions() -> LiveSessionRegistry:
+    """Get or create the live session registry singleton"""
+    global _live_sessions
+    if _live_sessions is None:
+        _live_sessions = LiveSessionRegistry()
+    return _live_sessions
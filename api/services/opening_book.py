@@ -0,0 +1,94 @@
+"""
+Opening Book
+In-memory set of theory positions built from the seeded `openings` collection.
+
+Every position along every opening's main line is stored by Zobrist hash,
+so a move counts as book when the position it reaches is known theory,
+however it was reached (transpositions included), rather than by move number.
+"""
+
+from typing import Optional, Set, List, Dict, Any
+
+import chess
+import chess.polyglot
+
+from api.database import get_openings_collection
+
+
+class OpeningBook:
+    """
+    Set of theory positions (Polyglot Zobrist hashes).
+    """
+
+    def __init__(self):
+        self._positions: Set[int] = set()
+        self.lines = 0
+        self.loaded = False
+
+    def add_line(self, moves: List[str]) -> bool:
+        """
+        Add every position of a line given in SAN from the starting position.
+
+        Returns:
+            False if a move could not be played (the line is kept up to it)
+        """
+        board = chess.Board()
+        for san in moves:
+            try:
+                board.push_san(san)
+            except ValueError:
+                return False
+            self._positions.add(chess.polyglot.zobrist_hash(board))
+        return True
+
+    async def load(self):
+        """(Re)build the book from the openings collection"""
+        collection = get_openings_collection()
+        if collection is None:
+            return
+
+        self._positions = set()
+        self.lines = 0
+        skipped = 0
+        async for doc in collection.find({}, {"moves": 1}):
+            moves = doc.get("moves") or []
+            if isinstance(moves, str):
+                moves = moves.split()
+            if self.add_line(moves):
+                self.lines += 1
+            else:
+                skipped += 1
+
+        self.loaded = bool(self._positions)
+        print(f"[OpeningBook] Loaded {len(self._positions)} positions from {self.lines} lines"
+              + (f" ({skipped} lines with illegal moves truncated)" if skipped else ""))
+
+    def contains(self, board: chess.Board) -> bool:
+        """True if the position is known theory"""
+        return chess.polyglot.zobrist_hash(board) in self._positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def stats(self) -> Dict[str, Any]:
+        """Book size for health reporting"""
+        return {"loaded": self.loaded, "lines": self.lines, "positions": len(self._positions)}
+
+
+# Singleton instance
+_opening_book: Optional[OpeningBook] = None
+
+
+def get_opening_book() -> OpeningBook:
+    """Get or create the opening book singleton (empty until load_opening_book)"""
+    global _opening_book
+    if _opening_book is None:
+        _opening_book = OpeningBook()
+    return _opening_book
+
+
+async def load_opening_book() -> OpeningBook:
+    """Load the opening book singleton from MongoDB"""
+    book = get_opening_book()
+    await book.load()
+    return book
@@ -137,6 +137,8 @@ class Puzzle(BaseModel):
     rating: int
     themes: List[str]
     phase: str
+    motifs: List[str] = []  # Computed by api/scripts/tag_puzzles.py
+    piece_count: Optional[int] = None
 
 
 class PuzzleService:
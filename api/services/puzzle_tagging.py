@@ -0,0 +1,97 @@
+"""
+Puzzle Tagging Service
+Computes a puzzle's phase, motifs and piece counts from its position and solution
+
+Lichess puzzles start one move early: `moves[0]` is the opponent's move
+that sets the puzzle up and the solver plays moves[1], moves[3]... The
+solution line is replayed once and tagged with the same MotifTagger the
+game analysis uses; every solver move counts as best, and one leaving
+material en prise by SEE (BRILLIANT_MIN_SACRIFICE) as a sacrifice.
+hanging_piece means what Lichess's hangingPiece does: the setup move left
+a piece hanging (not pieces the solution goes on to win after a fork or
+pin). The phase comes from the material on the board when the solver is
+to move, not from the theme strings.
+
+Everything here is a plain function over plain dicts so batches can be
+sent to worker processes.
+"""
+
+import chess
+from typing import Dict, List, Optional
+
+from api.services.classification import BRILLIANT_MIN_SACRIFICE
+from api.services.tactics import MotifTagger
+
+# Bump when tagging changes, so the CLI can find puzzles tagged by an older version
+TAGGER_VERSION = 2
+
+# Knights, bishops, rooks and queens left (both sides) at or below which it's an endgame
+ENDGAME_MAX_PIECES = 6
+# Openings: by this move number, with at most two pieces traded off
+OPENING_MAX_MOVE = 12
+OPENING_MIN_PIECES = 12
+
+
+def material_phase(board: chess.Board) -> str:
+    """Game phase from the pieces left and the move number"""
+    pieces = chess.popcount(board.occupied & ~board.pawns & ~board.kings)
+    if pieces <= ENDGAME_MAX_PIECES:
+        return "endgame"
+    if board.fullmove_number <= OPENING_MAX_MOVE and pieces >= OPENING_MIN_PIECES:
+        return "opening"
+    return "middlegame"
+
+
+def piece_counts(board: chess.Board) -> Dict[str, int]:
+    """Piece-count fields of a puzzle position"""
+    return {
+        "piece_count": chess.popcount(board.occupied),
+        "pawn_count": chess.popcount(board.pawns),
+        "minor_major_count": chess.popcount(board.occupied & ~board.pawns & ~board.kings)
+    }
+
+
+def tag_puzzle(puzzle: Dict) -> Optional[Dict]:
+    """
+    Computed fields of one puzzle ({"id", "fen", "moves"}, moves in UCI):
+    phase, motifs of the solution, piece counts and TAGGER_VERSION.
+    None if the FEN or the solution doesn't replay.
+    """
+    try:
+        board = chess.Board(puzzle["fen"])
+        moves = [chess.Move.from_uci(uci) for uci in puzzle["moves"]]
+    except (KeyError, ValueError):
+        return None
+    if len(moves) < 2:
+        return None
+
+    positions = [board.copy()]
+    for move in moves:
+        if not board.is_legal(move):
+            return None
+        board.push(move)
+        positions.append(board.copy())
+
+    tagger = MotifTagger(positions)
+    # Ply 1 sets the puzzle up: did it leave one of the opponent's pieces hanging?
+    motifs: List[str] = ["hanging_piece"] if tagger.newly_hanging(1, positions[0].turn) else []
+    # Solver moves are plies 2, 4...
+    for ply in range(2, len(positions), 2):
+        sacrifice = tagger.material_offered(ply) >= BRILLIANT_MIN_SACRIFICE
+        for motif in tagger.tag(ply, "best", sacrifice=sacrifice):
+            if motif not in motifs and motif != "hanging_piece":
+                motifs.append(motif)
+
+    start = positions[1]
+    return {
+        "id": puzzle.get("id"),
+        "phase": material_phase(start),
+        "motifs": motifs,
+        **piece_counts(start),
+        "tagger_version": TAGGER_VERSION
+    }
+
+
+def tag_puzzles(puzzles: List[Dict]) -> List[Optional[Dict]]:
+    """tag_puzzle over a batch, in order (the unit of work sent to a worker process)"""
+    return [tag_puzzle(puzzle) for puzzle in puzzles]
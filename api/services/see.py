@@ -0,0 +1,238 @@
+"""
+Static Exchange Evaluation
+Material won or lost by the capture sequence on one square, on python-chess bitboards
+
+The classic swap algorithm: both sides keep recapturing on the square with
+their least valuable attacker, and either side may stop when continuing
+would lose more. After each capture the capturer leaves the occupancy, so
+sliders lined up behind it (x-rays: a rook behind a rook, a queen behind
+a bishop...) join the exchange. Pins are ignored, as usual for SEE.
+
+ExchangeEvaluator memoises one position's attacker sets and results, so the
+analysis keeps one per replayed position and every heuristic asking about
+the same position within a game shares them.
+"""
+
+import chess
+from typing import Dict, List, Optional, Tuple
+
+# Values in centipawns (the king's only matters as a piece that can't be recaptured)
+SEE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 300,
+    chess.BISHOP: 300,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 10000
+}
+
+
+
+def attackers_to(board: chess.Board, square: chess.Square, occupied: int) -> int:
+    """Pieces of both colours attacking `square` given `occupied` (the board's pieces otherwise)"""
+    rank_file = (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+                 | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    diagonal = chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    return (
+        chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE]
+        | chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK]
+        | chess.BB_KNIGHT_ATTACKS[square] & board.knights
+        | chess.BB_KING_ATTACKS[square] & board.kings
+        | rank_file & (board.rooks | board.queens)
+        | diagonal & (board.bishops | board.queens)
+    ) & occupied
+
+
+def _sliders_to(board: chess.Board, square: chess.Square, occupied: int) -> int:
+    """Sliders of both colours attacking `square` given `occupied`"""
+    rank_file = (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+                 | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    diagonal = chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    return (rank_file & (board.rooks | board.queens) | diagonal & (board.bishops | board.queens)) & occupied
+
+
+def _piece_sets(board: chess.Board) -> List[Tuple[int, int]]:
+    """(piece type, bitboard) pairs, least valuable first"""
+    return [
+        (chess.PAWN, board.pawns), (chess.KNIGHT, board.knights), (chess.BISHOP, board.bishops),
+        (chess.ROOK, board.rooks), (chess.QUEEN, board.queens), (chess.KING, board.kings)
+    ]
+
+
+def _least_valuable(piece_sets: List[Tuple[int, int]], own: int) -> Tuple[int, int]:
+    """(bitboard, piece type) of the least valuable piece in `own` ((0, 0) if none)"""
+    if own:
+        for piece_type, pieces in piece_sets:
+            if own & pieces:
+                return (own & pieces) & -(own & pieces), piece_type
+    return 0, 0
+
+
+def swap(
+    board: chess.Board,
+    square: chess.Square,
+    side: chess.Color,
+    gain: int,
+    on_square: int,
+    occupied: int,
+    attackers: int,
+    piece_sets: Optional[List[Tuple[int, int]]] = None
+) -> int:
+    """
+    Result (cp, for the side that made the first capture) of the exchange
+    on `square` after that capture: it gained `gain`, its piece worth
+    `on_square` now stands there and `side` is to recapture. `occupied`
+    and `attackers` exclude the first capturer.
+    """
+    piece_sets = piece_sets or _piece_sets(board)
+    colors = board.occupied_co
+    gains: List[int] = [gain]
+    while True:
+        attacker, attacker_type = _least_valuable(piece_sets, attackers & colors[side])
+        if not attacker:
+            break
+        # Lift the capturer: sliders behind it now reach the square
+        lifted = occupied & ~attacker
+        lifted_attackers = (attackers | _sliders_to(board, square, lifted)) & lifted
+        # The king can't capture onto a square the other side still attacks
+        if attacker_type == chess.KING and lifted_attackers & colors[not side]:
+            break
+        gains.append(on_square - gains[-1])
+        on_square = SEE_VALUES[attacker_type]
+        occupied, attackers = lifted, lifted_attackers
+        side = not side
+
+    # Each side stops as soon as recapturing would lose more
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
+
+
+class ExchangeEvaluator:
+    """
+    SEE on one position, memoised: attacker sets per square, the value of
+    winning each piece, and the SEE of each move asked about.
+    """
+
+    def __init__(self, board: chess.Board):
+        self.board = board
+        self._piece_sets = _piece_sets(board)
+        self._attackers: Dict[chess.Square, int] = {}
+        self._threats: Dict[chess.Square, int] = {}
+        self._moves: Dict[chess.Move, int] = {}
+
+    def attackers(self, square: chess.Square) -> int:
+        """Pieces of both colours attacking `square` (cached)"""
+        attackers = self._attackers.get(square)
+        if attackers is None:
+            attackers = self._attackers[square] = attackers_to(self.board, square, self.board.occupied)
+        return attackers
+
+    def threat(self, square: chess.Square) -> int:
+        """
+        Material (cp, >= 0) the opponent of the piece on `square` wins by
+        starting the exchange there (0 if it shouldn't, or the square is empty)
+        """
+        threat = self._threats.get(square)
+        if threat is not None:
+            return threat
+
+        board = self.board
+        piece = board.piece_at(square)
+        threat = 0
+        if piece is not None and piece.piece_type != chess.KING:
+            attackers = self.attackers(square)
+            first, first_type = _least_valuable(self._piece_sets, attackers & board.occupied_co[not piece.color])
+            if first:
+                occupied = board.occupied & ~first
+                attackers = (attackers | _sliders_to(board, square, occupied)) & occupied
+                # The king only captures undefended pieces
+                if not (first_type == chess.KING and attackers & board.occupied_co[piece.color]):
+                    threat = max(0, swap(
+                        board, square, piece.color, SEE_VALUES[piece.piece_type],
+                        SEE_VALUES[first_type], occupied, attackers, self._piece_sets
+                    ))
+        self._threats[square] = threat
+        return threat
+
+    def en_prise(self, square: chess.Square) -> bool:
+        """
+        Whether capturing the piece on `square` wins material (threat > 0),
+        without the full exchange when a cheaper attacker or the lack of any
+        defender (x-rays included) settles it
+        """
+        threat = self._threats.get(square)
+        if threat is not None:
+            return threat > 0
+
+        board = self.board
+        piece_type = board.piece_type_at(square)
+        if piece_type is None or piece_type == chess.KING:
+            return False
+        color = bool(board.occupied_co[chess.WHITE] & chess.BB_SQUARES[square])
+        attackers = self.attackers(square)
+        first, first_type = _least_valuable(self._piece_sets, attackers & board.occupied_co[not color])
+        if not first:
+            return False
+        if first_type == chess.KING:
+            return self.threat(square) > 0
+        # Even if the attacker is recaptured, the exchange nets the difference
+        if SEE_VALUES[first_type] < SEE_VALUES[piece_type]:
+            return True
+        # No defender, even behind the capturer
+        occupied = board.occupied & ~first
+        if not (attackers | _sliders_to(board, square, occupied)) & occupied & board.occupied_co[color]:
+            return True
+        return self.threat(square) > 0
+
+    def move(self, move: chess.Move) -> int:
+        """
+        SEE of `move` (cp, for the side playing it): what it captures minus
+        what it loses in the exchange on the destination square. Negative
+        when it puts material en prise.
+        """
+        see = self._moves.get(move)
+        if see is not None:
+            return see
+
+        board = self.board
+        to_square = move.to_square
+        mover = board.piece_type_at(move.from_square)
+        occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+
+        if board.is_en_passant(move):
+            gain = SEE_VALUES[chess.PAWN]
+            captured = chess.square(chess.square_file(to_square), chess.square_rank(move.from_square))
+            occupied &= ~chess.BB_SQUARES[captured]
+            attackers = attackers_to(board, to_square, occupied)
+        elif board.is_castling(move) or mover is None:
+            gain, attackers = 0, 0
+        else:
+            captured = board.piece_type_at(to_square)
+            gain = SEE_VALUES[captured] if captured else 0
+            attackers = (self.attackers(to_square) | _sliders_to(board, to_square, occupied)) & occupied
+
+        on_square = SEE_VALUES[mover] if mover else 0
+        if move.promotion:
+            gain += SEE_VALUES[move.promotion] - SEE_VALUES[chess.PAWN]
+            on_square = SEE_VALUES[move.promotion]
+
+        see = gain
+        if attackers:
+            see = swap(board, to_square, not board.turn, gain, on_square, occupied, attackers, self._piece_sets)
+        self._moves[move] = see
+        return see
+
+    def material_offered(self, move: chess.Move) -> int:
+        """Material (cp, >= 0) `move` leaves en prise by SEE"""
+        return max(0, -self.move(move))
+
+
+def see_move(board: chess.Board, move: chess.Move) -> int:
+    """SEE of one move (see ExchangeEvaluator.move)"""
+    return ExchangeEvaluator(board).move(move)
+
+
+def see_threat(board: chess.Board, square: chess.Square) -> int:
+    """What capturing the piece on `square` wins (see ExchangeEvaluator.threat)"""
+    return ExchangeEvaluator(board).threat(square)
@@ -6,14 +6,91 @@ Uses python-chess UCI engine communication for reliable game analysis
 import asyncio
 import io
 import os
+import time
 from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import math
+from contextlib import asynccontextmanager
 
 import chess
 import chess.pgn
 import chess.engine
 
+from api.services.classification import (
+    BRILLIANT_MIN_SACRIFICE,
+    CLASSIFICATION_BOUNDARIES,
+    REFINED_MAX_CP_LOSS,
+    SACRIFICE_MAX_WIN_BEFORE,
+    SACRIFICE_MIN_WIN_AFTER,
+    as_scores,
+    classify_game,
+    classify_move_by_cp_loss,
+    is_sacrifice_candidate,
+    sacrifice_candidates,
+    win_percent
+)
+from api.services.engine_pool import EnginePool, is_engine_alive
+from api.services.engine_watchdog import EngineUnavailableError, get_engine_watchdog, kill_engine
+from api.services.engine_workers import get_analysis_pool
+from api.services.eval_cache import get_eval_cache, position_key
+from api.services.opening_book import get_opening_book
+from api.services.see import SEE_VALUES, ExchangeEvaluator
+from api.services.tablebase import get_tablebase
+from api.services.tactics import MotifTagger
+
+
+# Max plies a worker claims at once in parallel analysis. Contiguous chunks
+# keep consecutive positions on the same engine so its hash table stays useful.
+MAX_CHUNK_SIZE = 8
+
+# Engines leased per game by analyze_game_pgn (extra ones only if idle)
+DEFAULT_ENGINES_PER_GAME = int(os.getenv("STOCKFISH_ENGINES_PER_GAME", "1"))
+
+# Share of the pool one evaluate_batch call may lease, so a large batch
+# leaves engines for game analysis and live sessions
+BATCH_POOL_SHARE = float(os.getenv("EVALUATE_BATCH_POOL_SHARE", "0.5"))
+
+# Adaptive analysis: depth of the first (whole game) sweep, and the max share
+# of plies re-searched at full depth in the second pass
+ADAPTIVE_SWEEP_DEPTH = int(os.getenv("ANALYSIS_SWEEP_DEPTH", "10"))
+ADAPTIVE_DEEPEN_RATIO = float(os.getenv("ANALYSIS_DEEPEN_RATIO", "0.5"))
+
+# How close a shallow cp loss has to be to a classification boundary
+# (good/inaccuracy, inaccuracy/mistake, mistake/blunder) to count as uncertain
+BOUNDARY_MARGIN = 30
+
+# Eval swing (either side) that always gets a deeper look
+CRITICAL_SWING = 150
+
+# MultiPV second pass (refine_plies): lines searched per position, and the
+# mover's win% gap between the best and second line that makes the best an
+# "only move"
+REFINE_MULTIPV = 3
+ONLY_MOVE_WIN_GAP = 20.0
+
+# A move is a sacrifice when the mover is down at least BRILLIANT_MIN_SACRIFICE
+# (cp) after the opponent's last reply within SACRIFICE_PLIES of its PV. It only
+# counts within the classification SACRIFICE_MAX_WIN_BEFORE / SACRIFICE_MIN_WIN_AFTER
+# window (the mover wasn't already winning easily, nor is worse after it).
+SACRIFICE_PLIES = 6
+
+# Score stored for mates (python-chess mate_score): mate in N = +/-(MATE_SCORE - N)
+MATE_SCORE = 10000
+
+# Eval (cp, White's perspective) of the standard starting position, used
+# when known evals (Lichess) leave it out
+START_POSITION_CP = 20
+
+# Deterministic (node budget) mode: engines are switched to one thread and a
+# fixed hash size, and the hash is cleared before every search, so the same
+# position and budget always give the same result
+DETERMINISTIC_HASH_MB = int(os.getenv("STOCKFISH_DETERMINISTIC_HASH_MB", "16"))
+
+# Name (with version) reported by the last engine started per configured
+# path (None = default lookup), so stored evals can be matched without
+# starting an engine
+_engine_names: Dict[Optional[str], str] = {}
+
 
 @dataclass
 class MoveAnalysis:
@@ -27,107 +104,64 @@ class MoveAnalysis:
     best_move: Optional[str]    # Engine's best move
     classification: str         # brilliant, great, best, good, inaccuracy, mistake, blunder
     pv: List[str]               # Principal variation
+    depth: Optional[int] = None   # Depth reached for the position after the move
+    nodes: Optional[int] = None   # Nodes searched for it (None if not searched here)
+    engine: Optional[str] = None  # Engine name/version, "syzygy" or "lichess"
+    budget: Optional[int] = None  # Node budget (deterministic mode only)
+    only_move: Optional[bool] = None  # MultiPV pass: the only good move (None = not re-searched)
+    sacrifice: Optional[bool] = None  # MultiPV pass: a sound material sacrifice
+    material_offered: Optional[int] = None  # Material (cp) the move leaves en prise (SEE)
+    white: Optional[bool] = None  # White made the move (games can start with Black to move)
+    motifs: List[str] = field(default_factory=list)  # Tactical motifs (see MotifTagger)
 
 
-def cp_to_win_probability(cp: int) -> float:
-    """Convert centipawn score to win probability (0-100)"""
-    return 50 + 50 * (2 / (1 + math.exp(-0.004 * cp)) - 1)
+@dataclass
+class PositionEval:
+    """Evaluation of one position (scores from White's perspective)"""
+    cp: Optional[int]
+    mate: Optional[int]
+    pv: List[str] = field(default_factory=list)
+    depth: Optional[int] = None
+    nodes: Optional[int] = None
+    engine: Optional[str] = None
+    budget: Optional[int] = None
 
 
-def classify_move_by_cp_loss(
-    cp_before: Optional[int],
-    cp_after: Optional[int],
-    is_white_to_move: bool,
-    move_san: str,
-    move_number: int
-) -> str:
-    """
-    Classify move based on centipawn loss (chess.com/lichess standard).
+def find_stockfish_path() -> str:
+    """Find Stockfish binary - checks env var first, then common locations"""
+    # Check environment variable first
+    env_path = os.getenv("STOCKFISH_PATH")
+    if env_path:
+        print(f"[Stockfish] Checking env STOCKFISH_PATH: {env_path}")
+        if os.path.isfile(env_path):
+            print(f"[Stockfish] Found via env var: {env_path}")
+            return env_path
+        else:
+            print(f"[Stockfish] Env path does not exist: {env_path}")
     
-    Args:
-        cp_before: Centipawn evaluation before move
-        cp_after: Centipawn evaluation after move
-        is_white_to_move: True if white made the move
-        move_san: Move in SAN notation
-        move_number: Move number (1-indexed)
-        
-    Returns:
-        Classification string
-    """
-    # Opening book (first 10 moves - both players)
-    if move_number <= 10:
-        return "book"
-    
-    # Handle missing evaluations
-    if cp_before is None or cp_after is None:
-        return "normal"
-    
-    # Calculate centipawn loss from player's perspective
-    if is_white_to_move:
-        cp_loss = cp_before - cp_after
-    else:
-        cp_loss = cp_after - cp_before
-    
-    # Exact best move (zero loss)
-    if cp_loss == 0:
-        return "best"
-    
-    # Material sacrifice check (simple heuristic)
-    # True if we moved a piece to a square where it can be captured by a lower value piece
-    # This is hard to do perfectly without board state, but let's make the text condition stricter
-    # Brilliant: Must be a sacrifice (very low CP loss + specific move types)
-    # For now, let's limit it to only PROMOTIONS or clearly tactical best moves
-    if cp_loss <= 5 and ('=' in move_san): # Promotion is often brilliant if best
-        return "brilliant"
-        
-    # Standard centipawn-based classification (Industry standard - more lenient)
-    if cp_loss <= 10:
-        return "great"      # < 10 cp loss
-    elif cp_loss <= 25:
-        return "excellent"  # < 25 cp loss
-    elif cp_loss <= 50:
-        return "good"       # < 50 cp loss
-    elif cp_loss <= 100:
-        return "inaccuracy" # 50-100 cp loss
-    elif cp_loss <= 250:
-        return "mistake"    # 100-250 cp loss
-    else:
-        return "blunder"    # > 250 cp loss (2.5 pawns)
-
-
-def classify_move(
-    win_prob_before: float,
-    win_prob_after: float,
-    is_white_to_move: bool,
-    cp_sacrifice: int = 0
-) -> str:
-    """
-    DEPRECATED: Legacy classification based on win probability.
-    Use classify_move_by_cp_loss instead.
-    """
-    # Adjust perspective: for black, we need to invert
-    if is_white_to_move:
-        delta = win_prob_after - win_prob_before
-    else:
-        delta = (100 - win_prob_after) - (100 - win_prob_before)
-    
-    # Check for brilliant (sacrifice leading to advantage)
-    if cp_sacrifice > 100 and delta > 5:
-        return "brilliant"
-    
-    # Classification based on win probability change
-    if delta >= 5:
-        return "great"
-    elif delta >= -1:
-        return "best"
-    elif delta >= -3:
-        return "good"
-    elif delta >= -5:
-        return "inaccuracy"
-    elif delta >= -10:
-        return "mistake"
-    else:
-        return "blunder"
+    common_paths = [
+        r"C:\stockfish\stockfish\stockfish-windows-x86-64-avx2.exe",  # Our download location
+        r"C:\stockfish\stockfish-windows-x86-64-avx2.exe",
+        r"C:\stockfish\stockfish.exe",  # Windows custom
+        r"C:\Program Files\Stockfish\stockfish.exe",
+        "stockfish",  # In PATH
+        "stockfish.exe",  # Windows in PATH
+        "/usr/bin/stockfish",  # Linux
+        "/usr/local/bin/stockfish",  # macOS Homebrew
+        "/opt/homebrew/bin/stockfish",  # macOS M1 Homebrew
+    ]
+    
+    print(f"[Stockfish] Searching common paths...")
+    for path in common_paths:
+        if os.path.isfile(path):
+            print(f"[Stockfish] Found at: {path}")
+            return path
+        else:
+            print(f"[Stockfish] Not found: {path}")
+    
+    # Default to hoping it's in PATH
+    print("[Stockfish] WARNING: No stockfish binary found, defaulting to 'stockfish'")
+    return "stockfish"
 
 
 class StockfishAnalyzer:
@@ -135,60 +169,85 @@ class StockfishAnalyzer:
     Server-side Stockfish analysis using python-chess UCI engine.
     """
     
-    def __init__(self, stockfish_path: Optional[str] = None, depth: int = 18):
+    def __init__(
+        self,
+        stockfish_path: Optional[str] = None,
+        depth: int = 18,
+        engine: Optional[chess.engine.UciProtocol] = None,
+        use_cache: bool = True,
+        use_tablebase: bool = True,
+        nodes: Optional[int] = None,
+        pool: Optional[EnginePool] = None,
+        use_shortcuts: bool = True
+    ):
         """
         Initialize analyzer.
         
         Args:
             stockfish_path: Path to Stockfish binary. If None, tries common locations.
             depth: Analysis depth (higher = more accurate but slower)
+            engine: Already running engine (e.g. leased from the EnginePool).
+                    The analyzer will not quit an engine it does not own.
+            use_cache: Look up / store positions in the shared EvalCache
+            use_tablebase: Answer low-material positions from Syzygy tables
+                           (when SYZYGY_PATH is configured) instead of searching
+            nodes: Node budget per position. Enables deterministic mode: searches
+                   are limited by nodes only (no time or depth), run on one
+                   thread with a fixed, freshly cleared hash, and results are
+                   reproducible and cached per budget.
+            pool: Pool the engines were leased from. Engines that hang or die
+                  are then replaced through the pool (see current_engine).
+            use_shortcuts: Fill in game positions whose eval follows from the
+                           rules without searching: checkmate/stalemate, a
+                           single legal move (eval of the position after it)
+                           and moves continuing a known mate line (not in
+                           deterministic mode)
         """
-        self.stockfish_path = stockfish_path or self._find_stockfish()
+        # Looked up by start() when an engine is first needed
+        self.stockfish_path = stockfish_path
+        self._configured_path = stockfish_path
         self.depth = depth
-        self._engine = None
+        self._engine = engine
+        self._owns_engine = engine is None
+        self.use_cache = use_cache
+        self.use_tablebase = use_tablebase
+        self.use_shortcuts = use_shortcuts
+        self.nodes = nodes
+        self._pool = pool
         self._transport = None
+        # Failed engine -> its replacement (engines restarted by the watchdog)
+        self._replacements: Dict[chess.engine.UciProtocol, chess.engine.UciProtocol] = {}
+        # Replacements for engines we don't own started without a pool (quit by stop())
+        self._spawned: List[chess.engine.UciProtocol] = []
+        # Set by a worker whose engine could not be recovered
+        self._failure: Optional[Exception] = None
+        # Options changed on engines we don't own, restored by restore_engine_options()
+        self._saved_options: Dict[chess.engine.UciProtocol, Dict[str, Any]] = {}
+        # Engine work done by this analyzer (cache hits excluded)
+        self.searches = 0
+        self.search_time = 0.0
+        self.book_skips = 0
+        self.tablebase_hits = 0
+        # MultiPV second pass (refine_plies)
+        self.refine_searches = 0
+        self.refine_time = 0.0
+        # Searches saved by shortcuts (see use_shortcuts)
+        self.terminal_skips = 0
+        self.forced_skips = 0
+        self.mate_line_skips = 0
     
     def _find_stockfish(self) -> str:
         """Find Stockfish binary - checks env var first, then common locations"""
-        # Check environment variable first
-        env_path = os.getenv("STOCKFISH_PATH")
-        if env_path:
-            print(f"[Stockfish] Checking env STOCKFISH_PATH: {env_path}")
-            if os.path.isfile(env_path):
-                print(f"[Stockfish] Found via env var: {env_path}")
-                return env_path
-            else:
-                print(f"[Stockfish] Env path does not exist: {env_path}")
-        
-        common_paths = [
-            r"C:\stockfish\stockfish\stockfish-windows-x86-64-avx2.exe",  # Our download location
-            r"C:\stockfish\stockfish-windows-x86-64-avx2.exe",
-            r"C:\stockfish\stockfish.exe",  # Windows custom
-            r"C:\Program Files\Stockfish\stockfish.exe",
-            "stockfish",  # In PATH
-            "stockfish.exe",  # Windows in PATH
-            "/usr/bin/stockfish",  # Linux
-            "/usr/local/bin/stockfish",  # macOS Homebrew
-            "/opt/homebrew/bin/stockfish",  # macOS M1 Homebrew
-        ]
-        
-        print(f"[Stockfish] Searching common paths...")
-        for path in common_paths:
-            if os.path.isfile(path):
-                print(f"[Stockfish] Found at: {path}")
-                return path
-            else:
-                print(f"[Stockfish] Not found: {path}")
-        
-        # Default to hoping it's in PATH
-        print("[Stockfish] WARNING: No stockfish binary found, defaulting to 'stockfish'")
-        return "stockfish"
+        return find_stockfish_path()
     
     async def start(self):
         """Start the Stockfish engine"""
         if self._engine is not None:
             return
         
+        if not self.stockfish_path:
+            self.stockfish_path = self._find_stockfish()
+        
         print(f"[Stockfish] Attempting to start with path: {self.stockfish_path}")
         
         # Verify path exists before attempting
@@ -199,6 +258,7 @@ class StockfishAnalyzer:
             self._transport, self._engine = await chess.engine.popen_uci(
                 self.stockfish_path
             )
+            _engine_names[self._configured_path] = self._engine.id.get("name")
             print(f"[Stockfish] Engine started successfully: {self.stockfish_path}")
         except FileNotFoundError as e:
             print(f"[Stockfish] Binary not found: {self.stockfish_path}")
@@ -208,144 +268,848 @@ class StockfishAnalyzer:
             raise RuntimeError(f"Could not start Stockfish at {self.stockfish_path}: {e}")
     
     async def stop(self):
-        """Stop the Stockfish engine"""
+        """Stop the Stockfish engine (leased engines are left running)"""
+        spawned, self._spawned = self._spawned, []
+        for engine in spawned:
+            if is_engine_alive(engine):
+                await engine.quit()
+        if self._engine is not None and not self._owns_engine:
+            self._engine = None
+            return
         if self._engine is not None:
-            await self._engine.quit()
+            if is_engine_alive(self._engine):
+                await self._engine.quit()
             self._engine = None
             self._transport = None
             print("[Stockfish] Engine stopped")
     
+    @property
+    def engine_name(self) -> Optional[str]:
+        """Name (with version) the running engine reports, e.g. "Stockfish 16.1" """
+        if self._engine is None:
+            return None
+        return self._engine.id.get("name")
+    
+    async def resolve_engine_name(self) -> Optional[str]:
+        """
+        engine_name without starting an engine if it can be helped: the
+        running engine's, else the last one started from the same path in
+        this process, else start the engine and ask it
+        """
+        name = self.engine_name
+        if name is None and self._owns_engine:
+            name = _engine_names.get(self._configured_path)
+        if name is None:
+            await self.start()
+            name = self.engine_name
+        return name
+    
+    def current_engine(self, engine: chess.engine.UciProtocol) -> chess.engine.UciProtocol:
+        """The engine now standing in for `engine` (itself unless it was restarted)"""
+        while engine in self._replacements:
+            engine = self._replacements[engine]
+        return engine
+    
+    async def _replace_engine(self, old: chess.engine.UciProtocol) -> chess.engine.UciProtocol:
+        """Restart hook for the watchdog: swap a hung or dead engine for a new one"""
+        self._saved_options.pop(old, None)
+        if old is self._engine and self._owns_engine:
+            kill_engine(old)
+            self._transport, new = await chess.engine.popen_uci(self.stockfish_path)
+        elif self._pool is not None:
+            new = await self._pool.replace(old)
+        else:
+            kill_engine(old)
+            _, new = await chess.engine.popen_uci(self.stockfish_path or self._find_stockfish())
+            self._spawned.append(new)
+        
+        self._replacements[old] = new
+        if old is self._engine:
+            self._engine = new
+        print("[Stockfish] Engine restarted by watchdog")
+        return new
+    
     async def analyze_position(
         self, 
         board: chess.Board, 
-        time_limit: float = 0.5
+        time_limit: float = 0.5,
+        engine: Optional[chess.engine.UciProtocol] = None,
+        depth: Optional[int] = None
     ) -> Tuple[Optional[int], Optional[int], List[str]]:
         """
         Analyze a single position.
         
+        Args:
+            board: Position to analyze
+            time_limit: Time limit in seconds
+            engine: Engine to search with (defaults to the analyzer's own engine)
+            depth: Search depth (defaults to the analyzer's depth)
+        
         Returns:
             Tuple of (centipawn_score, mate_in, principal_variation)
         """
-        if self._engine is None:
-            await self.start()
+        result = await self.evaluate_position(board, time_limit, engine=engine, depth=depth)
+        return result.cp, result.mate, result.pv
+    
+    async def _configure_deterministic(self, engine: chess.engine.UciProtocol):
+        """Switch an engine to Threads=1 and the fixed hash size (once per engine)"""
+        wanted = {"Threads": 1, "Hash": DETERMINISTIC_HASH_MB}
+        options = {
+            name: value for name, value in wanted.items()
+            if name in engine.options and engine.config.get(name) != value
+        }
+        if not options:
+            return
+        if engine is not self._engine or not self._owns_engine:
+            self._saved_options.setdefault(engine, {
+                name: engine.config.get(name) for name in options
+            })
+        await engine.configure(options)
+    
+    async def restore_engine_options(self):
+        """Give engines we don't own their Threads/Hash back after deterministic mode"""
+        saved, self._saved_options = self._saved_options, {}
+        for engine, options in saved.items():
+            try:
+                await engine.configure(options)
+            except Exception as e:
+                print(f"[Stockfish] Could not restore engine options: {e}")
+    
+    async def lookup_position(
+        self,
+        board: chess.Board,
+        depth: Optional[int] = None
+    ) -> Optional[PositionEval]:
+        """
+        Answer a position without searching: game over first (with
+        shortcuts on), then the tablebase, then the eval cache (at least
+        `depth` deep, or the node budget). None on a miss.
+        """
+        depth = depth or self.depth
+        budget = self.nodes
+        
+        if self.use_shortcuts:
+            terminal = terminal_eval(board)
+            if terminal is not None:
+                self.terminal_skips += 1
+                return terminal
         
+        # Exact result for tablebase positions, no search needed
+        if self.use_tablebase:
+            tablebase_result = get_tablebase().probe(board)
+            if tablebase_result is not None:
+                self.tablebase_hits += 1
+                cp, mate, pv = tablebase_result
+                return PositionEval(cp, mate, pv, engine="syzygy")
+        
+        if self.use_cache:
+            # Only this engine's results (any engine's when it isn't known yet)
+            cached = await get_eval_cache().get(board, depth, budget=budget, engine=self.engine_name)
+            if cached is not None:
+                return PositionEval(cached.cp, cached.mate, cached.pv,
+                                    depth=cached.depth, engine=cached.engine, budget=budget)
+        
+        return None
+    
+    async def evaluate_position(
+        self,
+        board: chess.Board,
+        time_limit: float = 0.5,
+        engine: Optional[chess.engine.UciProtocol] = None,
+        depth: Optional[int] = None
+    ) -> PositionEval:
+        """
+        Analyze a single position, keeping where the result came from.
+        
+        Same as analyze_position, but also returns the depth reached, nodes
+        searched and engine (cache hits keep the cached depth, no nodes).
+        In deterministic mode `time_limit` and `depth` are ignored.
+        """
+        depth = depth or self.depth
+        budget = self.nodes
+        
+        known = await self.lookup_position(board, depth)
+        if known is not None:
+            return known
+        
+        cache = get_eval_cache() if self.use_cache else None
+        if engine is None:
+            if self._engine is None:
+                await self.start()
+            engine = self._engine
+        
+        watchdog = get_engine_watchdog()
         try:
-            info = await self._engine.analyse(
-                board, 
-                chess.engine.Limit(depth=self.depth, time=time_limit)
-            )
+            started = time.perf_counter()
+            if budget:
+                # A new game object makes python-chess send ucinewgame (clears the hash)
+                info, engine = await watchdog.analyse(
+                    engine, board, chess.engine.Limit(nodes=budget), self._replace_engine,
+                    prepare=self._configure_deterministic, game=object()
+                )
+            else:
+                info, engine = await watchdog.analyse(
+                    engine, board, 
+                    chess.engine.Limit(depth=depth, time=time_limit),
+                    self._replace_engine
+                )
+            self.searches += 1
+            self.search_time += time.perf_counter() - started
             
             score = info.get("score")
             pv = info.get("pv", [])
             
             if score is None:
-                return None, None, []
+                return PositionEval(None, None)
             
             # Get the score from White's perspective for consistency
-            if score.is_mate():
-                # For mate, score.white() handles it correctly (positive if White winning)
-                return score.white().score(mate_score=10000), score.white().mate(), [m.uci() for m in pv]
-            else:
-                return score.white().score(mate_score=10000), None, [m.uci() for m in pv]
+            # (for mate, score.white() is positive if White is winning)
+            cp = score.white().score(mate_score=10000)
+            mate = score.white().mate() if score.is_mate() else None
+            pv_uci = [m.uci() for m in pv]
+            
+            # Cache at the depth actually reached (time limit may cut it short)
+            if cache is not None:
+                await cache.put(board, info.get("depth"), cp, mate, pv_uci, budget=budget,
+                                engine=engine.id.get("name"))
+            
+            return PositionEval(cp, mate, pv_uci, depth=info.get("depth"),
+                                nodes=info.get("nodes"), engine=engine.id.get("name"), budget=budget)
                 
+        except EngineUnavailableError:
+            # Engine could not be recovered: fail the analysis instead of
+            # returning empty evals for every remaining ply
+            raise
         except Exception as e:
             print(f"[Stockfish] Analysis error: {e}")
-            return None, None, []
+            return PositionEval(None, None)
+    
+    async def evaluate_lines(
+        self,
+        board: chess.Board,
+        multipv: int = REFINE_MULTIPV,
+        time_limit: float = 0.5,
+        engine: Optional[chess.engine.UciProtocol] = None,
+        depth: Optional[int] = None
+    ) -> List[PositionEval]:
+        """
+        MultiPV search: the best `multipv` lines of a position (White's
+        perspective), best first. Not cached. Empty on an engine error.
+        """
+        depth = depth or self.depth
+        if engine is None:
+            if self._engine is None:
+                await self.start()
+            engine = self._engine
+        
+        watchdog = get_engine_watchdog()
+        try:
+            started = time.perf_counter()
+            if self.nodes:
+                infos, engine = await watchdog.analyse(
+                    engine, board, chess.engine.Limit(nodes=self.nodes), self._replace_engine,
+                    prepare=self._configure_deterministic, game=object(), multipv=multipv
+                )
+            else:
+                infos, engine = await watchdog.analyse(
+                    engine, board, chess.engine.Limit(depth=depth, time=time_limit),
+                    self._replace_engine, multipv=multipv
+                )
+            elapsed = time.perf_counter() - started
+            self.searches += 1
+            self.search_time += elapsed
+            self.refine_searches += 1
+            self.refine_time += elapsed
+        except EngineUnavailableError:
+            raise
+        except Exception as e:
+            print(f"[Stockfish] MultiPV analysis error: {e}")
+            return []
+        
+        lines = []
+        for info in infos:
+            score = info.get("score")
+            if score is None:
+                continue
+            lines.append(PositionEval(
+                score.white().score(mate_score=MATE_SCORE),
+                score.white().mate() if score.is_mate() else None,
+                [m.uci() for m in info.get("pv", [])],
+                depth=info.get("depth"), nodes=info.get("nodes"),
+                engine=engine.id.get("name"), budget=self.nodes
+            ))
+        return lines
     
     async def analyze_game(
         self, 
         pgn: str, 
         time_per_move: float = 0.3,
-        callback = None
+        callback = None,
+        engines: Optional[List[chess.engine.UciProtocol]] = None,
+        on_move = None,
+        known_evals: Optional[List[Optional[PositionEval]]] = None,
+        refine_plies: int = 0
     ) -> List[MoveAnalysis]:
         """
         Analyze all moves in a game.
         
+        Positions are searched by one worker per engine (the analyzer's own
+        engine plus any extra `engines`), each claiming contiguous chunks of
+        plies, and the results are reassembled in ply order.
+        Positions with a known eval (e.g. from Lichess server analysis) are
+        not searched; the engine is not started if nothing is left to search.
+        With shortcuts on, positions with a single legal move take the eval
+        of the position after it, and moves along a known mate line (the
+        move played is the PV's first move) continue it without a search.
+        
         Args:
             pgn: PGN string of the game
             time_per_move: Time limit per position in seconds
-            callback: Optional async callback(ply, total) for progress
+            callback: Optional async callback(ply, total) for progress,
+                      called in ply order as soon as each ply is complete
+            engines: Additional running engines for parallel analysis
+            on_move: Optional async callback(MoveAnalysis), called in ply order
+                     as soon as each move's analysis is complete
+            known_evals: Optional per-position PositionEval (e.g. Lichess evals or
+                         earlier results), index 0 = starting position, None = unknown
+            refine_plies: Re-search this many critical plies with MultiPV to find
+                          only moves and sacrifices (see refine_critical_plies).
+                          Moves whose result changes are passed to on_move again.
             
         Returns:
             List of MoveAnalysis for each move
         """
         results: List[MoveAnalysis] = []
         
-        # Parse PGN
-        try:
-            game = chess.pgn.read_game(io.StringIO(pgn))
-            if game is None:
-                print("[Stockfish] Failed to parse PGN")
-                return results
-        except Exception as e:
-            print(f"[Stockfish] PGN parse error: {e}")
+        game = self._read_game(pgn)
+        if game is None:
             return results
         
-        # Start engine
-        await self.start()
+        positions, sans, white_to_move = self._replay(game)
+        total_moves = len(sans)
+        book = self._book_plies(positions)
+        tagger = MotifTagger(positions)
         
-        board = game.board()
-        moves = list(game.mainline_moves())
-        total_moves = len(moves)
+        # Per-position evals, filled in by the workers
+        evals: List[Optional[PositionEval]] = [None] * len(positions)
+        ready = [asyncio.Event() for _ in positions]
         
-        # Analyze starting position
-        prev_cp, prev_mate, _ = await self.analyze_position(board, time_per_move)
-        prev_win_prob = cp_to_win_probability(prev_cp or 0)
+        known = self._apply_known_evals(evals, known_evals)
+        indices = [i for i in self._positions_to_search(book, len(positions)) if i not in known]
+        saved = self.shortcut_stats()
+        indices, forced = self._forced_positions(positions, indices, known)
+        for i in set(range(len(positions))) - set(indices) - forced:
+            if evals[i] is None:
+                evals[i] = PositionEval(None, None)
+            ready[i].set()
         
-        for ply, move in enumerate(moves, start=1):
-            is_white_to_move = board.turn == chess.WHITE
-            san = board.san(move)
-            move_number = (ply + 1) // 2  # Convert ply to move number
-            
-            # Make the move
-            board.push(move)
-            
-            # Analyze position after move
-            cp, mate, pv = await self.analyze_position(board, time_per_move)
-            
-            # Calculate win probability after move (White's perspective)
-            if mate is not None:
-                # Mate found (mate > 0 is White winning, mate < 0 is Black winning)
-                if mate > 0:
-                    win_prob = 100
-                else:
-                    win_prob = 0
-            else:
-                win_prob = cp_to_win_probability(cp or 0)
+        # Start engine
+        if indices:
+            await self.start()
+        
+        tasks = self._start_workers(
+            positions, indices, evals, ready, time_per_move, self.depth, engines
+        )
+        
+        try:
+            # Starting position
+            await self._wait_position(0, positions, evals, ready, forced)
+            self._raise_failure()
             
-            # Classify the move using centipawn loss
-            classification = classify_move_by_cp_loss(
-                prev_cp,
-                cp,
-                is_white_to_move,
-                san,
-                move_number
+            for ply, san in enumerate(sans, start=1):
+                await self._wait_position(ply, positions, evals, ready, forced)
+                self._raise_failure()
+                
+                move_analysis = self._classify_ply(
+                    ply, san, white_to_move[ply - 1], evals, book, tagger
+                )
+                self._tag_motifs(tagger, [move_analysis])
+                results.append(move_analysis)
+                
+                if on_move:
+                    await on_move(move_analysis)
+                
+                # Progress callback
+                if callback:
+                    await callback(ply, total_moves)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        self._report_saved(saved, len(positions))
+        if refine_plies:
+            changed = await self.refine_critical_plies(
+                positions, sans, white_to_move, results, refine_plies, time_per_move, engines, book
             )
+            self._tag_motifs(tagger, [results[ply - 1] for ply in changed])
+            if on_move:
+                for ply in changed:
+                    await on_move(results[ply - 1])
+        return results
+    
+    async def analyze_game_adaptive(
+        self,
+        pgn: str,
+        time_per_move: float = 0.3,
+        sweep_depth: int = ADAPTIVE_SWEEP_DEPTH,
+        deepen_ratio: float = ADAPTIVE_DEEPEN_RATIO,
+        engines: Optional[List[chess.engine.UciProtocol]] = None,
+        on_provisional = None,
+        known_evals: Optional[List[Optional[PositionEval]]] = None,
+        refine_plies: int = 0
+    ) -> List[MoveAnalysis]:
+        """
+        Two-phase analysis: a shallow sweep of every position, then the
+        analyzer's full depth only on plies whose classification is uncertain.
+        
+        A ply is re-searched (both the position before and after the move) when
+        its shallow result involves a mate, a large eval swing, or a cp loss
+        near a classification boundary. Book plies are never deepened. At most
+        `deepen_ratio` of the plies are deepened, most uncertain first.
+        
+        Args:
+            pgn: PGN string of the game
+            time_per_move: Time cap per position in seconds (both phases)
+            sweep_depth: Depth of the first pass
+            deepen_ratio: Max share of plies re-searched at full depth
+            engines: Additional running engines for parallel analysis
+            on_provisional: Optional async callback(List[MoveAnalysis]) called
+                            with the sweep results before the second pass
+            known_evals: Optional per-position PositionEval used as-is in
+                         both passes (see analyze_game)
+            refine_plies: Critical plies re-searched with MultiPV afterwards
+                          (see refine_critical_plies)
             
-            # Store result
-            results.append(MoveAnalysis(
-                ply=ply,
-                move=san,
-                eval_before=prev_cp,
-                eval_after=cp,
-                mate_before=prev_mate,
-                mate_after=mate,
-                best_move=pv[0] if pv else None,
-                classification=classification,
-                pv=pv[:5]  # First 5 moves of PV
-            ))
-            
-            # Update for next iteration
-            prev_cp = cp
-            prev_mate = mate
-            prev_win_prob = win_prob
-            
-            # Progress callback
-            if callback:
-                await callback(ply, total_moves)
+        Returns:
+            List of MoveAnalysis for each move (final results)
+        """
+        game = self._read_game(pgn)
+        if game is None:
+            return []
+        
+        positions, sans, white_to_move = self._replay(game)
+        book = self._book_plies(positions)
+        tagger = MotifTagger(positions)
+        evals: List[PositionEval] = [PositionEval(None, None) for _ in positions]
+        known = self._apply_known_evals(evals, known_evals)
+        indices = [i for i in self._positions_to_search(book, len(positions)) if i not in known]
+        saved = self.shortcut_stats()
+        if indices:
+            await self.start()
+        
+        # Phase 1: shallow sweep of the whole game (book and known positions excepted)
+        await self._search(positions, indices, evals, time_per_move, min(sweep_depth, self.depth), engines)
+        provisional = self._classify_all(sans, white_to_move, evals, book, tagger)
+        if on_provisional:
+            await on_provisional(provisional)
+        
+        if sweep_depth >= self.depth:
+            results = provisional
+        else:
+            # Phase 2: deepen the uncertain plies
+            critical = select_critical_plies(
+                provisional, white_to_move, max(0, int(len(sans) * deepen_ratio))
+            )
+            indices = sorted({i for ply in critical for i in (ply - 1, ply)} - known)
+            await self._search(positions, indices, evals, time_per_move, self.depth, engines)
+            results = self._classify_all(sans, white_to_move, evals, book, tagger)
         
+        self._report_saved(saved, len(positions))
+        if refine_plies:
+            await self.refine_critical_plies(
+                positions, sans, white_to_move, results, refine_plies, time_per_move, engines, book
+            )
+        self._tag_motifs(tagger, results)
         return results
     
+    async def refine_critical_plies(
+        self,
+        positions: List[chess.Board],
+        sans: List[str],
+        white_to_move: List[bool],
+        results: List[MoveAnalysis],
+        limit: int,
+        time_per_move: float = 0.3,
+        engines: Optional[List[chess.engine.UciProtocol]] = None,
+        book: Optional[List[bool]] = None
+    ) -> List[int]:
+        """
+        MultiPV second pass on at most `limit` plies (select_refinement_plies).
+        
+        The position before each selected move is searched with REFINE_MULTIPV
+        lines; the move is an only move when it is the best line and the
+        second line is ONLY_MOVE_WIN_GAP win% worse for the mover, and a
+        sacrifice when its line gives up material (see assess_move). Flags
+        are set on `results` and the game is reclassified in place.
+        
+        Returns:
+            Plies whose classification or flags changed
+        """
+        plies = select_refinement_plies(results, positions, limit)
+        if not plies:
+            return []
+        await self.start()
+        started = time.perf_counter()
+        
+        pending = list(plies)
+        flags: Dict[int, Tuple[bool, bool]] = {}
+        
+        async def worker(engine):
+            while pending:
+                ply = pending.pop(0)
+                engine = self.current_engine(engine)
+                lines = await self.evaluate_lines(
+                    positions[ply - 1], REFINE_MULTIPV, time_per_move, engine=engine
+                )
+                flags[ply] = assess_move(
+                    positions[ply - 1], positions[ply].peek(), lines, results[ply - 1].material_offered
+                )
+        
+        await asyncio.gather(*(worker(engine) for engine in [self._engine] + list(engines or [])))
+        
+        before = [(r.classification, r.only_move, r.sacrifice) for r in results]
+        for ply, (only_move, sacrifice) in flags.items():
+            results[ply - 1].only_move = only_move
+            results[ply - 1].sacrifice = sacrifice
+        game = classify_game(
+            [r.eval_before for r in results], [r.eval_after for r in results], sans,
+            white_moved=white_to_move, book=book[1:] if book is not None else None,
+            only_move=[bool(r.only_move) for r in results],
+            sacrifice=[bool(r.sacrifice) for r in results],
+            offered=[r.material_offered or 0 for r in results]
+        )
+        for r, classification in zip(results, game.classifications):
+            r.classification = str(classification)
+        changed = [
+            r.ply for r, old in zip(results, before)
+            if (r.classification, r.only_move, r.sacrifice) != old
+        ]
+        
+        elapsed = time.perf_counter() - started
+        only_moves = sum(1 for only_move, _ in flags.values() if only_move)
+        sacrifices = sum(1 for _, sacrifice in flags.values() if sacrifice)
+        print(f"[Stockfish] MultiPV pass on {len(plies)} plies: +{elapsed:.2f}s "
+              f"({only_moves} only moves, {sacrifices} sacrifices)")
+        return changed
+    
+    def _read_game(self, pgn: str) -> Optional[chess.pgn.Game]:
+        """Parse a PGN, returning None (and logging) if it is unreadable"""
+        try:
+            game = chess.pgn.read_game(io.StringIO(pgn))
+            if game is None:
+                print("[Stockfish] Failed to parse PGN")
+            return game
+        except Exception as e:
+            print(f"[Stockfish] PGN parse error: {e}")
+            return None
+    
+    def _replay(self, game: chess.pgn.Game) -> Tuple[List[chess.Board], List[str], List[bool]]:
+        """Replay the mainline once, keeping every position (with history)"""
+        board = game.board()
+        positions = [board.copy()]
+        sans = []
+        white_to_move = []
+        for move in game.mainline_moves():
+            white_to_move.append(board.turn == chess.WHITE)
+            sans.append(board.san(move))
+            board.push(move)
+            positions.append(board.copy())
+        return positions, sans, white_to_move
+    
+    def _apply_known_evals(self, evals: list, known_evals: Optional[list]) -> set:
+        """Copy known evals into `evals`, returning the indices filled"""
+        known = set()
+        for i, known_eval in enumerate((known_evals or [])[:len(evals)]):
+            if known_eval is not None:
+                evals[i] = known_eval
+                known.add(i)
+        return known
+    
+    def _book_plies(self, positions: List[chess.Board]) -> Optional[List[bool]]:
+        """
+        Book flag per ply (index = ply, position reached is theory), or None
+        if no opening book is loaded.
+        """
+        opening_book = get_opening_book()
+        if not opening_book.loaded:
+            return None
+        return [False] + [opening_book.contains(board) for board in positions[1:]]
+    
+    def _positions_to_search(self, book: Optional[List[bool]], count: int) -> List[int]:
+        """
+        Indices of positions whose eval is needed: a position is skipped only
+        when the move into it and the move out of it are both book moves.
+        """
+        if book is None:
+            return list(range(count))
+        needed = [
+            i for i in range(count)
+            if (i >= 1 and not book[i]) or (i + 1 < count and not book[i + 1])
+        ]
+        self.book_skips += count - len(needed)
+        return needed
+    
+    def _start_workers(
+        self,
+        positions: List[chess.Board],
+        indices,
+        evals: list,
+        ready: List[asyncio.Event],
+        time_per_move: float,
+        depth: int,
+        engines: Optional[List[chess.engine.UciProtocol]] = None
+    ) -> List[asyncio.Task]:
+        """
+        Search `indices` of `positions` with one worker per engine (the
+        analyzer's own plus `engines`), each claiming contiguous chunks.
+        Results go to evals[i] and ready[i] is set as each one completes.
+        If an engine can't be recovered, every event is set and the error
+        is left for _raise_failure().
+        """
+        self._failure = None
+        indices = list(indices)
+        workers = [self._engine] + list(engines or [])
+        chunk_size = max(1, min(MAX_CHUNK_SIZE, math.ceil(len(indices) / len(workers))))
+        chunks: asyncio.Queue = asyncio.Queue()
+        for start in range(0, len(indices), chunk_size):
+            chunks.put_nowait(indices[start:start + chunk_size])
+        
+        async def worker(engine):
+            while True:
+                try:
+                    chunk = chunks.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                for i in chunk:
+                    continued = self._continue_mate_line(positions, evals, ready, i)
+                    if continued is not None:
+                        evals[i] = continued
+                        ready[i].set()
+                        continue
+                    # Pick up the replacement if the watchdog restarted our engine
+                    engine = self.current_engine(engine)
+                    try:
+                        evals[i] = await self.evaluate_position(
+                            positions[i], time_per_move, engine=engine, depth=depth
+                        )
+                    except EngineUnavailableError as e:
+                        self._failure = e
+                        for event in ready:
+                            event.set()
+                        return
+                    except Exception as e:
+                        print(f"[Stockfish] Worker error at position {i}: {e}")
+                        evals[i] = PositionEval(None, None)
+                    ready[i].set()
+        
+        return [asyncio.create_task(worker(engine)) for engine in workers]
+    
+    async def _search(
+        self,
+        positions: List[chess.Board],
+        indices,
+        evals: list,
+        time_per_move: float,
+        depth: int,
+        engines: Optional[List[chess.engine.UciProtocol]] = None
+    ):
+        """Search `indices` of `positions` into evals and wait for all of them"""
+        available = {i for i, e in enumerate(evals) if e is not None and (e.cp is not None or e.mate is not None)}
+        indices, forced = self._forced_positions(positions, indices, available)
+        ready = [asyncio.Event() for _ in positions]
+        tasks = self._start_workers(positions, indices, evals, ready, time_per_move, depth, engines)
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._raise_failure()
+        for i in sorted(forced, reverse=True):
+            evals[i] = only_move_eval(positions[i], evals[i + 1])
+    
+    def _forced_positions(self, positions: List[chess.Board], indices, available) -> Tuple[List[int], set]:
+        """
+        Split single-legal-move positions off `indices` (with shortcuts on).
+        A position qualifies when the next game position will have an eval:
+        it is searched too, or already in `available`.
+
+        Returns:
+            (indices left to search, forced position indices)
+        """
+        if not self.use_shortcuts:
+            return list(indices), set()
+        indices = list(indices)
+        evaluated = set(indices) | set(available)
+        forced = {
+            i for i in indices
+            if i + 1 < len(positions) and i + 1 in evaluated and has_single_move(positions[i])
+        }
+        self.forced_skips += len(forced)
+        return [i for i in indices if i not in forced], forced
+    
+    async def _wait_position(
+        self,
+        i: int,
+        positions: List[chess.Board],
+        evals: list,
+        ready: List[asyncio.Event],
+        forced: set
+    ):
+        """Wait for position i's eval; forced positions are filled from the first non-forced one after them"""
+        if i in forced and not ready[i].is_set():
+            end = i
+            while end in forced:
+                end += 1
+            await ready[end].wait()
+            for j in range(end - 1, i - 1, -1):
+                if not ready[j].is_set():
+                    evals[j] = only_move_eval(positions[j], evals[j + 1])
+                    ready[j].set()
+        await ready[i].wait()
+    
+    def _continue_mate_line(
+        self,
+        positions: List[chess.Board],
+        evals: list,
+        ready: List[asyncio.Event],
+        i: int
+    ) -> Optional[PositionEval]:
+        """
+        Eval of position i continued from a mate found at i - 1 (None if not
+        applicable). Off in deterministic mode: whether i - 1 is ready yet
+        depends on worker timing, so searched and continued results would
+        vary between runs.
+        """
+        if not self.use_shortcuts or self.nodes or i == 0 or not ready[i - 1].is_set() or evals[i - 1] is None:
+            return None
+        continued = mate_line_eval(positions[i - 1], positions[i].peek(), evals[i - 1])
+        if continued is not None:
+            self.mate_line_skips += 1
+        return continued
+    
+    def shortcut_stats(self) -> Dict[str, int]:
+        """Searches avoided by shortcuts, per kind"""
+        return {
+            "forced": self.forced_skips,
+            "game_over": self.terminal_skips,
+            "mate_line": self.mate_line_skips
+        }
+    
+    def _report_saved(self, before: Dict[str, int], positions: int):
+        """Log the searches shortcuts saved on one game (counters were `before` at its start)"""
+        saved = {kind: count - before[kind] for kind, count in self.shortcut_stats().items()}
+        if any(saved.values()):
+            details = ", ".join(f"{kind.replace('_', ' ')} {count}" for kind, count in saved.items())
+            print(f"[Stockfish] Shortcuts saved {sum(saved.values())} of {positions} position searches ({details})")
+    
+    def _raise_failure(self):
+        """Re-raise an unrecoverable engine failure from a worker"""
+        if self._failure is not None:
+            raise self._failure
+    
+    def _classify_ply(
+        self,
+        ply: int,
+        san: str,
+        is_white: bool,
+        evals: list,
+        book: Optional[List[bool]] = None,
+        tagger: Optional[MotifTagger] = None
+    ) -> MoveAnalysis:
+        """
+        Build the MoveAnalysis for `ply` from the evals before and after it.
+        The material it offers (SEE, from `tagger`) is only worked out when
+        it can make the move brilliant (is_sacrifice_candidate).
+        """
+        move_number = (ply + 1) // 2  # Convert ply to move number
+        offered = None
+        if tagger is not None and is_sacrifice_candidate(evals[ply - 1].cp, evals[ply].cp, is_white):
+            offered = tagger.material_offered(ply)
+        
+        # Classify the move using centipawn loss
+        classification = classify_move_by_cp_loss(
+            evals[ply - 1].cp, evals[ply].cp, is_white, san, move_number,
+            is_book=book[ply] if book is not None else None, offered=offered
+        )
+        return self._move_analysis(ply, san, is_white, evals, classification, offered)
+    
+    def _move_analysis(
+        self,
+        ply: int,
+        san: str,
+        is_white: bool,
+        evals: list,
+        classification: str,
+        offered: Optional[int] = None
+    ) -> MoveAnalysis:
+        before = evals[ply - 1]
+        after = evals[ply]
+        return MoveAnalysis(
+            ply=ply,
+            move=san,
+            eval_before=before.cp,
+            eval_after=after.cp,
+            mate_before=before.mate,
+            mate_after=after.mate,
+            best_move=after.pv[0] if after.pv else None,
+            classification=classification,
+            pv=after.pv[:5],  # First 5 moves of PV
+            depth=after.depth,
+            nodes=after.nodes,
+            engine=after.engine,
+            budget=after.budget,
+            material_offered=offered,
+            white=is_white
+        )
+    
+    def _tag_motifs(self, tagger: MotifTagger, results: List[MoveAnalysis]):
+        """
+        Motif-tagging stage: fill in each result's motifs from the replayed
+        positions, after its classification (and MultiPV flags) are final.
+        best_move is the opponent's best reply, which is what a blunder or
+        mistake allows. Moves offering BRILLIANT_MIN_SACRIFICE by SEE count
+        as sacrifices even without the MultiPV pass (material_offered is only
+        set on sacrifice candidates, see _classify_all).
+        """
+        for r in results:
+            sacrifice = bool(r.sacrifice) or (r.material_offered or 0) >= BRILLIANT_MIN_SACRIFICE
+            r.motifs = tagger.tag(r.ply, r.classification, r.best_move, sacrifice)
+    
+    def _classify_all(
+        self,
+        sans: List[str],
+        white_to_move: List[bool],
+        evals: list,
+        book: Optional[List[bool]] = None,
+        tagger: Optional[MotifTagger] = None
+    ) -> List[MoveAnalysis]:
+        """
+        Build every ply's MoveAnalysis at once (whole-game classification),
+        with SEE (`tagger`) only on the plies it can make brilliant
+        """
+        offered = None
+        if tagger is not None:
+            candidates = sacrifice_candidates(
+                as_scores([e.cp for e in evals[:-1]]), as_scores([e.cp for e in evals[1:]]), white_to_move
+            )
+            offered = [
+                tagger.material_offered(ply) if candidate else None
+                for ply, candidate in enumerate(candidates, start=1)
+            ]
+        game = classify_game(
+            [e.cp for e in evals[:-1]], [e.cp for e in evals[1:]], sans,
+            white_moved=white_to_move, book=book[1:] if book is not None else None,
+            offered=[o or 0 for o in offered] if offered is not None else None
+        )
+        return [
+            self._move_analysis(
+                ply, san, white_to_move[ply - 1], evals, str(game.classifications[ply - 1]),
+                offered[ply - 1] if offered is not None else None
+            )
+            for ply, san in enumerate(sans, start=1)
+        ]
+    
     async def __aenter__(self):
         await self.start()
         return self
@@ -354,34 +1118,514 @@ class StockfishAnalyzer:
         await self.stop()
 
 
-async def analyze_game_pgn(pgn: str, depth: int = 16) -> List[Dict[str, Any]]:
+def mate_eval(mate: int, pv: List[str], source: PositionEval) -> PositionEval:
+    """Mate in `mate` moves (White's perspective, non-zero), keeping `source`'s depth and engine"""
+    cp = MATE_SCORE - mate if mate > 0 else -MATE_SCORE - mate
+    return PositionEval(cp, mate, pv, depth=source.depth, engine=source.engine, budget=source.budget)
+
+
+def terminal_eval(board: chess.Board) -> Optional[PositionEval]:
+    """Exact eval of a finished game (checkmate, stalemate, automatic draw), else None"""
+    if board.is_checkmate():
+        # Side to move is mated (same score the engine reports for mate 0)
+        return PositionEval(-MATE_SCORE if board.turn == chess.WHITE else MATE_SCORE, 0, [])
+    if board.is_game_over():
+        return PositionEval(0, None, [])
+    return None
+
+
+def has_single_move(board: chess.Board) -> bool:
+    """True if the side to move has exactly one legal move"""
+    moves = iter(board.legal_moves)
+    return next(moves, None) is not None and next(moves, None) is None
+
+
+def only_move_eval(board: chess.Board, after: Optional[PositionEval]) -> PositionEval:
+    """
+    Eval of a position with a single legal move, from the eval of the
+    position after it: the same score, one more move of mate for the
+    mating side if it is the one moving, and the move prepended to the PV.
+    """
+    if after is None or (after.cp is None and after.mate is None):
+        return PositionEval(None, None)
+    move = next(iter(board.legal_moves))
+    pv = [move.uci()] + after.pv
+    if after.mate is None:
+        return PositionEval(after.cp, None, pv, depth=after.depth, engine=after.engine, budget=after.budget)
+
+    white_wins = after.mate > 0 or (after.mate == 0 and (after.cp or 0) > 0)
+    if (board.turn == chess.WHITE) != white_wins:
+        # The losing side's move leaves the mate distance unchanged
+        return mate_eval(after.mate, pv, after)
+    return mate_eval(after.mate + 1 if white_wins else after.mate - 1, pv, after)
+
+
+def mate_line_eval(board: chess.Board, move: chess.Move, before: PositionEval) -> Optional[PositionEval]:
+    """
+    Eval after `move` when the position before it has a mate score and the
+    move is the first of its PV: the mate continues one move shorter (if
+    the mating side moved) along the rest of the PV. None otherwise.
+    """
+    if not before.mate or len(before.pv) < 2 or before.pv[0] != move.uci():
+        return None
+    white_wins = before.mate > 0
+    mate = before.mate
+    if (board.turn == chess.WHITE) == white_wins:
+        mate = mate - 1 if white_wins else mate + 1
+    if mate == 0:
+        return None  # Checkmate: answered by terminal_eval
+    return mate_eval(mate, before.pv[1:], before)
+
+
+def material_balance(board: chess.Board, color: chess.Color) -> int:
+    """Material (cp, SEE values) of `color` minus the opponent's (the kings cancel out)"""
+    return sum(
+        SEE_VALUES[piece.piece_type] * (1 if piece.color == color else -1)
+        for piece in board.piece_map().values()
+    )
+
+
+def material_given_up(board: chess.Board, pv: List[str], plies: int = SACRIFICE_PLIES) -> int:
+    """
+    Material (cp) the side to move is down, compared with now, after the
+    opponent's last reply within the first `plies` moves of `pv` (0 if the
+    PV has no reply)
+    """
+    color = board.turn
+    start = material_balance(board, color)
+    board = board.copy(stack=False)
+    given_up = 0
+    for i, uci in enumerate(pv[:plies]):
+        move = chess.Move.from_uci(uci)
+        if not board.is_legal(move):
+            break
+        board.push(move)
+        if i % 2 == 1:
+            given_up = start - material_balance(board, color)
+    return given_up
+
+
+def _mover_win(line: PositionEval, white: bool) -> float:
+    win = float(win_percent(line.cp))
+    return win if white else 100 - win
+
+
+def assess_move(
+    board: chess.Board,
+    move: chess.Move,
+    lines: List[PositionEval],
+    offered: Optional[int] = None
+) -> Tuple[bool, bool]:
+    """
+    (only_move, sacrifice) for `move` in `board` from its MultiPV lines.
+    
+    Only move: the move is the best line and the second line leaves the
+    mover ONLY_MOVE_WIN_GAP win% worse. Sacrifice: the move leaves
+    BRILLIANT_MIN_SACRIFICE en prise (`offered`, SEE; computed if not given)
+    or its line gives up that much (material_given_up), while the mover was
+    not already winning easily and is not worse off after it.
+    """
+    lines = [line for line in lines if line.cp is not None and line.pv]
+    if not lines:
+        return False, False
+    white = board.turn == chess.WHITE
+    best = _mover_win(lines[0], white)
+    
+    only_move = (
+        len(lines) >= 2 and lines[0].pv[0] == move.uci()
+        and best - _mover_win(lines[1], white) >= ONLY_MOVE_WIN_GAP
+    )
+    
+    played = next((line for line in lines if line.pv[0] == move.uci()), None)
+    if offered is None:
+        offered = ExchangeEvaluator(board).material_offered(move)
+    sacrifice = (
+        played is not None
+        and best <= SACRIFICE_MAX_WIN_BEFORE
+        and _mover_win(played, white) >= SACRIFICE_MIN_WIN_AFTER
+        and (
+            offered >= BRILLIANT_MIN_SACRIFICE
+            or material_given_up(board, played.pv) >= BRILLIANT_MIN_SACRIFICE
+        )
+    )
+    return only_move, sacrifice
+
+
+def select_refinement_plies(results: List[MoveAnalysis], positions: List[chess.Board], limit: int) -> List[int]:
+    """
+    Plies worth a MultiPV look, at most `limit`: moves losing at most
+    REFINED_MAX_CP_LOSS (known evals, not book, not the only legal move),
+    ranked by whether they already look like a sacrifice (material en
+    prise by SEE, or given up along the stored line),
+    then the eval swing of the opponent's previous move (a chance to
+    punish it), then whether they check or capture.
+    
+    Returns:
+        Plies in game order
+    """
+    if limit <= 0:
+        return []
+    ranked = []
+    for r in results:
+        if r.classification == "book" or r.eval_before is None or r.eval_after is None:
+            continue
+        board = positions[r.ply - 1]
+        loss = (r.eval_before - r.eval_after) * (1 if board.turn == chess.WHITE else -1)
+        if loss > REFINED_MAX_CP_LOSS or has_single_move(board):
+            continue
+        move = positions[r.ply].peek()
+        looks_like_sacrifice = (
+            (r.material_offered or 0) >= BRILLIANT_MIN_SACRIFICE
+            or material_given_up(board, [move.uci()] + r.pv) >= BRILLIANT_MIN_SACRIFICE
+        )
+        previous = results[r.ply - 2] if r.ply >= 2 else None
+        swing = (
+            abs(previous.eval_after - previous.eval_before)
+            if previous is not None and previous.eval_before is not None and previous.eval_after is not None
+            else 0
+        )
+        forcing = board.is_capture(move) or board.gives_check(move)
+        ranked.append((looks_like_sacrifice, min(swing, 1000), forcing, -r.ply))
+    ranked.sort(reverse=True)
+    return sorted(-entry[-1] for entry in ranked[:limit])
+
+
+def select_critical_plies(
+    results: List[MoveAnalysis],
+    white_moved: List[bool],
+    limit: int
+) -> List[int]:
+    """
+    Pick the plies whose shallow classification is least certain.
+    
+    Args:
+        results: Provisional (shallow) move analyses
+        white_moved: Per ply, whether White made the move
+        limit: Max plies to return
+        
+    Returns:
+        Ply numbers, most uncertain first
+    """
+    scored = []
+    for r in results:
+        if r.classification == "book":
+            continue
+        
+        if r.eval_before is None or r.eval_after is None:
+            scored.append((float("inf"), r.ply))
+            continue
+        
+        # A mate appearing, disappearing or changing hands
+        if (r.mate_before is None) != (r.mate_after is None) or \
+                (r.mate_before is not None and (r.mate_before > 0) != (r.mate_after > 0)):
+            scored.append((10000, r.ply))
+            continue
+        
+        # Decided either way: the classification can't move
+        if r.mate_before is not None:
+            continue
+        
+        swing = abs(r.eval_after - r.eval_before)
+        cp_loss = (r.eval_before - r.eval_after) if white_moved[r.ply - 1] else (r.eval_after - r.eval_before)
+        near_boundary = min(abs(cp_loss - b) for b in CLASSIFICATION_BOUNDARIES) <= BOUNDARY_MARGIN
+        
+        if swing >= CRITICAL_SWING or near_boundary:
+            scored.append((swing, r.ply))
+    
+    scored.sort(key=lambda x: -x[0])
+    return [ply for _, ply in scored[:limit]]
+
+
+def reusable_evals(
+    previous_results: List[Dict[str, Any]],
+    depth: int,
+    engine_name: Optional[str],
+    budget: Optional[int] = None
+) -> List[Optional[PositionEval]]:
+    """
+    Per-position evals recoverable from stored analysis_results.
+    
+    Args:
+        previous_results: Stored move analysis dictionaries (one per ply)
+        depth: Minimum depth an eval must have been searched at
+        engine_name: Only evals from this engine (name and version) qualify
+        budget: Node budget of a deterministic run: only evals searched with
+                exactly this budget qualify (depth is then ignored)
+        
+    Returns:
+        List indexed by position (0 = starting position, always None) with
+        a PositionEval where the stored result qualifies, else None
+    """
+    reused: List[Optional[PositionEval]] = [None] * (len(previous_results) + 1)
+    if engine_name is None:
+        return reused
+    for r in previous_results:
+        ply = r.get("ply")
+        if not ply or ply > len(previous_results):
+            continue
+        if r.get("engine") != engine_name or r.get("budget") != budget:
+            continue
+        if not budget and (r.get("depth") or 0) < depth:
+            continue
+        if r.get("eval_after") is None and r.get("mate_after") is None:
+            continue
+        reused[ply] = PositionEval(
+            r["eval_after"], r.get("mate_after"), r.get("pv", []),
+            depth=r.get("depth"), nodes=r.get("nodes"), engine=engine_name, budget=budget
+        )
+    return reused
+
+
+def move_analysis_to_dict(r: MoveAnalysis) -> Dict[str, Any]:
+    """Serialize a MoveAnalysis to the dict stored in analysis_results"""
+    return {
+        "ply": r.ply,
+        "move": r.move,
+        "eval_before": r.eval_before,
+        "eval_after": r.eval_after,
+        "mate_before": r.mate_before,
+        "mate_after": r.mate_after,
+        "best_move": r.best_move,
+        "classification": r.classification,
+        "pv": r.pv,
+        "depth": r.depth,
+        "nodes": r.nodes,
+        "engine": r.engine,
+        "budget": r.budget,
+        "only_move": r.only_move,
+        "sacrifice": r.sacrifice,
+        "material_offered": r.material_offered,
+        "white": r.white,
+        "motifs": r.motifs
+    }
+
+
+@asynccontextmanager
+async def leased_analyzer(
+    engines: int = DEFAULT_ENGINES_PER_GAME,
+    use_pool: bool = True,
+    **analyzer_options
+):
+    """
+    StockfishAnalyzer on a pool engine (plus up to `engines - 1` idle spares),
+    or on a private engine started on demand if there is no pool or
+    `use_pool` is False. Remote engine workers are used when reachable. Yields (analyzer, extra_engines); leased engines
+    (or their watchdog replacements) go back to the pool afterwards.
+    """
+    pool = get_analysis_pool() if use_pool else None
+    
+    if pool is None:
+        analyzer = StockfishAnalyzer(**analyzer_options)
+        try:
+            yield analyzer, []
+        finally:
+            await analyzer.stop()
+        return
+    
+    # Lease a warm engine from the shared pool
+    engine = await pool.acquire()
+    extra = []
+    for _ in range(max(0, engines - 1)):
+        spare = pool.try_acquire()
+        if spare is None:
+            break
+        extra.append(spare)
+    
+    analyzer = StockfishAnalyzer(engine=engine, pool=pool, **analyzer_options)
+    try:
+        yield analyzer, extra
+    finally:
+        await analyzer.restore_engine_options()
+        # Hand back the engines now in use (replacements for any restarted ones)
+        for leased in [engine] + extra:
+            pool.release(analyzer.current_engine(leased))
+
+
+async def evaluate_batch(
+    boards: List[chess.Board],
+    depth: int = 16,
+    time_limit: float = 0.5,
+    nodes: Optional[int] = None,
+    engines: Optional[int] = None,
+    on_result = None
+) -> List[PositionEval]:
+    """
+    Evaluate many independent positions.
+    
+    Identical positions (same Zobrist key) are evaluated once. Tablebase and
+    eval cache answers are used first; the rest are spread over pool engines
+    (the first is waited for, extra ones only taken if idle) and no engine
+    is leased if nothing is left to search.
+    
+    Args:
+        boards: Positions to evaluate
+        depth: Search depth per position
+        time_limit: Time cap per position in seconds
+        nodes: Node budget per position (deterministic mode, replaces depth/time)
+        engines: Max pool engines to use (default and cap: BATCH_POOL_SHARE
+                 of the pool, at least one)
+        on_result: Optional async callback(index, PositionEval), called in
+                   input order as soon as each result is available
+        
+    Returns:
+        One PositionEval per input board, in input order
+    """
+    unique: Dict[str, int] = {}
+    positions: List[chess.Board] = []
+    slots: List[int] = []
+    for board in boards:
+        key = position_key(board)
+        if key not in unique:
+            unique[key] = len(positions)
+            positions.append(board)
+        slots.append(unique[key])
+    
+    evals: List[Optional[PositionEval]] = [None] * len(positions)
+    ready = [asyncio.Event() for _ in positions]
+    
+    lookup = StockfishAnalyzer(depth=depth, nodes=nodes)
+    for i, board in enumerate(positions):
+        evals[i] = await lookup.lookup_position(board)
+        if evals[i] is not None:
+            ready[i].set()
+    indices = [i for i, e in enumerate(evals) if e is None]
+    
+    async def emit(analyzer: StockfishAnalyzer):
+        for index, slot in enumerate(slots):
+            await ready[slot].wait()
+            analyzer._raise_failure()
+            if on_result:
+                await on_result(index, evals[slot])
+    
+    if not indices:
+        await emit(lookup)
+        return [evals[slot] for slot in slots]
+    
+    pool = get_analysis_pool()
+    share = max(1, int(pool.size * BATCH_POOL_SHARE)) if pool is not None else 1
+    engines = min(engines, share) if engines is not None else share
+    
+    async with leased_analyzer(min(engines, len(indices)), depth=depth, nodes=nodes) as (analyzer, extra):
+        await analyzer.start()
+        tasks = analyzer._start_workers(positions, indices, evals, ready, time_limit, depth, extra)
+        try:
+            await emit(analyzer)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    return [evals[slot] for slot in slots]
+
+
+def starts_from_standard_position(pgn: str) -> bool:
+    """True if the PGN's game starts from the standard starting position"""
+    headers = chess.pgn.read_headers(io.StringIO(pgn))
+    if headers is None:
+        return False
+    return headers.get("FEN", chess.STARTING_FEN) == chess.STARTING_FEN and \
+        headers.get("Variant", "Standard").lower() in ("standard", "chess")
+
+
+def white_moves_first(pgn: str) -> bool:
+    """True if White makes the first move of the PGN's game (its FEN header, if any)"""
+    headers = chess.pgn.read_headers(io.StringIO(pgn or ""))
+    try:
+        return headers is None or chess.Board(headers.get("FEN", chess.STARTING_FEN)).turn == chess.WHITE
+    except ValueError:
+        return True
+
+
+async def analyze_game_pgn(
+    pgn: str,
+    depth: int = 16,
+    engines: int = DEFAULT_ENGINES_PER_GAME,
+    on_move = None,
+    adaptive: bool = False,
+    on_provisional = None,
+    known_evals: Optional[List[Optional[Dict[str, Any]]]] = None,
+    previous_results: Optional[List[Dict[str, Any]]] = None,
+    nodes: Optional[int] = None,
+    refine_plies: int = 0
+) -> List[Dict[str, Any]]:
     """
     Convenience function to analyze a game PGN.
     
     Args:
         pgn: PGN string
         depth: Analysis depth
+        engines: Max pool engines to spread the game across. The first is
+                 waited for; extra ones are only taken if currently idle.
+        on_move: Optional async callback(dict) receiving each move's analysis
+                 dictionary as soon as it is computed
+        adaptive: Shallow sweep first, then `depth` only on critical plies
+        on_provisional: Optional async callback(List[dict]) receiving the
+                        sweep results in adaptive mode
+        known_evals: Optional per-position {"cp", "mate"} dicts (White's
+                     perspective, index 0 = starting position, None = unknown)
+                     used instead of searching, e.g. Lichess server analysis
+        previous_results: Stored analysis_results of an earlier run. Positions
+                          already searched at least `depth` deep by the same
+                          engine are reused; only the rest are searched.
+        nodes: Node budget per position for deterministic, reproducible
+               results (replaces `depth`; adaptive mode is not used)
+        refine_plies: MultiPV second pass on this many critical plies to find
+                      only moves ("great") and sacrifices ("brilliant")
         
     Returns:
         List of move analysis dictionaries
     """
-    analyzer = StockfishAnalyzer(depth=depth)
+    known = [
+        PositionEval(e["cp"], e.get("mate"), e.get("pv", []), engine="lichess") if e is not None else None
+        for e in known_evals
+    ] if known_evals else None
+    if known and known[0] is None and starts_from_standard_position(pgn):
+        # Lichess never evaluates the starting position
+        known[0] = PositionEval(START_POSITION_CP, None, engine="lichess")
+    # Every position already evaluated (and no MultiPV pass): don't hold a
+    # pool engine for it (the private analyzer below only starts an engine
+    # if a search is left)
+    fully_known = known is not None and all(e is not None for e in known) and not refine_plies
     
-    try:
-        results = await analyzer.analyze_game(pgn)
-        return [
-            {
-                "ply": r.ply,
-                "move": r.move,
-                "eval_before": r.eval_before,
-                "eval_after": r.eval_after,
-                "mate_before": r.mate_before,
-                "mate_after": r.mate_after,
-                "best_move": r.best_move,
-                "classification": r.classification,
-                "pv": r.pv
-            }
-            for r in results
-        ]
-    finally:
-        await analyzer.stop()
+    async def forward_move(r: MoveAnalysis):
+        await on_move(move_analysis_to_dict(r))
+    
+    move_callback = forward_move if on_move else None
+    
+    async def run(analyzer: StockfishAnalyzer, extra: List[chess.engine.UciProtocol]) -> List[MoveAnalysis]:
+        nonlocal known
+        # Nothing left to search when every position is known
+        if previous_results and not fully_known:
+            # Reuse needs the engine's version
+            engine_name = await analyzer.resolve_engine_name()
+            reused = reusable_evals(previous_results, depth, engine_name, budget=nodes)
+            count = sum(1 for e in reused if e is not None)
+            if count:
+                print(f"[Stockfish] Reusing {count} stored evals "
+                      f"({f'{nodes} nodes' if nodes else f'depth >= {depth}'}, {engine_name})")
+                known = [
+                    r if r is not None else (known[i] if known and i < len(known) else None)
+                    for i, r in enumerate(reused)
+                ]
+        
+        if not adaptive or nodes:
+            return await analyzer.analyze_game(
+                pgn, engines=extra, on_move=move_callback, known_evals=known, refine_plies=refine_plies
+            )
+        
+        async def forward_provisional(provisional: List[MoveAnalysis]):
+            await on_provisional([move_analysis_to_dict(r) for r in provisional])
+        
+        results = await analyzer.analyze_game_adaptive(
+            pgn, engines=extra, on_provisional=forward_provisional if on_provisional else None,
+            known_evals=known, refine_plies=refine_plies
+        )
+        if move_callback:
+            for r in results:
+                await move_callback(r)
+        return results
+    
+    async with leased_analyzer(engines, use_pool=not fully_known, depth=depth, nodes=nodes) as (analyzer, extra):
+        results = await run(analyzer, extra)
+    
+    return [move_analysis_to_dict(r) for r in results]
@@ -0,0 +1,172 @@
+"""
+Syzygy Tablebase Probing
+Exact results for low-material positions from local Syzygy tablebase files.
+
+Positions covered by the tablebase (no castling rights, few enough pieces)
+are answered from WDL/DTZ probes instead of an engine search, mapped into
+the analyzer's (cp, mate, pv) fields. Disabled unless SYZYGY_PATH points at
+one or more directories of .rtbw/.rtbz files (separated by os.pathsep).
+"""
+
+import os
+from typing import Optional, List, Tuple
+
+import chess
+import chess.engine
+import chess.syzygy
+
+
+# Tablebase directories (empty = disabled)
+SYZYGY_PATH = os.getenv("SYZYGY_PATH", "")
+
+# Score for a tablebase win, minus the distance to zeroing (DTZ, capped) so
+# faster wins score higher. Sits just below mate scores (10000 - N), within
+# classification.FORCED_WIN_CP, so going from a found mate to a tablebase win
+# counts as no centipawn loss.
+TABLEBASE_WIN_CP = 9900
+MAX_DTZ_PENALTY = 100
+
+# Moves of the tablebase line returned as PV (each move costs a probe per legal move)
+MAX_TABLEBASE_PV = 5
+
+
+class Tablebase:
+    """
+    Syzygy tablebase reader.
+    """
+
+    def __init__(self, path: str = SYZYGY_PATH):
+        """
+        Open the tablebase directories in `path` (os.pathsep separated).
+        """
+        self.paths = [p for p in path.split(os.pathsep) if p]
+        self._tablebase: Optional[chess.syzygy.Tablebase] = None
+        self.max_pieces = 0
+        self.hits = 0
+
+        if not self.paths:
+            return
+
+        tablebase = chess.syzygy.Tablebase()
+        for directory in self.paths:
+            if not os.path.isdir(directory):
+                print(f"[Tablebase] Directory not found: {directory}")
+                continue
+            tablebase.add_directory(directory)
+
+        # Largest piece count with both WDL tables present (e.g. 5 for a 3-4-5 set)
+        pieces = [len(name.replace("v", "")) for name in tablebase.wdl]
+        if not pieces:
+            print(f"[Tablebase] No Syzygy tables found in {path}")
+            tablebase.close()
+            return
+
+        self._tablebase = tablebase
+        self.max_pieces = max(pieces)
+        print(f"[Tablebase] Loaded {len(tablebase.wdl)} WDL tables (up to {self.max_pieces} pieces)")
+
+    @property
+    def available(self) -> bool:
+        return self._tablebase is not None
+
+    def covers(self, board: chess.Board) -> bool:
+        """True if the position can be probed"""
+        return (
+            self._tablebase is not None
+            and not board.castling_rights
+            and chess.popcount(board.occupied) <= self.max_pieces
+            and not board.is_game_over()
+        )
+
+    def _probe(self, board: chess.Board) -> Optional[Tuple[int, int]]:
+        """(wdl, dtz) for the side to move, or None if a table is missing"""
+        try:
+            return self._tablebase.probe_wdl(board), self._tablebase.probe_dtz(board)
+        except (KeyError, chess.syzygy.MissingTableError):
+            return None
+
+    def _best_move(self, board: chess.Board) -> Optional[chess.Move]:
+        """
+        Move keeping the best WDL: among wins the quickest to zero the
+        50-move counter, among losses the slowest.
+        """
+        best, best_key = None, None
+        for move in board.legal_moves:
+            board.push(move)
+            try:
+                if board.is_checkmate():
+                    key = (3, 0)
+                else:
+                    probe = self._probe(board)
+                    if probe is None:
+                        continue
+                    wdl, dtz = -probe[0], probe[1]
+                    zeroing = board.halfmove_clock == 0
+                    if wdl > 0:
+                        key = (wdl, 1 if zeroing else 0, -abs(dtz))
+                    else:
+                        key = (wdl, 0, abs(dtz))
+            finally:
+                board.pop()
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best
+
+    def probe(self, board: chess.Board) -> Optional[Tuple[Optional[int], Optional[int], List[str]]]:
+        """
+        Probe a position.
+
+        Returns:
+            (centipawn_score, mate_in, principal_variation) from White's
+            perspective like StockfishAnalyzer.analyze_position, or None if
+            the position is not covered. Wins score +/-(TABLEBASE_WIN_CP - |DTZ|),
+            DTZ capped at MAX_DTZ_PENALTY;
+            cursed wins and blessed losses (drawn under the 50-move rule) score 0.
+            mate_in is left None (DTZ is not a distance to mate).
+        """
+        if not self.covers(board):
+            return None
+
+        probe = self._probe(board)
+        if probe is None:
+            return None
+        wdl, dtz = probe
+
+        if wdl == 2:
+            cp = TABLEBASE_WIN_CP - min(abs(dtz), MAX_DTZ_PENALTY)
+        elif wdl == -2:
+            cp = -(TABLEBASE_WIN_CP - min(abs(dtz), MAX_DTZ_PENALTY))
+        else:
+            cp = 0
+        if board.turn == chess.BLACK:
+            cp = -cp
+
+        # Follow best moves while the position stays decided
+        pv: List[str] = []
+        line = board.copy(stack=False)
+        while len(pv) < MAX_TABLEBASE_PV and self.covers(line):
+            move = self._best_move(line)
+            if move is None:
+                break
+            pv.append(move.uci())
+            line.push(move)
+
+        self.hits += 1
+        return cp, None, pv
+
+    def close(self):
+        if self._tablebase is not None:
+            self._tablebase.close()
+            self._tablebase = None
+
+
+# Singleton instance
+_tablebase: Optional[Tablebase] = None
+
+
+def get_tablebase() -> Tablebase:
+    """Get or create the tablebase singleton (unavailable if SYZYGY_PATH is unset)"""
+    global _tablebase
+    if _tablebase is None:
+        _tablebase = Tablebase()
+    return _tablebase
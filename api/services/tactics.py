@@ -1,10 +1,179 @@
 """
 Tactics Detection Service
 Detects tactical motifs using python-chess bitboard operations
+
+Sliding-piece motifs work on whole bitboards: a slider's attacks come from
+python-chess's occupancy-indexed rank/file/diagonal tables, and removing
+its first blockers from the occupancy gives the pieces it x-rays (the
+second piece on each line). With the precomputed masks below, a pin,
+skewer, x-ray or discovered attack costs a few integer operations per
+slider instead of a walk along every ray.
 """
 
 import chess
-from typing import List, Dict, Any, Set
+from typing import List, Iterator, Tuple, Dict, Optional
+
+from api.services.see import ExchangeEvaluator
+
+
+# Motif values (the king is always a worthwhile target)
+PIECE_VALUES = {
+    chess.PAWN: 1,
+    chess.KNIGHT: 3,
+    chess.BISHOP: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+    chess.KING: 100
+}
+
+# Squares strictly between two aligned squares (0 if not on a common line)
+BB_BETWEEN = [[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES]
+# Squares a rook / bishop on an empty board reaches from each square
+BB_ORTHOGONAL = [chess.BB_RANK_ATTACKS[sq][0] | chess.BB_FILE_ATTACKS[sq][0] for sq in chess.SQUARES]
+BB_DIAGONAL = [chess.BB_DIAG_ATTACKS[sq][0] for sq in chess.SQUARES]
+
+
+def slider_attacks(square: chess.Square, piece_type: chess.PieceType, occupied: int) -> int:
+    """Squares a bishop, rook or queen on `square` attacks given `occupied`"""
+    attacks = 0
+    if piece_type != chess.ROOK:
+        attacks |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    if piece_type != chess.BISHOP:
+        attacks |= (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+                    | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    return attacks
+
+
+def xray_lines(
+    board: chess.Board,
+    color: chess.Color,
+    front_mask: int = chess.BB_ALL,
+    behind_mask: int = chess.BB_ALL,
+    slider_mask: int = chess.BB_ALL
+) -> Iterator[Tuple[chess.Square, chess.Square, chess.Square]]:
+    """
+    (slider, front, behind) for every line where a `color` slider (on
+    slider_mask) hits a piece (front, in front_mask) with another piece
+    (behind, in behind_mask) next behind it
+    """
+    occupied = board.occupied
+    for piece_type in (chess.BISHOP, chess.ROOK, chess.QUEEN):
+        for slider in chess.scan_forward(board.pieces_mask(piece_type, color) & slider_mask):
+            direct = slider_attacks(slider, piece_type, occupied)
+            if not direct & front_mask:
+                continue
+            behind = slider_attacks(slider, piece_type, occupied & ~direct) & ~direct & occupied & behind_mask
+            for square in chess.scan_forward(behind):
+                front = BB_BETWEEN[slider][square] & occupied
+                if front & front_mask:
+                    yield slider, chess.msb(front), square
+
+
+def _value(board: chess.Board, square: chess.Square) -> int:
+    return PIECE_VALUES[board.piece_type_at(square)]
+
+
+def pinned_pieces(board: chess.Board, color: chess.Color, relative: bool = False) -> int:
+    """
+    Bitboard of `color` pieces pinned by enemy sliders: to their king, or
+    with `relative` also to a more valuable piece behind them.
+    """
+    own = board.occupied_co[color]
+    king = board.kings & own
+    if not relative:
+        # Only sliders on a line with the king can pin to it
+        king_square = chess.msb(king) if king else None
+        if king_square is None:
+            return 0
+        enemy = board.occupied_co[not color]
+        snipers = (
+            (board.rooks | board.queens) & BB_ORTHOGONAL[king_square]
+            | (board.bishops | board.queens) & BB_DIAGONAL[king_square]
+        ) & enemy
+        pinned = 0
+        for sniper in chess.scan_forward(snipers):
+            blockers = BB_BETWEEN[sniper][king_square] & board.occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+        return pinned
+    
+    pinned = 0
+    for _, front, behind in xray_lines(board, not color, own & ~king, own):
+        if chess.BB_SQUARES[behind] & king or _value(board, behind) > _value(board, front):
+            pinned |= chess.BB_SQUARES[front]
+    return pinned
+
+
+def skewered_pieces(board: chess.Board, color: chess.Color) -> int:
+    """
+    Bitboard of `color` pieces exposed by a skewer: an enemy slider attacks
+    a more valuable `color` piece (or the king) with this one behind it.
+    """
+    own = board.occupied_co[color]
+    skewered = 0
+    for _, front, behind in xray_lines(board, not color, own & ~board.pawns, own & ~board.kings):
+        if _value(board, front) > _value(board, behind):
+            skewered |= chess.BB_SQUARES[behind]
+    return skewered
+
+
+def xray_defended(board: chess.Board, color: chess.Color) -> int:
+    """
+    Bitboard of `color` pieces a `color` slider defends through an enemy
+    piece (x-ray defence: recapturing once the enemy piece has moved or
+    captured along the line)
+    """
+    own = board.occupied_co[color]
+    defended = 0
+    for _, _, behind in xray_lines(board, color, board.occupied_co[not color], own):
+        defended |= chess.BB_SQUARES[behind]
+    return defended
+
+
+def attacked_squares(board: chess.Board, color: chess.Color) -> int:
+    """Union of every square attacked by `color` (pawns shifted all at once)"""
+    own = board.occupied_co[color]
+    occupied = board.occupied
+    pawns = board.pawns & own
+    if color == chess.WHITE:
+        attacks = ((pawns << 9) & ~chess.BB_FILE_A | (pawns << 7) & ~chess.BB_FILE_H) & chess.BB_ALL
+    else:
+        attacks = (pawns >> 7) & ~chess.BB_FILE_A | (pawns >> 9) & ~chess.BB_FILE_H
+    for square in chess.scan_forward(board.knights & own):
+        attacks |= chess.BB_KNIGHT_ATTACKS[square]
+    for square in chess.scan_forward(board.kings & own):
+        attacks |= chess.BB_KING_ATTACKS[square]
+    for square in chess.scan_forward((board.bishops | board.queens) & own):
+        attacks |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    for square in chess.scan_forward((board.rooks | board.queens) & own):
+        attacks |= (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+                    | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    return attacks
+
+
+def hanging_pieces(
+    board: chess.Board,
+    color: chess.Color,
+    exchange: Optional[ExchangeEvaluator] = None,
+    attacked: Optional[int] = None
+) -> int:
+    """
+    Bitboard of `color` pieces (king excepted) the opponent wins material
+    by capturing: undefended, or lost in the exchange on their square (SEE,
+    x-rays included). `exchange` shares SEE results for the position, and
+    `attacked` the squares the opponent attacks when already known.
+    """
+    if attacked is None:
+        attacked = attacked_squares(board, not color)
+    candidates = board.occupied_co[color] & ~board.kings & attacked
+    if not candidates:
+        return 0
+    exchange = exchange or ExchangeEvaluator(board)
+    hanging = 0
+    for square in chess.scan_forward(candidates):
+        if exchange.en_prise(square):
+            hanging |= chess.BB_SQUARES[square]
+    return hanging
 
 
 def detect_motifs(board: chess.Board, move: chess.Move) -> List[str]:
@@ -14,9 +183,10 @@ def detect_motifs(board: chess.Board, move: chess.Move) -> List[str]:
     Returns list of detected motifs:
     - fork: One piece attacking two+ valuable targets
     - pin: A piece is pinned to the king or more valuable piece
-    - hanging_piece: A piece can be captured for free or with positive exchange
+    - hanging_piece: A piece can be captured for free or wins the exchange (SEE)
     - discovery: Moving piece reveals an attack
     - skewer: Attack through a piece to one behind it
+    - xray: A slider defends a piece through an enemy piece
     """
     motifs = []
     
@@ -43,6 +213,12 @@ def detect_motifs(board: chess.Board, move: chess.Move) -> List[str]:
         discovery = detect_discovery(board, move)
         if discovery:
             motifs.append("discovery")
+        
+        # Check for skewers and x-rays
+        if detect_skewer(board):
+            motifs.append("skewer")
+        if detect_xray(board):
+            motifs.append("xray")
     
     finally:
         board.pop()
@@ -58,153 +234,339 @@ def detect_fork(board: chess.Board, move: chess.Move) -> bool:
     if not moved_piece:
         return False
     
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 100  # King is always a valid target
-    }
-    
-    attacker_value = piece_values.get(moved_piece.piece_type, 0)
-    
-    # Get all squares attacked by the moved piece
-    attacked_squares = board.attacks(move.to_square)
-    
-    # Count valuable targets
-    valuable_targets = 0
-    target_value_sum = 0
+    targets = board.attacks_mask(move.to_square) & board.occupied_co[not moved_piece.color]
+    if chess.popcount(targets) < 2:
+        return False
     
-    for square in attacked_squares:
-        target = board.piece_at(square)
-        if target and target.color != moved_piece.color:
-            target_value = piece_values.get(target.piece_type, 0)
-            if target_value >= attacker_value or target.piece_type == chess.KING:
-                valuable_targets += 1
-                target_value_sum += target_value
+    # Enemy pieces worth at least the attacker, and the king
+    attacker_value = PIECE_VALUES[moved_piece.piece_type]
+    valuable = board.kings
+    for piece_type, value in PIECE_VALUES.items():
+        if value >= attacker_value:
+            valuable |= board.pieces_mask(piece_type, not moved_piece.color)
     
-    # Fork exists if attacking 2+ valuable targets
-    return valuable_targets >= 2
+    return chess.popcount(targets & valuable) >= 2
 
 
-def detect_pin(board: chess.Board) -> bool:
+def detect_pin(board: chess.Board, relative: bool = False) -> bool:
     """
-    Detect if any piece is absolutely pinned (pinned to the king).
+    Detect if any piece is absolutely pinned (pinned to the king), or with
+    `relative` also pinned to a more valuable piece.
     """
-    for color in [chess.WHITE, chess.BLACK]:
-        king_square = board.king(color)
-        if king_square is None:
-            continue
-        
-        # Check all enemy sliding pieces
-        enemy_color = not color
-        
-        # Check for pins from rooks and queens (ranks/files)
-        for attacker_type in [chess.ROOK, chess.QUEEN]:
-            for attacker_square in board.pieces(attacker_type, enemy_color):
-                # Check if there's a ray between attacker and king
-                ray = chess.SquareSet.ray(attacker_square, king_square)
-                if not ray:
-                    continue
-                
-                # Count pieces in between
-                blocking_pieces = []
-                for sq in ray:
-                    if sq in [attacker_square, king_square]:
-                        continue
-                    piece = board.piece_at(sq)
-                    if piece:
-                        blocking_pieces.append((sq, piece))
-                
-                # Pin exists if exactly one friendly piece is blocking
-                if len(blocking_pieces) == 1:
-                    sq, piece = blocking_pieces[0]
-                    if piece.color == color:
-                        return True
-        
-        # Check for pins from bishops and queens (diagonals)
-        for attacker_type in [chess.BISHOP, chess.QUEEN]:
-            for attacker_square in board.pieces(attacker_type, enemy_color):
-                ray = chess.SquareSet.ray(attacker_square, king_square)
-                if not ray:
-                    continue
-                
-                blocking_pieces = []
-                for sq in ray:
-                    if sq in [attacker_square, king_square]:
-                        continue
-                    piece = board.piece_at(sq)
-                    if piece:
-                        blocking_pieces.append((sq, piece))
-                
-                if len(blocking_pieces) == 1:
-                    sq, piece = blocking_pieces[0]
-                    if piece.color == color:
-                        return True
-    
-    return False
+    return any(pinned_pieces(board, color, relative) for color in chess.COLORS)
+
+
+def detect_skewer(board: chess.Board) -> bool:
+    """
+    Detect if a slider attacks a valuable piece with a lesser one behind it.
+    """
+    return any(skewered_pieces(board, color) for color in chess.COLORS)
+
+
+def detect_xray(board: chess.Board) -> bool:
+    """
+    Detect if a slider defends a friendly piece through an enemy piece.
+    """
+    return any(xray_defended(board, color) for color in chess.COLORS)
 
 
 def detect_hanging_pieces(board: chess.Board) -> bool:
     """
-    Detect if any piece is hanging (undefended and attacked).
-    Uses simplified static exchange evaluation.
-    """
-    for color in [chess.WHITE, chess.BLACK]:
-        for piece_type in [chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT, chess.PAWN]:
-            for square in board.pieces(piece_type, color):
-                # Check if piece is attacked
-                if not board.is_attacked_by(not color, square):
-                    continue
-                
-                # Check if piece is defended
-                if board.is_attacked_by(color, square):
-                    # Could still be hanging if attacker is less valuable
-                    # Simplified: just check if it's defended at all
-                    continue
-                
-                # Undefended and attacked = hanging
-                return True
-    
-    return False
+    Detect if any piece is hanging: undefended and attacked, or lost to
+    the exchange on its square (e.g. a defended rook attacked by a pawn).
+    """
+    return any(hanging_pieces(board, color) for color in chess.COLORS)
 
 
 def detect_discovery(board: chess.Board, move: chess.Move) -> bool:
     """
     Detect if moving a piece revealed an attack from a sliding piece.
     """
-    # Get the piece that was on the from-square before the move
+    moved_piece = board.piece_at(move.to_square)
+    if not moved_piece:
+        return False
+    
+    color = moved_piece.color
     from_square = move.from_square
-    to_square = move.to_square
+    occupied = board.occupied
+    before = occupied | chess.BB_SQUARES[from_square]
+    enemy = board.occupied_co[not color]
     
-    # Check if any friendly sliding piece is now attacking through the vacated square
-    moved_piece = board.piece_at(to_square)
-    if not moved_piece:
+    # Friendly sliders on a line through the vacated square (the moved piece excepted)
+    sliders = (
+        (board.rooks | board.queens) & BB_ORTHOGONAL[from_square]
+        | (board.bishops | board.queens) & BB_DIAGONAL[from_square]
+    ) & board.occupied_co[color] & ~chess.BB_SQUARES[move.to_square]
+    
+    for slider in chess.scan_forward(sliders):
+        # Only a clear line up to the vacated square reveals anything
+        if BB_BETWEEN[slider][from_square] & occupied:
+            continue
+        piece_type = board.piece_type_at(slider)
+        revealed = slider_attacks(slider, piece_type, occupied) & ~slider_attacks(slider, piece_type, before)
+        if revealed & enemy:
+            return True
+    
+    return False
+
+
+# Move-list motif tagging (the pipeline stage run after engine evaluation)
+
+# Plies whose motifs are the ones they allow (the opponent's best reply)
+# rather than the ones they create
+ALLOWING_CLASSIFICATIONS = ("blunder", "mistake")
+
+
+def line_targets(
+    board: chess.Board,
+    color: chess.Color,
+    slider_mask: int = chess.BB_ALL,
+    king_skewers: bool = True
+) -> Tuple[int, int]:
+    """
+    (pinned, skewered) bitboards of `color` pieces in one pass over the
+    x-ray lines of enemy sliders on slider_mask: pinned_pieces(relative=True)
+    and skewered_pieces together. Without `king_skewers`, pieces behind the
+    king (a check, which wins nothing when it mates) don't count as skewered.
+    """
+    own = board.occupied_co[color]
+    king = board.kings & own
+    pinned = skewered = 0
+    for _, front, behind in xray_lines(board, not color, own, own, slider_mask):
+        if chess.BB_SQUARES[front] & king:
+            if king_skewers:
+                skewered |= chess.BB_SQUARES[behind]
+        elif chess.BB_SQUARES[behind] & king:
+            pinned |= chess.BB_SQUARES[front]
+        else:
+            front_value, behind_value = _value(board, front), _value(board, behind)
+            if behind_value > front_value:
+                pinned |= chess.BB_SQUARES[front]
+            elif front_value > behind_value:
+                skewered |= chess.BB_SQUARES[behind]
+    return pinned, skewered
+
+
+def is_back_rank_mate(board: chess.Board) -> bool:
+    """Checkmate by a rook or queen along the mated king's back rank"""
+    back_rank = chess.BB_RANK_1 if board.turn == chess.WHITE else chess.BB_RANK_8
+    heavy = (board.rooks | board.queens) & board.occupied_co[not board.turn]
+    if not heavy & back_rank or not board.kings & board.occupied_co[board.turn] & back_rank:
+        return False
+    if not board.checkers_mask() & back_rank & heavy:
         return False
+    return board.is_checkmate()
+
+
+def _reach(piece_type: chess.PieceType, color: chess.Color, square: chess.Square) -> int:
+    """Squares a `color` piece of `piece_type` on `square` attacks on an empty board"""
+    if piece_type == chess.PAWN:
+        return chess.BB_PAWN_ATTACKS[color][square]
+    if piece_type == chess.KNIGHT:
+        return chess.BB_KNIGHT_ATTACKS[square]
+    if piece_type == chess.KING:
+        return chess.BB_KING_ATTACKS[square]
+    reach = 0
+    if piece_type != chess.ROOK:
+        reach |= BB_DIAGONAL[square]
+    if piece_type != chess.BISHOP:
+        reach |= BB_ORTHOGONAL[square]
+    return reach
+
+
+def affected_squares(before: chess.Board, after: chess.Board, move: chess.Move) -> int:
+    """
+    Squares whose attackers (x-rays included) `move` can change: its two
+    squares, what the moved and captured pieces reach, and the lines through
+    the two squares that other sliders stand on. SEE on any other square is
+    the same on either side of the move.
+    """
+    if before.is_castling(move) or before.is_en_passant(move):
+        return chess.BB_ALL
+    from_square, to_square = move.from_square, move.to_square
+    affected = chess.BB_SQUARES[from_square] | chess.BB_SQUARES[to_square]
+    mover = before.turn
+    affected |= (_reach(before.piece_type_at(from_square), mover, from_square)
+                 | _reach(after.piece_type_at(to_square), mover, to_square))
+    captured = before.piece_type_at(to_square)
+    if captured:
+        affected |= _reach(captured, not mover, to_square)
+    
+    others = before.occupied & ~chess.BB_SQUARES[from_square] & ~chess.BB_SQUARES[to_square]
+    orthogonal = (before.rooks | before.queens) & others
+    diagonal = (before.bishops | before.queens) & others
+    for square in (from_square, to_square):
+        if orthogonal & BB_ORTHOGONAL[square]:
+            affected |= BB_ORTHOGONAL[square]
+        if diagonal & BB_DIAGONAL[square]:
+            affected |= BB_DIAGONAL[square]
+    return affected
+
+
+def new_line_targets(
+    before: chess.Board,
+    after: chess.Board,
+    move: chess.Move,
+    king_skewers: bool = True
+) -> Tuple[int, int]:
+    """
+    (pinned, skewered) pieces of the side to move in `after` that `move`
+    newly pinned or skewered (see line_targets for `king_skewers`). Only
+    sliders on a line through the move's squares can have gained a pin or
+    skewer, so only they are looked at.
+    """
+    color = after.turn
+    if before.is_castling(move):
+        sliders = chess.BB_ALL
+    else:
+        sliders = chess.BB_SQUARES[move.from_square] | chess.BB_SQUARES[move.to_square]
+        for square in (move.from_square, move.to_square):
+            sliders |= BB_ORTHOGONAL[square] | BB_DIAGONAL[square]
+    pinned, skewered = line_targets(after, color, sliders, king_skewers)
+    if not pinned and not skewered:
+        return 0, 0
+    pinned_before, skewered_before = line_targets(before, color, sliders, king_skewers)
+    return pinned & ~pinned_before, skewered & ~skewered_before
+
+
+def move_motifs(
+    before: chess.Board,
+    after: chess.Board,
+    move: chess.Move,
+    hanging: bool = False
+) -> List[str]:
+    """
+    Motifs `move` creates for the side that played it: a fork by the moved
+    piece, a discovered attack, enemy pieces newly pinned or skewered, an
+    enemy piece newly hanging (`hanging`, worked out by the caller) and
+    back-rank mate. Works on the boards on either side of the move (no
+    push/pop); pins and the like already on the board are not credited to it.
+    A mating move skewers nothing through the king.
+    """
+    pinned, skewered = new_line_targets(before, after, move, king_skewers=not after.is_checkmate())
     
-    attacker_color = moved_piece.color
+    motifs = []
+    if detect_fork(after, move):
+        motifs.append("fork")
+    if pinned:
+        motifs.append("pin")
+    if skewered:
+        motifs.append("skewer")
+    if detect_discovery(after, move):
+        motifs.append("discovery")
+    if hanging:
+        motifs.append("hanging_piece")
+    if is_back_rank_mate(after):
+        motifs.append("back_rank")
+    return motifs
+
+
+class MotifTagger:
+    """
+    Motif-tagging stage over one replayed game.
     
-    for attacker_type in [chess.ROOK, chess.BISHOP, chess.QUEEN]:
-        for attacker_square in board.pieces(attacker_type, attacker_color):
-            if attacker_square == to_square:
-                continue
-            
-            # Check if the from_square was blocking an attack
-            ray = chess.SquareSet.ray(attacker_square, from_square)
-            if not ray:
+    `positions` are the boards the analysis already replayed (positions[0]
+    the start, positions[ply] the board after ply, with its move stack).
+    Each position's SEE results (exchange) are memoised and shared by the
+    two plies it borders and by material_offered. Pins and skewers are only
+    recomputed for the sliders a move can affect, and SEE only runs on
+    pieces it may have left hanging.
+    
+    A ply is tagged with the motifs it creates (plus "sacrifice" when the
+    MultiPV pass flagged it), except blunders and mistakes, which are
+    tagged with what they allow: pieces they leave hanging and the motifs
+    of the opponent's best reply (the first move of the PV after them).
+    """
+    
+    def __init__(self, positions: List[chess.Board]):
+        self.positions = positions
+        self._exchanges: Dict[int, ExchangeEvaluator] = {}
+    
+    def exchange(self, index: int) -> ExchangeEvaluator:
+        """SEE on positions[index], memoised for the game"""
+        if index not in self._exchanges:
+            self._exchanges[index] = ExchangeEvaluator(self.positions[index])
+        return self._exchanges[index]
+    
+    def material_offered(self, ply: int) -> int:
+        """Material (cp) the move of `ply` leaves en prise by SEE"""
+        return self.exchange(ply - 1).material_offered(self.positions[ply].peek())
+    
+    def newly_hanging(self, index: int, color: chess.Color) -> bool:
+        """
+        Whether positions[index] has a hanging `color` piece (hanging_pieces)
+        on a square that held no hanging `color` piece the position before.
+        Only squares the move can have changed the exchange on are looked at.
+        """
+        board = self.positions[index]
+        previous = self.positions[index - 1]
+        candidates = board.occupied_co[color] & ~board.kings & affected_squares(previous, board, board.peek())
+        if candidates:
+            candidates &= attacked_squares(board, not color)
+        if not candidates:
+            return False
+        for square in chess.scan_forward(candidates):
+            if not self.exchange(index).en_prise(square):
                 continue
-            
-            # Find what's at the end of the ray (beyond from_square)
-            for sq in ray:
-                if sq == attacker_square or sq == from_square:
-                    continue
-                
-                target = board.piece_at(sq)
-                if target and target.color != attacker_color:
-                    # Found a discovered attack
-                    return True
-                elif target:
-                    break  # Blocked by another piece
+            if not (previous.occupied_co[color] & chess.BB_SQUARES[square]
+                    and self.exchange(index - 1).en_prise(square)):
+                return True
+        return False
     
-    return False
+    def tag(
+        self,
+        ply: int,
+        classification: str,
+        reply: Optional[str] = None,
+        sacrifice: bool = False
+    ) -> List[str]:
+        """
+        Motifs of one ply.
+        
+        Args:
+            ply: Ply number (1-based)
+            classification: The move's classification
+            reply: Opponent's best reply in UCI (used for blunders and mistakes)
+            sacrifice: The move was flagged as a sacrifice
+        """
+        before, after = self.positions[ply - 1], self.positions[ply]
+        mover, opponent = not after.turn, after.turn
+        # Nothing is left to capture once the game ends in mate
+        mate = after.is_checkmate()
+        
+        if classification not in ALLOWING_CLASSIFICATIONS:
+            motifs = move_motifs(before, after, after.peek(), not mate and self.newly_hanging(ply, opponent))
+            if sacrifice:
+                motifs.append("sacrifice")
+            return motifs
+        
+        motifs = ["hanging_piece"] if not mate and self.newly_hanging(ply, mover) else []
+        
+        try:
+            reply_move = chess.Move.from_uci(reply) if reply else None
+        except ValueError:
+            reply_move = None
+        if reply_move is not None and after.is_legal(reply_move):
+            replied = after.copy(stack=False)
+            replied.push(reply_move)
+            # Pieces left hanging are tagged above
+            for motif in move_motifs(after, replied, reply_move):
+                if motif not in motifs:
+                    motifs.append(motif)
+        return motifs
+    
+    def tag_all(
+        self,
+        classifications: List[str],
+        replies: Optional[List[Optional[str]]] = None,
+        sacrifices: Optional[List[bool]] = None
+    ) -> List[List[str]]:
+        """Motifs of every ply, in ply order (see tag)"""
+        return [
+            self.tag(
+                ply, classification,
+                replies[ply - 1] if replies is not None else None,
+                bool(sacrifices[ply - 1]) if sacrifices is not None else False
+            )
+            for ply, classification in enumerate(classifications, start=1)
+        ]
@@ -0,0 +1,79 @@
+"""
+Grandmaster Guard - Analysis Worker
+Standalone process that consumes the analysis job queue.
+
+Run alongside (or instead of) the in-API worker to scale analysis capacity
+independently of web workers:
+    python -m api.worker --concurrency 4
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from api.database import connect_db, close_db
+from api.services.engine_pool import start_engine_pool, stop_engine_pool
+from api.services.engine_workers import start_engine_workers, stop_engine_workers
+from api.services.analysis_queue import AnalysisWorker, create_queue_indexes
+from api.services.analysis_events import create_events_collection
+from api.services.opening_book import load_opening_book
+from api.routers.analysis import handle_analysis_job, handle_analysis_failure
+
+
+async def main(concurrency: int):
+    await connect_db()
+    await create_queue_indexes()
+    await create_events_collection()
+
+    try:
+        await load_opening_book()
+    except Exception as e:
+        print(f"⚠️ Opening book not loaded, book moves fall back to move number: {e}")
+
+    try:
+        await start_engine_pool()
+    except Exception as e:
+        print(f"⚠️ Engine pool not started, analysis will spawn engines per job: {e}")
+
+    try:
+        await start_engine_workers()
+    except Exception as e:
+        print(f"⚠️ Engine workers not reachable, analysis stays on local engines: {e}")
+
+    worker = AnalysisWorker(
+        handle_analysis_job,
+        concurrency=concurrency,
+        on_failure=handle_analysis_failure
+    )
+
+    # Graceful shutdown: finish in-flight jobs on SIGINT/SIGTERM
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            pass  # Windows
+
+    try:
+        await worker.run()
+    finally:
+        await stop_engine_workers()
+        await stop_engine_pool()
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the analysis queue worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("ANALYSIS_WORKER_CONCURRENCY", os.getenv("STOCKFISH_POOL_SIZE", "2"))),
+        help="Max analysis jobs processed at once"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))